@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流程实例归档脚本
+把结束时间早于截止日期的已完成/已终止流程实例及其任务实例，按块流式导出到压缩的列式归档文件，再分批从库中删除。
+每块的读取、写归档与删除在同一个写事务内完成，块大小决定单次锁持有时间。
+
+归档文件格式（只追加）：
+    文件头  b"WFARCH1\\n"
+    段      [4 字节大端头长度][头 JSON][列数据块 ...]
+头 JSON 记录表名、行数、日期键列名及其最小/最大值，以及每个列块的列名和字节数；
+日期键为实例的 EndTime，任务段额外带一列 InstanceEndTime 作为日期键；
+每个列块是该列所有值组成的 JSON 数组经 zlib 压缩后的字节。
+读取时先看段头，日期范围不相交的段和不需要的列直接跳过，内存占用只与单段大小有关。
+
+用法:
+    python archive_instances.py archive --before 2025-06-01 --archive-file instances.wfa
+    python archive_instances.py query --archive-file instances.wfa --table ProcessInstances --start 2025-01-01 --end 2025-02-01
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 数据库路径
+DB_PATH = r'D:\Code\WorkFlowCore\WorkFlowCore\src\WorkFlowCore.API\workflow_dev.db'
+
+ARCHIVE_MAGIC = b"WFARCH1\n"
+HEADER_LENGTH = struct.Struct(">I")
+
+# 可归档的实例状态
+FINISHED_STATUSES = ("Completed", "Terminated")
+
+def get_connection(db_path):
+    """获取数据库连接（自动提交模式，事务由每块显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None)
+
+def format_cutoff(moment):
+    """EF Core 写入 SQLite 的 DateTime 文本格式，截止时间按同样格式比较"""
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def complete_length(f, size):
+    """从文件头之后逐段检查，返回最后一个完整段的结束偏移；写入中途崩溃留下的残段不计"""
+    end = f.tell()
+    while end < size:
+        raw = f.read(HEADER_LENGTH.size)
+        if len(raw) < HEADER_LENGTH.size:
+            break
+        header_bytes = f.read(HEADER_LENGTH.unpack(raw)[0])
+        try:
+            header = json.loads(header_bytes.decode("utf-8"))
+            segment_end = f.tell() + sum(column["length"] for column in header["columns"])
+        except (UnicodeDecodeError, ValueError, KeyError, TypeError):
+            break
+        if segment_end > size:
+            break
+        end = segment_end
+        f.seek(end)
+    return end
+
+class ArchiveWriter:
+    """
+    列式归档文件写入器，每次 write_segment 追加一个段并落盘
+    打开已有文件时截掉末尾不完整的段（上次写入中途崩溃），recovered_bytes 为截掉的字节数
+    """
+
+    def __init__(self, path):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.recovered_bytes = 0
+        if not is_new:
+            with open(path, "rb") as f:
+                if f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                    raise ValueError(f"不是有效的归档文件: {path}")
+                size = os.path.getsize(path)
+                end = complete_length(f, size)
+            self.recovered_bytes = size - end
+        self.file = open(path, "ab")
+        if is_new:
+            self.file.write(ARCHIVE_MAGIC)
+        elif self.recovered_bytes:
+            self.file.truncate(end)
+            os.fsync(self.file.fileno())
+        self.bytes_written = 0
+
+    def write_segment(self, table, columns, rows, key, level=6):
+        """把一批行按列压缩后追加为一个段，key 为日期键列名"""
+        blobs = []
+        for index, name in enumerate(columns):
+            values = [row[index] for row in rows]
+            blobs.append((name, zlib.compress(json.dumps(values, ensure_ascii=False).encode("utf-8"), level)))
+        key_values = [row[columns.index(key)] for row in rows]
+        header = json.dumps({
+            "table": table,
+            "rows": len(rows),
+            "key": key,
+            "min": min(key_values),
+            "max": max(key_values),
+            "columns": [{"name": name, "length": len(blob)} for name, blob in blobs],
+        }, ensure_ascii=False).encode("utf-8")
+        self.file.write(HEADER_LENGTH.pack(len(header)))
+        self.file.write(header)
+        for _, blob in blobs:
+            self.file.write(blob)
+        self.bytes_written += HEADER_LENGTH.size + len(header) + sum(len(blob) for _, blob in blobs)
+
+    def sync(self):
+        """确保已写入的段持久化（删除数据前调用）"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def position(self):
+        """当前文件末尾偏移，写一块之前记下，失败时用 truncate 撤销该块的段"""
+        self.file.flush()
+        return self.file.tell()
+
+    def truncate(self, position):
+        """截断到 position 并落盘，撤销之后写入的段"""
+        self.file.flush()
+        self.bytes_written -= max(self.file.tell() - position, 0)
+        self.file.truncate(position)
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class ArchiveReader:
+    """列式归档文件读取器，逐段读取，不会一次性加载整个文件"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def segments(self):
+        """遍历段头，产出 (头信息, 文件对象, 数据起始偏移)"""
+        with open(self.path, "rb") as f:
+            if f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                raise ValueError(f"不是有效的归档文件: {self.path}")
+            while True:
+                raw = f.read(HEADER_LENGTH.size)
+                if len(raw) < HEADER_LENGTH.size:
+                    return
+                header = json.loads(f.read(HEADER_LENGTH.unpack(raw)[0]).decode("utf-8"))
+                data_start = f.tell()
+                yield header, f, data_start
+                f.seek(data_start + sum(column["length"] for column in header["columns"]))
+
+    def scan(self, table, start=None, end=None, columns=None):
+        """
+        按实例 EndTime 区间 [start, end) 扫描某张表，逐行产出 {列名: 值}
+        段头范围与区间不相交时整段跳过；columns 指定时只解压需要的列和段的日期键列
+        """
+        for header, f, data_start in self.segments():
+            if header["table"] != table:
+                continue
+            if start is not None and header["max"] < start:
+                continue
+            if end is not None and header["min"] >= end:
+                continue
+            names = [column["name"] for column in header["columns"]]
+            output = [name for name in names if columns is None or name in columns]
+            key = header["key"]
+            values = {}
+            offset = data_start
+            for column in header["columns"]:
+                if column["name"] in output or column["name"] == key:
+                    f.seek(offset)
+                    values[column["name"]] = json.loads(zlib.decompress(f.read(column["length"])).decode("utf-8"))
+                offset += column["length"]
+            keys = values[key]
+            for index in range(header["rows"]):
+                if (start is not None and keys[index] < start) or (end is not None and keys[index] >= end):
+                    continue
+                yield {name: values[name][index] for name in output}
+
+def find_task_index(conn):
+    """检查 TaskInstances 上是否有以 ProcessInstanceId 开头的索引"""
+    for _, name, *_ in conn.execute("PRAGMA index_list(TaskInstances)"):
+        first = conn.execute(f"PRAGMA index_info({name})").fetchone()
+        if first and first[2] == "ProcessInstanceId":
+            return name
+    return None
+
+def archive_instances(conn, writer, cutoff, chunk_size, pause):
+    """
+    按 Id 键集分块归档，每块一个 BEGIN IMMEDIATE 事务：取一块已结束实例 -> 取其任务 -> 写两个段并 fsync -> 删除任务与实例
+    读取与删除在同一写事务内，块内实例与任务在读取后不会再被修改，删除的正是已写入归档的行；
+    删除或提交失败回滚时归档文件截回该块写入前的长度，下次重跑不会产生重复的段
+    返回 (实例数, 任务数, 锁持有时间合计, 单块最长锁持有时间)
+    """
+    instance_columns = [row[1] for row in conn.execute("PRAGMA table_info(ProcessInstances)")]
+    task_columns = [row[1] for row in conn.execute("PRAGMA table_info(TaskInstances)")]
+    id_index = instance_columns.index("Id")
+    end_index = instance_columns.index("EndTime")
+    parent_index = task_columns.index("ProcessInstanceId")
+    status_marks = ", ".join("?" * len(FINISHED_STATUSES))
+    last_id = -2 ** 63
+    instances = tasks = 0
+    lock_total = lock_max = 0.0
+    started = time.perf_counter()
+    while True:
+        lock_started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        position, committed = writer.position(), False
+        try:
+            rows = conn.execute(f"""
+                SELECT {', '.join(instance_columns)} FROM ProcessInstances
+                WHERE Id > ? AND Status IN ({status_marks}) AND EndTime IS NOT NULL AND EndTime < ?
+                ORDER BY Id LIMIT ?
+            """, (last_id, *FINISHED_STATUSES, cutoff, chunk_size)).fetchall()
+            if not rows:
+                conn.execute("COMMIT")
+                break
+            ids = [row[id_index] for row in rows]
+            id_marks = ", ".join("?" * len(ids))
+            task_rows = conn.execute(
+                f"SELECT {', '.join(task_columns)} FROM TaskInstances WHERE ProcessInstanceId IN ({id_marks})",
+                ids).fetchall()
+
+            end_times = dict(zip(ids, (row[end_index] for row in rows)))
+            writer.write_segment("ProcessInstances", instance_columns, rows, "EndTime")
+            if task_rows:
+                writer.write_segment("TaskInstances", task_columns + ["InstanceEndTime"],
+                                     [row + (end_times[row[parent_index]],) for row in task_rows], "InstanceEndTime")
+            writer.sync()
+
+            conn.execute(f"DELETE FROM TaskInstances WHERE ProcessInstanceId IN ({id_marks})", ids)
+            conn.execute(f"DELETE FROM ProcessInstances WHERE Id IN ({id_marks})", ids)
+            conn.execute("COMMIT")
+            committed = True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if not committed:
+                writer.truncate(position)
+            raise
+        held = time.perf_counter() - lock_started
+        lock_total += held
+        lock_max = max(lock_max, held)
+
+        last_id = ids[-1]
+        instances += len(rows)
+        tasks += len(task_rows)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"   已归档 {instances:,} 个实例 / {tasks:,} 个任务, {(instances + tasks) / elapsed:,.0f} 行/秒")
+        time.sleep(pause)
+    return instances, tasks, lock_total, lock_max
+
+def run_archive(args):
+    """archive 子命令"""
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+    cutoff = format_cutoff(datetime.fromisoformat(args.before))
+    conn = get_connection(args.db)
+    writer = None
+    try:
+        index_name = find_task_index(conn)
+        if index_name is None:
+            if not args.create_index:
+                print("错误: TaskInstances 缺少 ProcessInstanceId 索引，每块任务查询都会全表扫描；"
+                      "使用 --create-index 创建后再归档")
+                return 1
+            print("\n创建索引 IX_TaskInstances_ProcessInstanceId...")
+            conn.execute("CREATE INDEX IX_TaskInstances_ProcessInstanceId ON TaskInstances (ProcessInstanceId)")
+
+        print(f"\n归档 EndTime < {cutoff} 的已结束实例到 {args.archive_file}")
+        writer = ArchiveWriter(args.archive_file)
+        if writer.recovered_bytes:
+            print(f"   已截掉归档文件末尾不完整的段 ({writer.recovered_bytes:,} 字节)")
+        started = time.perf_counter()
+        instances, tasks, lock_total, lock_max = archive_instances(conn, writer, cutoff, args.chunk_size, args.pause)
+        elapsed = time.perf_counter() - started
+        print(f"\n   实例 {instances:,} 个, 任务 {tasks:,} 个, 用时 {elapsed:.2f}s")
+        print(f"   归档写入 {writer.bytes_written / (1024 * 1024):.2f} MB")
+        print(f"   删除锁持有合计 {lock_total:.2f}s, 单块最长 {lock_max * 1000:.1f}ms")
+        print("\n✓ 归档完成！可运行 vacuum_database.py 回收空间")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        if writer:
+            writer.close()
+        conn.close()
+
+def run_query(args):
+    """query 子命令：按日期区间扫描归档，输出 JSON Lines 或仅计数"""
+    reader = ArchiveReader(args.archive_file)
+    columns = args.columns.split(",") if args.columns else None
+    count = 0
+    for row in reader.scan(args.table, args.start, args.end, columns):
+        count += 1
+        if not args.count:
+            print(json.dumps(row, ensure_ascii=False))
+    if args.count:
+        print(count)
+    return 0
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="归档已结束的流程实例与任务实例")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    archive = sub.add_parser("archive", help="归档并删除已结束实例")
+    archive.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    archive.add_argument("--before", required=True, help="截止日期 (ISO 格式)，归档 EndTime 早于该时间的实例")
+    archive.add_argument("--archive-file", required=True, help="归档文件路径（追加写入）")
+    archive.add_argument("--chunk-size", type=int, default=1000, help="每块实例数")
+    archive.add_argument("--pause", type=float, default=0.05, help="块间暂停秒数")
+    archive.add_argument("--create-index", action="store_true", help="缺少时创建 TaskInstances(ProcessInstanceId) 索引")
+
+    query = sub.add_parser("query", help="按 EndTime 区间扫描归档")
+    query.add_argument("--archive-file", required=True, help="归档文件路径")
+    query.add_argument("--table", choices=["ProcessInstances", "TaskInstances"], default="ProcessInstances")
+    query.add_argument("--start", help="EndTime 起始（含），与库中文本格式比较")
+    query.add_argument("--end", help="EndTime 结束（不含）")
+    query.add_argument("--columns", help="逗号分隔的输出列")
+    query.add_argument("--count", action="store_true", help="只输出匹配行数")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    if args.command == "archive":
+        print("=" * 60)
+        print("流程实例归档脚本")
+        print("=" * 60)
+        return run_archive(args)
+    return run_query(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+查询计划审计脚本
+对应用热点查询逐条执行 EXPLAIN QUERY PLAN，标记扫描（SCAN，包括按索引顺序的 SCAN t USING INDEX）
+和临时 B 树（USE TEMP B-TREE），并给出建议的覆盖索引。只有 SEARCH（按索引定位）视为走索引。
+
+- --verify 在一个回滚的事务中试建建议索引后重新解释计划，确认确实能消除扫描（SQLite 的 DDL 支持事务）；
+  试建期间持有写锁，请在副本或维护窗口中使用
+- 出现未允许的扫描时退出码为 1；指定 --baseline 时仅当基线中走索引的查询退化为扫描才失败
+- --save-baseline 把本次结果写入基线文件
+
+请在已填充数据并执行过 ANALYZE 的库上运行（可用 generate_load_data.py 生成数据，或加 --analyze）。
+"""
+import argparse
+import json
+import os
+import sys
+
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 数据库路径
+DB_PATH = r'D:\Code\WorkFlowCore\WorkFlowCore\src\WorkFlowCore.API\workflow_dev.db'
+
+# 热点查询目录：名称 -> 说明、SQL、示例参数、建议索引、允许扫描的表（小表，按计划中的表名或别名）
+HOT_QUERIES = {
+    "task_inbox": {
+        "description": "待办列表：按受理人与状态查询任务，按优先级与创建时间排序",
+        "sql": """
+            SELECT Id, ProcessInstanceId, Name, Priority, DueDate, CreationTime
+            FROM TaskInstances
+            WHERE AssigneeId = ? AND Status = ?
+            ORDER BY Priority DESC, CreationTime DESC
+            LIMIT 20
+        """,
+        "params": (1000000000000000000, "Pending"),
+        "suggest": ["CREATE INDEX IX_TaskInstances_AssigneeId_Status_Priority_CreationTime "
+                    "ON TaskInstances (AssigneeId, Status, Priority, CreationTime)"],
+    },
+    "task_inbox_count": {
+        "description": "待办角标：统计受理人的待处理任务数",
+        "sql": "SELECT COUNT(*) FROM TaskInstances WHERE AssigneeId = ? AND Status = ?",
+        "params": (1000000000000000000, "Pending"),
+        "suggest": ["CREATE INDEX IX_TaskInstances_AssigneeId_Status_Priority_CreationTime "
+                    "ON TaskInstances (AssigneeId, Status, Priority, CreationTime)"],
+    },
+    "instance_tasks": {
+        "description": "实例详情：加载一个流程实例的全部任务",
+        "sql": "SELECT Id, NodeId, Name, Status, CompleteTime FROM TaskInstances WHERE ProcessInstanceId = ? ORDER BY CreationTime",
+        "params": (8100000000000000000,),
+        "suggest": ["CREATE INDEX IX_TaskInstances_ProcessInstanceId_CreationTime ON TaskInstances (ProcessInstanceId, CreationTime)"],
+    },
+    "instance_list_by_initiator": {
+        "description": "我发起的：按发起人查询流程实例，按开始时间倒序分页",
+        "sql": """
+            SELECT Id, Title, Status, StartTime, EndTime
+            FROM ProcessInstances
+            WHERE InitiatorId = ?
+            ORDER BY StartTime DESC
+            LIMIT 20
+        """,
+        "params": (1000000000000000000,),
+        "suggest": ["CREATE INDEX IX_ProcessInstances_InitiatorId_StartTime ON ProcessInstances (InitiatorId, StartTime)"],
+    },
+    "instance_list_by_status": {
+        "description": "实例管理：按租户与状态筛选流程实例",
+        "sql": """
+            SELECT Id, Title, InitiatorId, StartTime
+            FROM ProcessInstances
+            WHERE TenantId = ? AND Status = ?
+            ORDER BY StartTime DESC
+            LIMIT 20
+        """,
+        "params": ("00000000-0000-0000-0000-000000000001", "Running"),
+        "suggest": ["CREATE INDEX IX_ProcessInstances_TenantId_Status_StartTime ON ProcessInstances (TenantId, Status, StartTime)"],
+    },
+    "department_subtree": {
+        "description": "部门子树：按 Ancestors 前缀匹配查询所有下级部门",
+        "sql": "SELECT Id, DeptName, ParentId FROM Departments WHERE Ancestors LIKE ? OR Id = ?",
+        "params": ("0,2000000000000000000%", 2000000000000000000),
+        "suggest": ["CREATE INDEX IX_Departments_Ancestors ON Departments (Ancestors COLLATE NOCASE)"],
+    },
+    "department_children": {
+        "description": "部门树展开：按父部门查询直接下级",
+        "sql": "SELECT Id, DeptName, OrderNum FROM Departments WHERE ParentId = ? ORDER BY OrderNum",
+        "params": (2000000000000000000,),
+        "suggest": ["CREATE INDEX IX_Departments_ParentId_OrderNum ON Departments (ParentId, OrderNum)"],
+    },
+    "department_users": {
+        "description": "部门成员：按部门查询用户",
+        "sql": "SELECT Id, UserName, RealName FROM Users WHERE DepartmentId = ? AND IsDeleted = 0",
+        "params": (2000000000000000001,),
+        "suggest": ["CREATE INDEX IX_Users_DepartmentId ON Users (DepartmentId)"],
+    },
+    "role_menu_resolution": {
+        "description": "登录/getInfo：按 ABP 用户解析角色可见菜单与权限码",
+        "sql": """
+            SELECT DISTINCT m.Id, m.ParentId, m.MenuName, m.MenuType, m.Path, m.Component, m.PermissionCode, m.OrderNum
+            FROM AbpUserRoles ur
+            JOIN RoleMenus rm ON rm.RoleId = ur.RoleId
+            JOIN Menus m ON m.Id = rm.MenuId
+            WHERE ur.UserId = ? AND m.Status = '0' AND m.IsDeleted = 0
+            ORDER BY m.ParentId, m.OrderNum
+        """,
+        "params": ("00000000-0000-0000-0000-000000000000",),
+        "suggest": [],
+        # 菜单表很小，按索引或全表扫描都可以接受（计划中使用别名）
+        "allow_scan": ["m"],
+    },
+    "menu_children": {
+        "description": "菜单树：按父菜单查询子菜单",
+        "sql": "SELECT Id, MenuName, OrderNum FROM Menus WHERE ParentId = ? ORDER BY OrderNum",
+        "params": (4000000000000000000,),
+        "suggest": [],
+    },
+    "login_log_list": {
+        "description": "登录日志：按状态与时间范围查询",
+        "sql": "SELECT Id, UserName, Ipaddr, LoginTime FROM LoginLogs WHERE Status = ? AND LoginTime >= ? ORDER BY LoginTime DESC LIMIT 20",
+        "params": ("1", "2025-01-01 00:00:00"),
+        "suggest": [],
+    },
+    "operation_log_list": {
+        "description": "操作日志：按时间范围倒序分页",
+        "sql": "SELECT Id, Title, OperatorName, CreationTime FROM OperationLogs WHERE CreationTime >= ? ORDER BY CreationTime DESC LIMIT 20",
+        "params": ("2025-01-01 00:00:00",),
+        "suggest": [],
+    },
+    "file_chunk_progress": {
+        "description": "分片上传：查询附件已上传的分片",
+        "sql": "SELECT ChunkIndex, ChunkHash FROM FileChunks WHERE AttachmentId = ? AND UploadStatus = ?",
+        "params": (1, 1),
+        "suggest": [],
+    },
+}
+
+def get_connection(db_path):
+    """获取数据库连接（自动提交模式，便于在显式事务中试建索引）"""
+    return sql_profiler.connect(db_path, isolation_level=None)
+
+def explain(conn, sql, params):
+    """返回 EXPLAIN QUERY PLAN 的 detail 列表"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def classify_plan(details, allow_scan=()):
+    """
+    分析计划步骤，返回 (扫描的表, 临时 B 树步骤, 被允许的扫描)
+    "SCAN t USING [COVERING] INDEX" 同样逐行读取整个索引（例如 ORDER BY 走索引但 WHERE 没有可用前缀），
+    与全表扫描一样计入；只有 SEARCH 算走索引
+    """
+    full_scans, allowed, temp_btrees = [], [], []
+    for detail in details:
+        if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW":
+            table = detail.split()[1]
+            (allowed if table in allow_scan else full_scans).append(table)
+        if "USE TEMP B-TREE" in detail:
+            temp_btrees.append(detail)
+    return full_scans, temp_btrees, allowed
+
+def verify_suggestions(conn, query):
+    """在回滚的事务中试建建议索引，返回试建后的计划；建索引期间持有写锁"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for ddl in query["suggest"]:
+            conn.execute(ddl)
+        return explain(conn, query["sql"], query["params"])
+    finally:
+        conn.execute("ROLLBACK")
+
+def audit_queries(conn, names, verify):
+    """审计所选查询，返回 {名称: 结果}"""
+    results = {}
+    for name in names:
+        query = HOT_QUERIES[name]
+        details = explain(conn, query["sql"], query["params"])
+        full_scans, temp_btrees, allowed = classify_plan(details, query.get("allow_scan", ()))
+        result = {
+            "plan": details,
+            "full_scans": full_scans,
+            "temp_btrees": temp_btrees,
+            "allowed_scans": allowed,
+            "uses_index": not full_scans,
+        }
+        if (full_scans or temp_btrees) and query["suggest"] and verify:
+            after = verify_suggestions(conn, query)
+            after_scans, after_btrees, _ = classify_plan(after, query.get("allow_scan", ()))
+            result["suggested_plan"] = after
+            result["suggestion_fixes"] = not after_scans and len(after_btrees) <= len(temp_btrees)
+        results[name] = result
+    return results
+
+def print_report(results):
+    """输出审计结果"""
+    for name, result in results.items():
+        query = HOT_QUERIES[name]
+        if result["full_scans"]:
+            mark = "✗"
+        elif result["temp_btrees"]:
+            mark = "!"
+        else:
+            mark = "✓"
+        print(f"\n{mark} {name} - {query['description']}")
+        for detail in result["plan"]:
+            print(f"     {detail}")
+        if result["full_scans"]:
+            print(f"   扫描: {', '.join(result['full_scans'])}")
+        if result["allowed_scans"]:
+            print(f"   允许的小表扫描: {', '.join(result['allowed_scans'])}")
+        if result["temp_btrees"]:
+            print(f"   临时 B 树: {len(result['temp_btrees'])} 处")
+        if (result["full_scans"] or result["temp_btrees"]) and query["suggest"]:
+            print("   建议索引:")
+            for ddl in query["suggest"]:
+                print(f"     {ddl};")
+            if "suggested_plan" in result:
+                verdict = "可消除扫描" if result["suggestion_fixes"] else "仍有扫描或排序"
+                print(f"   试建后计划 ({verdict}): {' | '.join(result['suggested_plan'])}")
+
+def find_regressions(results, baseline):
+    """
+    找出失败项：无基线时为所有扫描；有基线时仅为基线中走索引、本次退化为扫描的查询
+    """
+    failures = []
+    for name, result in results.items():
+        if not result["full_scans"]:
+            continue
+        if baseline is None or baseline.get(name, {}).get("uses_index", False):
+            failures.append(name)
+    return failures
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="审计热点查询的执行计划")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--queries", nargs="+", choices=list(HOT_QUERIES), default=list(HOT_QUERIES),
+                        help="要审计的查询 (默认全部)")
+    parser.add_argument("--analyze", action="store_true", help="审计前执行 ANALYZE 更新统计信息")
+    parser.add_argument("--verify", action="store_true",
+                        help="在回滚的事务中试建建议索引并重新解释计划（持有写锁，请在副本上使用）")
+    parser.add_argument("--baseline", help="基线 JSON 文件，只对退化的查询报错")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线 JSON 文件")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 2
+
+    conn = get_connection(args.db)
+    try:
+        if args.analyze:
+            conn.execute("ANALYZE")
+        results = audit_queries(conn, args.queries, args.verify)
+    finally:
+        conn.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print("=" * 60)
+        print("查询计划审计")
+        print("=" * 60)
+        print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failures = find_regressions(results, baseline)
+    if not args.json:
+        scans = sum(1 for result in results.values() if result["full_scans"])
+        print(f"\n共 {len(results)} 条查询, {scans} 条存在扫描")
+        if failures:
+            label = "相对基线退化为扫描" if baseline is not None else "存在扫描"
+            print(f"✗ {label}: {', '.join(failures)}")
+        else:
+            print("✓ 未发现退化")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+在线备份脚本
+使用 SQLite 在线备份 API（sqlite3.Connection.backup）在 API 运行期间生成一致的数据库快照：
+
+- 每步复制 --pages 页，步间暂停 --sleep 秒；每步只短暂持有源库读锁，不会长时间阻塞写入
+- 备份完成后对副本执行 quick_check，计算 SHA-256，可选 gzip/xz 流式压缩并回读校验
+- 每个快照附带 .json 清单（页数、大小、校验和），verify 子命令可随时复核
+- --keep 保留最近 N 个快照，其余按时间轮换删除
+
+源库在备份期间被其他连接修改时，备份 API 会从头重新开始；重启超过 --max-restarts 次时放弃，
+可增大 --pages 或在写入较少时重试。
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 压缩格式 -> (扩展名, 打开函数)
+COMPRESSORS = {
+    "none": ("", None),
+    "gzip": (".gz", lambda path, mode: gzip.open(path, mode, compresslevel=6)),
+    "xz": (".xz", lambda path, mode: lzma.open(path, mode, preset=6 if "w" in mode else None)),
+}
+
+# 流式读写的块大小
+STREAM_CHUNK = 4 * 1024 * 1024
+
+# backup_step 复制了页的返回码；BUSY/LOCKED 表示本步没拿到锁，CPython 在回调之后暂停 sleep 秒再重试
+COPIED_STATUSES = (sqlite3.SQLITE_OK, sqlite3.SQLITE_DONE)
+
+class BackupStats:
+    """备份过程统计：步数、持锁时间（复制了页的 backup_step 的耗时）、未拿到锁的步数、重启次数"""
+
+    def __init__(self, sleep, max_restarts):
+        self.sleep = sleep
+        self.max_restarts = max_restarts
+        self.steps = 0
+        self.busy_steps = 0
+        self.lock_seconds = 0.0
+        self.max_lock_seconds = 0.0
+        self.restarts = 0
+        self.total_pages = 0
+        self.last_remaining = None
+        self.step_started = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = self.step_started = time.perf_counter()
+
+    def progress(self, status, remaining, total):
+        """backup 的进度回调：记录本步耗时，检测重启，然后按配置暂停"""
+        held = time.perf_counter() - self.step_started
+        self.steps += 1
+        if status not in COPIED_STATUSES:
+            # 没拿到锁：不计持锁时间；CPython 在回调返回后暂停 sleep 秒，下一步从暂停结束时计时
+            self.busy_steps += 1
+            self.step_started = time.perf_counter() + self.sleep
+            return
+        self.lock_seconds += held
+        self.max_lock_seconds = max(self.max_lock_seconds, held)
+        if self.last_remaining is not None and remaining > self.last_remaining:
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                # 回调抛出异常会中止备份
+                raise RuntimeError(f"源库持续被修改，备份已重启 {self.restarts} 次，已放弃")
+        self.last_remaining = remaining
+        self.total_pages = total
+        if self.steps % 100 == 0:
+            print(f"   已复制 {total - remaining:,}/{total:,} 页")
+        if remaining and self.sleep:
+            time.sleep(self.sleep)
+        self.step_started = time.perf_counter()
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+def sha256_file(path, opener=open):
+    """流式计算文件（或解压后内容）的 SHA-256，返回 (摘要, 字节数)"""
+    digest = hashlib.sha256()
+    size = 0
+    with opener(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def run_backup(source_path, target_path, pages, sleep, busy_timeout, max_restarts):
+    """执行在线备份，返回统计"""
+    stats = BackupStats(sleep, max_restarts)
+    source = sql_profiler.connect(source_path, timeout=busy_timeout)
+    target = sql_profiler.connect(target_path)
+    try:
+        stats.start()
+        source.backup(target, pages=pages, progress=stats.progress, sleep=sleep)
+        stats.finish()
+        # 快照统一使用回滚日志模式，便于单文件复制与恢复
+        target.execute("PRAGMA journal_mode = DELETE").fetchone()
+    finally:
+        target.close()
+        source.close()
+    return stats
+
+def check_snapshot(path):
+    """对快照执行 quick_check，返回 (结果, 页大小, 页数)"""
+    conn = sql_profiler.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        conn.close()
+    return result, page_size, page_count
+
+def compress_file(source_path, target_path, compression):
+    """流式压缩，不在内存中保留整个文件"""
+    _, opener = COMPRESSORS[compression]
+    with open(source_path, "rb") as src, opener(target_path, "wb") as dst:
+        while True:
+            chunk = src.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            dst.write(chunk)
+
+def snapshot_opener(compression):
+    """按压缩格式返回读取快照内容的打开函数"""
+    _, opener = COMPRESSORS[compression]
+    return opener or open
+
+def list_snapshots(backup_dir, prefix):
+    """按时间升序列出 (快照路径, 清单路径)"""
+    manifests = sorted(name for name in os.listdir(backup_dir)
+                       if name.startswith(prefix + "_") and name.endswith(".json"))
+    snapshots = []
+    for name in manifests:
+        manifest_path = os.path.join(backup_dir, name)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        snapshots.append((os.path.join(backup_dir, manifest["file"]), manifest_path))
+    return snapshots
+
+def rotate_snapshots(backup_dir, prefix, keep):
+    """保留最近 keep 个快照，删除更早的快照及清单，返回删除的文件名"""
+    removed = []
+    snapshots = list_snapshots(backup_dir, prefix)
+    for snapshot_path, manifest_path in snapshots[:max(0, len(snapshots) - keep)]:
+        for path in (snapshot_path, manifest_path):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(os.path.basename(snapshot_path))
+    return removed
+
+def verify_snapshot(manifest_path):
+    """按清单复核快照：压缩文件 SHA-256、解压后内容 SHA-256 与大小；返回问题列表"""
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    path = os.path.join(os.path.dirname(manifest_path), manifest["file"])
+    if not os.path.exists(path):
+        return [f"快照文件不存在: {path}"]
+    problems = []
+    if manifest["compression"] != "none":
+        digest, _ = sha256_file(path)
+        if digest != manifest["file_sha256"]:
+            problems.append("压缩文件 SHA-256 不符")
+    digest, size = sha256_file(path, snapshot_opener(manifest["compression"]))
+    if digest != manifest["db_sha256"] or size != manifest["db_bytes"]:
+        problems.append("数据库内容 SHA-256 或大小不符")
+    return problems
+
+def create_backup(args):
+    """生成快照、校验、压缩、写清单并轮换"""
+    os.makedirs(args.backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = f"{args.prefix}_{stamp}"
+    db_path = os.path.join(args.backup_dir, base_name + ".db")
+    partial_path = db_path + ".partial"
+    extension, _ = COMPRESSORS[args.compression]
+    final_path = db_path + extension
+
+    print(f"\n1. 在线备份 (每步 {args.pages} 页, 步间暂停 {args.sleep}s)...")
+    try:
+        with sql_profiler.step("在线备份"):
+            stats = run_backup(args.db, partial_path, args.pages, args.sleep, args.busy_timeout, args.max_restarts)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    db_bytes = os.path.getsize(partial_path)
+    print(f"   ✓ {stats.total_pages:,} 页, {db_bytes / 1024 / 1024:,.1f} MB, {stats.steps} 步, "
+          f"{stats.elapsed:.2f}s, {db_bytes / 1024 / 1024 / stats.elapsed if stats.elapsed else 0:,.1f} MB/s")
+    print(f"   持锁合计 {stats.lock_seconds:.2f}s, 单步最长 {stats.max_lock_seconds * 1000:.1f}ms"
+          + (f", 未拿到锁 {stats.busy_steps} 步" if stats.busy_steps else "")
+          + (f", 源库变化导致重启 {stats.restarts} 次" if stats.restarts else ""))
+
+    print("\n2. 校验快照...")
+    with sql_profiler.step("校验快照"):
+        result, page_size, page_count = check_snapshot(partial_path)
+        if result != "ok":
+            os.remove(partial_path)
+            raise RuntimeError(f"快照 quick_check 失败: {result}")
+        db_sha256, _ = sha256_file(partial_path)
+    print(f"   ✓ quick_check ok, SHA-256 {db_sha256[:16]}...")
+
+    file_sha256 = db_sha256
+    if args.compression != "none":
+        print(f"\n3. {args.compression} 压缩...")
+        started = time.perf_counter()
+        with sql_profiler.step(f"{args.compression} 压缩与回读校验"):
+            compress_file(partial_path, final_path + ".partial", args.compression)
+            file_sha256, file_bytes = sha256_file(final_path + ".partial")
+            restored_sha256, _ = sha256_file(final_path + ".partial", snapshot_opener(args.compression))
+        if restored_sha256 != db_sha256:
+            os.remove(final_path + ".partial")
+            raise RuntimeError("压缩文件回读校验失败")
+        os.replace(final_path + ".partial", final_path)
+        os.remove(partial_path)
+        elapsed = time.perf_counter() - started
+        print(f"   ✓ {file_bytes / 1024 / 1024:,.1f} MB (压缩率 {file_bytes / db_bytes:.1%}), {elapsed:.2f}s, "
+              f"{db_bytes / 1024 / 1024 / elapsed if elapsed else 0:,.1f} MB/s，回读校验通过")
+    else:
+        os.replace(partial_path, final_path)
+
+    manifest = {
+        "file": os.path.basename(final_path),
+        "source": os.path.abspath(args.db),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "compression": args.compression,
+        "page_size": page_size,
+        "page_count": page_count,
+        "db_bytes": db_bytes,
+        "db_sha256": db_sha256,
+        "file_sha256": file_sha256,
+        "backup_seconds": round(stats.elapsed, 3),
+        "lock_seconds": round(stats.lock_seconds, 3),
+        "busy_steps": stats.busy_steps,
+        "restarts": stats.restarts,
+    }
+    with open(os.path.join(args.backup_dir, base_name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 快照已保存: {final_path}")
+
+    if args.keep:
+        removed = rotate_snapshots(args.backup_dir, args.prefix, args.keep)
+        if removed:
+            print(f"✓ 轮换删除 {len(removed)} 个旧快照: {', '.join(removed)}")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="SQLite 在线备份与快照管理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backup = sub.add_parser("backup", help="生成快照")
+    backup.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    backup.add_argument("--backup-dir", required=True, help="快照目录")
+    backup.add_argument("--prefix", default="workflow", help="快照文件名前缀")
+    backup.add_argument("--pages", type=int, default=1000, help="每步复制的页数 (-1 表示一步完成)")
+    backup.add_argument("--sleep", type=float, default=0.01, help="步间暂停秒数")
+    backup.add_argument("--compression", choices=list(COMPRESSORS), default="gzip", help="压缩格式")
+    backup.add_argument("--keep", type=int, default=7, help="保留的快照数 (0 表示不轮换)")
+    backup.add_argument("--max-restarts", type=int, default=20, help="源库变化导致重启的最大次数")
+    backup.add_argument("--busy-timeout", type=float, default=5.0, help="源库忙时的等待秒数")
+
+    verify = sub.add_parser("verify", help="按清单复核快照")
+    verify.add_argument("--backup-dir", required=True, help="快照目录")
+    verify.add_argument("--prefix", default="workflow", help="快照文件名前缀")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("在线备份脚本")
+    print("=" * 60)
+
+    try:
+        if args.command == "backup":
+            if not os.path.exists(args.db):
+                print(f"错误: 数据库文件不存在: {args.db}")
+                return 1
+            create_backup(args)
+            return 0
+
+        snapshots = list_snapshots(args.backup_dir, args.prefix)
+        if not snapshots:
+            print(f"\n{args.backup_dir} 中没有快照")
+            return 1
+        failed = 0
+        for snapshot_path, manifest_path in snapshots:
+            with sql_profiler.step("复核快照"):
+                problems = verify_snapshot(manifest_path)
+            failed += bool(problems)
+            print(f"   {'✓' if not problems else '✗'} {os.path.basename(snapshot_path)}"
+                  + (f": {'; '.join(problems)}" if problems else ""))
+        return 1 if failed else 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+工作流热点路径基准测试脚本
+在数据库副本上执行参数化负载并统计延迟分位数与吞吐量：
+
+- inbox_read:       待办列表查询
+- task_complete:    完成任务（带并发戳的乐观更新，每次一个事务）
+- instance_create:  发起流程实例并创建首批任务（一个事务）
+- menu_tree:        按角色加载菜单并在内存中组装菜单树
+- dept_subtree:     按 Ancestors 前缀查询部门子树
+
+结果可保存为 JSON 基线（--save），并与已有基线比较（--compare），
+p95 延迟或吞吐量变差超过 --threshold 时标记为退化，退出码为 1。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from audit_query_plans import HOT_QUERIES
+from generate_load_data import DB_PATH, LoadPlan, RateMeter, generate_tenant_data, parse_args as parse_load_args
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 每个负载采样的参数个数
+SAMPLE_SIZE = 500
+
+def get_connection(db_path):
+    """获取数据库连接（自动提交模式，事务由负载显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None)
+
+def percentile(sorted_values, fraction):
+    """最近秩法取分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def sample_column(conn, sql, rng, size=SAMPLE_SIZE):
+    """从库中随机抽取负载参数；样本按随机种子打乱，保证同一数据上的运行可复现"""
+    values = [row[0] for row in conn.execute(sql)]
+    if not values:
+        return []
+    rng.shuffle(values)
+    return values[:size]
+
+class Workloads:
+    """负载集合，每个负载是一个无参方法，执行一次操作"""
+
+    def __init__(self, conn, seed):
+        self.conn = conn
+        self.rng = random.Random(seed)
+        rng = self.rng
+        self.assignees = sample_column(conn, "SELECT DISTINCT AssigneeId FROM TaskInstances WHERE AssigneeId IS NOT NULL LIMIT 20000", rng)
+        self.pending_tasks = sample_column(conn, "SELECT Id FROM TaskInstances WHERE Status = 'Pending' LIMIT 200000", rng, 100000)
+        self.initiators = conn.execute("SELECT Id, TenantId FROM Users LIMIT 20000").fetchall()
+        rng.shuffle(self.initiators)
+        self.initiators = self.initiators[:SAMPLE_SIZE]
+        self.definitions = conn.execute("SELECT Id, Name FROM ProcessDefinitions LIMIT 1000").fetchall()
+        self.roles = sample_column(conn, "SELECT DISTINCT RoleId FROM RoleMenus", rng)
+        self.departments = sample_column(
+            conn, "SELECT Id FROM Departments WHERE Id IN (SELECT DISTINCT ParentId FROM Departments) LIMIT 20000", rng)
+        self.ancestors = dict(conn.execute("SELECT Id, Ancestors FROM Departments WHERE Id IN (%s)" % ", ".join(
+            str(int(dept_id)) for dept_id in self.departments))) if self.departments else {}
+        self.next_instance_id = (conn.execute("SELECT MAX(Id) FROM ProcessInstances").fetchone()[0] or 0) + 1
+        self.next_task_id = (conn.execute("SELECT MAX(Id) FROM TaskInstances").fetchone()[0] or 0) + 1
+        self.counter = 0
+
+    def available(self):
+        """返回数据满足条件的负载名称"""
+        checks = {
+            "inbox_read": self.assignees,
+            "task_complete": self.pending_tasks,
+            "instance_create": self.initiators and self.definitions,
+            "menu_tree": self.roles,
+            "dept_subtree": self.departments,
+        }
+        return [name for name, ok in checks.items() if ok]
+
+    def pick(self, values):
+        self.counter += 1
+        return values[self.counter % len(values)]
+
+    def inbox_read(self):
+        query = HOT_QUERIES["task_inbox"]
+        self.conn.execute(query["sql"], (self.pick(self.assignees), "Pending")).fetchall()
+
+    def task_complete(self):
+        if not self.pending_tasks:
+            raise RuntimeError("待处理任务已耗尽，请减少迭代次数或增大数据规模")
+        task_id = self.pending_tasks.pop()
+        now = datetime.now(timezone.utc).isoformat()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        stamp = conn.execute("SELECT ConcurrencyStamp FROM TaskInstances WHERE Id = ?", (task_id,)).fetchone()
+        conn.execute("""
+            UPDATE TaskInstances
+            SET Status = 'Completed', CompleteTime = ?, Comment = ?, LastModificationTime = ?, ConcurrencyStamp = ?
+            WHERE Id = ? AND ConcurrencyStamp = ?
+        """, (now, "同意", now, str(uuid.uuid4()), task_id, stamp[0] if stamp else None))
+        conn.execute("COMMIT")
+
+    def instance_create(self):
+        user_id, tenant_id = self.pick(self.initiators)
+        definition_id, definition_name = self.pick(self.definitions)
+        now = datetime.now(timezone.utc).isoformat()
+        instance_id = self.next_instance_id
+        self.next_instance_id += 1
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("""
+            INSERT INTO ProcessInstances (Id, ProcessDefinitionId, BusinessKey, Title, InitiatorId, Status, Variables,
+                                          StartTime, TenantId, CreationTime, ExtraProperties, ConcurrencyStamp)
+            VALUES (?, ?, ?, ?, ?, 'Running', ?, ?, ?, ?, '{}', ?)
+        """, (instance_id, definition_id, f"BENCH-{instance_id}", f"{definition_name}-基准", user_id,
+              json.dumps({"amount": self.rng.randint(100, 50000)}), now, tenant_id, now, str(uuid.uuid4())))
+        tasks = []
+        for node in range(2):
+            tasks.append((self.next_task_id, instance_id, f"node_{node + 1}", f"审批{node + 1}", "UserTask",
+                          self.pick(self.initiators)[0], "Pending", 0, tenant_id, now, "{}", str(uuid.uuid4())))
+            self.next_task_id += 1
+        conn.executemany("""
+            INSERT INTO TaskInstances (Id, ProcessInstanceId, NodeId, Name, TaskType, AssigneeId, Status, Priority,
+                                       TenantId, CreationTime, ExtraProperties, ConcurrencyStamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, tasks)
+        conn.execute("COMMIT")
+
+    def menu_tree(self):
+        rows = self.conn.execute("""
+            SELECT m.Id, m.ParentId, m.MenuName, m.Path, m.PermissionCode, m.OrderNum
+            FROM RoleMenus rm
+            JOIN Menus m ON m.Id = rm.MenuId
+            WHERE rm.RoleId = ? AND m.Status = '0'
+            ORDER BY m.ParentId, m.OrderNum
+        """, (self.pick(self.roles),)).fetchall()
+        nodes = {row[0]: {"id": row[0], "name": row[2], "children": []} for row in rows}
+        roots = []
+        for row in rows:
+            parent = nodes.get(row[1])
+            (parent["children"] if parent else roots).append(nodes[row[0]])
+        return roots
+
+    def dept_subtree(self):
+        dept_id = self.pick(self.departments)
+        prefix = f"{self.ancestors[dept_id]},{dept_id}"
+        self.conn.execute(
+            "SELECT Id, DeptName, ParentId FROM Departments WHERE Ancestors = ? OR Ancestors LIKE ? OR Id = ?",
+            (prefix, prefix + ",%", dept_id)).fetchall()
+
+def run_workload(operation, iterations, warmup):
+    """执行一个负载，返回统计结果（毫秒）"""
+    for _ in range(warmup):
+        operation()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter_ns()
+        operation()
+        latencies.append((time.perf_counter_ns() - op_started) / 1e6)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1],
+        "ops_per_sec": iterations / elapsed if elapsed > 0 else 0,
+    }
+
+def collect_meta(conn, db_path, args):
+    """记录本次运行的环境与数据规模，便于比较基线时确认条件一致"""
+    counts = {}
+    for table in ("Users", "Departments", "ProcessInstances", "TaskInstances", "Menus"):
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "sqlite_version": sqlite3.sqlite_version,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "db_bytes": os.path.getsize(db_path),
+        "row_counts": counts,
+        "seed": args.seed,
+        "iterations": args.iterations,
+    }
+
+def compare_results(current, baseline, threshold):
+    """与基线比较，返回退化列表 [(负载, 指标, 基线值, 当前值, 变化比例)]"""
+    regressions = []
+    for name, stats in current["workloads"].items():
+        base = baseline.get("workloads", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] > 0:
+            change = stats["p95_ms"] / base["p95_ms"] - 1
+            if change > threshold:
+                regressions.append((name, "p95_ms", base["p95_ms"], stats["p95_ms"], change))
+        if base["ops_per_sec"] > 0:
+            change = 1 - stats["ops_per_sec"] / base["ops_per_sec"]
+            if change > threshold:
+                regressions.append((name, "ops_per_sec", base["ops_per_sec"], stats["ops_per_sec"], -change))
+    return regressions
+
+def copy_database(source, target):
+    """用在线备份 API 复制数据库（包含尚未检查点的 WAL 内容，源库正在写入时也是一致的快照）"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+def prepare_database(args):
+    """复制数据库到临时文件，按需生成压测数据，返回副本路径"""
+    fd, work_path = tempfile.mkstemp(suffix=".db", prefix="workflow_bench_",
+                                     dir=os.path.dirname(os.path.abspath(args.db)))
+    os.close(fd)
+    copy_database(args.db, work_path)
+    if args.generate:
+        plan = LoadPlan(args)
+        plan.validate()
+        print(f"\n在副本上生成数据: {args.tenants} 个租户, {args.users:,} 个用户, {args.instances:,} 个流程实例...")
+        conn = sqlite3.connect(work_path)
+        try:
+            meter = RateMeter()
+            generate_tenant_data(conn, plan, range(args.tenants), args.chunk_size, meter, progress=False)
+            meter.report()
+        finally:
+            conn.close()
+    return work_path
+
+def parse_args(argv=None):
+    """解析命令行参数：数据规模参数沿用 generate_load_data.py"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--workloads", nargs="+", help="要执行的负载 (默认全部)")
+    parser.add_argument("--iterations", type=int, default=2000, help="每个负载的计时迭代次数")
+    parser.add_argument("--warmup", type=int, default=100, help="每个负载的预热次数")
+    parser.add_argument("--generate", action="store_true", help="先在副本上按规模参数生成压测数据")
+    parser.add_argument("--save", help="把结果保存为 JSON 基线")
+    parser.add_argument("--compare", help="与 JSON 基线比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的变化比例 (默认 0.2 即 20%%)")
+    parser.add_argument("--keep", action="store_true", help="保留测试用的数据库副本")
+    own, rest = parser.parse_known_args(argv)
+    if "-h" in rest or "--help" in rest:
+        parser.print_help()
+    args = parse_load_args(rest)
+    for key, value in vars(own).items():
+        setattr(args, key, value)
+    return args
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("工作流热点路径基准测试")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 2
+
+    work_path = prepare_database(args)
+    conn = get_connection(work_path)
+    try:
+        workloads = Workloads(conn, args.seed)
+        names = args.workloads or workloads.available()
+        skipped = [name for name in names if name not in workloads.available()]
+        if skipped:
+            print(f"\n跳过缺少数据的负载: {', '.join(skipped)}")
+        names = [name for name in names if name not in skipped]
+
+        results = {"meta": collect_meta(conn, work_path, args), "workloads": {}}
+        print(f"\n{'负载':<16} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9} {'ops/s':>10}")
+        for name in names:
+            stats = run_workload(getattr(workloads, name), args.iterations, args.warmup)
+            results["workloads"][name] = stats
+            print(f"{name:<18} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+                  f"{stats['max_ms']:>9.3f} {stats['ops_per_sec']:>10,.0f}")
+    finally:
+        conn.close()
+        if args.keep:
+            print(f"\n数据库副本: {work_path}")
+        else:
+            os.remove(work_path)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 结果已保存到 {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("row_counts") != results["meta"]["row_counts"]:
+            print("\n注意: 基线的数据规模与本次不同，比较结果仅供参考")
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ 发现 {len(regressions)} 项退化 (阈值 {args.threshold:.0%}):")
+            for name, metric, before, after, change in regressions:
+                print(f"   {name} {metric}: {before:,.3f} -> {after:,.3f} ({change:+.1%})")
+            return 1
+        print(f"\n✓ 与基线相比无退化 (阈值 {args.threshold:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+数据库健康与统计报告脚本
+通过 dbstat 与 sqlite_stat1 输出每个表/索引的空间占用、碎片与行数，并积累历史用于估算增长速度：
+
+- report: 统计各表/索引的页数、字节数、页内未使用字节、碎片率与行数；
+          行数与 sqlite_stat1 记录偏差较大（或没有统计信息）的表逐表执行 ANALYZE；
+          本次结果追加到历史文件（JSON Lines）
+- trend:  读取历史文件，按表/索引计算每天增长的字节数与行数，可导出 CSV 供绘图
+
+碎片率为 b-tree 按键顺序遍历叶子页时，与上一叶子页之间不连续的叶子页所占比例：后一页在前面，
+或两页之间夹有其他 b-tree 的页或空闲页即为不连续（本树的内部页、溢出页夹在中间不算）。页内未使用字节可由 VACUUM 回收，
+碎片率高说明顺序扫描时随机读多；VACUUM 之后应接近 0。sqlite_schema 的页在 VACUUM 时与各表交替分配，不统计碎片率。行数取自叶子页单元数（索引与 WITHOUT ROWID 表取全部单元数），是精确值。
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from init_database import DB_PATH
+from vacuum_database import format_bytes, get_database_size, pragma_value
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 叶子页按 b-tree 路径顺序与上一叶子页比较：seq 为页在本树全部页中按页号的序号，
+# 页号差等于序号差说明两页之间只有本树的页，否则为一次跳跃
+DBSTAT_SQL = """
+    SELECT name, COUNT(*), SUM(pgsize), SUM(unused),
+           COALESCE(SUM(ncell) FILTER (WHERE pagetype = 'leaf'), 0), COALESCE(SUM(ncell), 0),
+           COALESCE(SUM(pagetype = 'leaf'), 0),
+           COALESCE(SUM(NOT (pageno > previous AND pageno - previous = seq - previous_seq))
+                    FILTER (WHERE pagetype = 'leaf'), 0)
+    FROM (
+        SELECT name, pageno, pagetype, ncell, pgsize, unused, seq,
+               LAG(pageno) OVER leaves AS previous, LAG(seq) OVER leaves AS previous_seq
+        FROM (
+            SELECT name, path, pageno, pagetype, ncell, pgsize, unused,
+                   ROW_NUMBER() OVER (PARTITION BY name ORDER BY pageno) AS seq
+            FROM dbstat
+        )
+        WINDOW leaves AS (PARTITION BY name, pagetype = 'leaf' ORDER BY path)
+    )
+    GROUP BY name
+"""
+
+def get_connection(db_path, busy_timeout=5.0):
+    """获取数据库连接（自动提交模式）"""
+    return sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def default_history_path(db_path):
+    return db_path + ".stats.jsonl"
+
+def load_schema(conn):
+    """表/索引名 -> (类型, 所属表, 是否按键存储)；按键存储指索引与 WITHOUT ROWID 表，行数取全部单元数"""
+    schema = {}
+    for kind, name, table, sql in conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_schema "
+                                               "WHERE type IN ('table', 'index')"):
+        keyed = kind == "index" or "WITHOUT ROWID" in (sql or "").upper()
+        schema[name] = (kind, table, keyed)
+    return schema
+
+def collect_objects(conn, schema):
+    """dbstat 统计每个 b-tree，返回 {名称: 统计字典}；dbstat 不可用时返回 None"""
+    try:
+        rows = conn.execute(DBSTAT_SQL).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    objects = {}
+    for name, pages, size, unused, leaf_cells, cells, leaves, jumps in rows:
+        kind, table, keyed = schema.get(name, ("table", name, False))
+        fragmentation = None if name == "sqlite_schema" else round(jumps / leaves, 4) if leaves else 0.0
+        objects[name] = {"type": kind, "table": table, "pages": pages, "bytes": size, "unused": unused,
+                         "fragmentation": fragmentation,
+                         "rows": cells if keyed else leaf_cells}
+    return objects
+
+def count_rows(conn, schema):
+    """没有 dbstat 时退化为逐表 COUNT(*)，只有行数"""
+    return {name: {"type": "table", "table": name, "pages": None, "bytes": None, "unused": None,
+                   "fragmentation": None, "rows": conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]}
+            for name, (kind, _, _) in schema.items() if kind == "table" and not name.startswith("sqlite_")}
+
+def load_stat1(conn):
+    """sqlite_stat1 中每个表 ANALYZE 时的行数；没有执行过 ANALYZE 时为空"""
+    if not conn.execute("SELECT 1 FROM sqlite_schema WHERE name = 'sqlite_stat1'").fetchone():
+        return {}
+    analyzed = {}
+    for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+        rows = int(stat.split()[0]) if stat else 0
+        analyzed[table] = max(analyzed.get(table, 0), rows)
+    return analyzed
+
+def stale_tables(objects, analyzed, min_rows, max_drift):
+    """统计信息过期的表：没有 stat1 记录，或当前行数与记录偏差超过 max_drift；行数少于 min_rows 的表忽略"""
+    stale = []
+    for name, item in objects.items():
+        if item["type"] != "table" or name.startswith("sqlite_") or item["rows"] < min_rows:
+            continue
+        recorded = analyzed.get(name)
+        if recorded is None or abs(item["rows"] - recorded) > max(recorded, 1) * max_drift:
+            stale.append(name)
+    return sorted(stale)
+
+def analyze_tables(conn, tables, analysis_limit):
+    """逐表 ANALYZE，每张表一个短事务；返回 {表: 用时秒}"""
+    if analysis_limit:
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+    timings = {}
+    for table in tables:
+        started = time.perf_counter()
+        conn.execute(f'ANALYZE "{table}"')
+        timings[table] = time.perf_counter() - started
+    return timings
+
+def take_snapshot(conn, db_path, objects, analyzed_now):
+    """本次运行的历史记录"""
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "fileBytes": get_database_size(db_path)[0],
+        "pageSize": pragma_value(conn, "page_size"),
+        "pageCount": pragma_value(conn, "page_count"),
+        "freelistCount": pragma_value(conn, "freelist_count"),
+        "analyzed": sorted(analyzed_now),
+        "objects": objects,
+    }
+
+def append_history(path, snapshot):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+def load_history(path, days=None):
+    """读取历史记录（按时间顺序），days 限定最近若干天；损坏的行跳过"""
+    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                moment = datetime.fromisoformat(record["time"])
+            except (ValueError, KeyError):
+                continue
+            if since is None or moment >= since:
+                records.append((moment, record))
+    records.sort(key=lambda entry: entry[0])
+    return records
+
+def growth_rates(records):
+    """每个表/索引从首次出现到最近一次记录的日均增长，返回 [(名称, 类型, 当前字节, 字节/天, 当前行数, 行/天)]"""
+    first, last = {}, {}
+    for moment, record in records:
+        for name, item in record["objects"].items():
+            first.setdefault(name, (moment, item))
+            last[name] = (moment, item)
+    rates = []
+    for name, (end_time, end) in last.items():
+        start_time, start = first[name]
+        days = (end_time - start_time).total_seconds() / 86400
+        per_day = (lambda key: (end[key] - start[key]) / days
+                   if days and end[key] is not None and start[key] is not None else None)
+        rates.append((name, end["type"], end["bytes"], per_day("bytes"), end["rows"], per_day("rows")))
+    return rates
+
+def export_csv(records, path):
+    """导出长表格式 (时间, 名称, 类型, 字节, 未使用字节, 行数)，便于绘图"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time", "name", "type", "bytes", "unused", "rows"])
+        for moment, record in records:
+            for name, item in sorted(record["objects"].items()):
+                writer.writerow([moment.isoformat(), name, item["type"], item["bytes"], item["unused"], item["rows"]])
+
+def print_objects(objects, analyzed, stale, top):
+    """输出占用最多的表/索引"""
+    ordered = sorted(objects.items(), key=lambda entry: -(entry[1]["bytes"] or entry[1]["rows"]))
+    print(f"\n占用空间最多的 {min(top, len(ordered))} 个表/索引 (共 {len(ordered)} 个):")
+    print(f"   {'名称':<46} {'类型':<6} {'页数':>9} {'大小(MB)':>10} {'未使用':>7} {'碎片':>7} "
+          f"{'行数':>12} {'stat1 行数':>12}")
+    for name, item in ordered[:top]:
+        recorded = analyzed.get(name) if item["type"] == "table" else None
+        size = f"{item['bytes'] / (1024 * 1024):>10.2f}" if item["bytes"] is not None else f"{'-':>10}"
+        pages = f"{item['pages']:>9,}" if item["pages"] is not None else f"{'-':>9}"
+        unused = f"{item['unused'] / item['bytes']:>7.1%}" if item["bytes"] else f"{'-':>7}"
+        fragmentation = f"{item['fragmentation']:>7.1%}" if item["fragmentation"] is not None else f"{'-':>7}"
+        stat = f"{recorded:>12,}" if recorded is not None else f"{'-':>12}"
+        print(f"   {name[:46]:<46} {item['type']:<6} {pages} {size} {unused} {fragmentation} "
+              f"{item['rows']:>12,} {stat}{'  *' if name in stale else ''}")
+
+def print_trend(rates, top):
+    """输出增长最快的表/索引"""
+    rates = sorted(rates, key=lambda rate: -(rate[3] if rate[3] is not None else rate[5] or 0))
+    print(f"\n   {'名称':<46} {'类型':<6} {'当前(MB)':>10} {'MB/天':>10} {'当前行数':>12} {'行/天':>12}")
+    for name, kind, size, bytes_per_day, rows, rows_per_day in rates[:top]:
+        current = f"{size / (1024 * 1024):>10.2f}" if size is not None else f"{'-':>10}"
+        per_day = f"{bytes_per_day / (1024 * 1024):>10.3f}" if bytes_per_day is not None else f"{'-':>10}"
+        rows_rate = f"{rows_per_day:>12,.0f}" if rows_per_day is not None else f"{'-':>12}"
+        print(f"   {name[:46]:<46} {kind:<6} {current} {per_day} {rows:>12,} {rows_rate}")
+
+def run_report(args):
+    """report 子命令"""
+    conn = get_connection(args.db)
+    try:
+        started = time.perf_counter()
+        schema = load_schema(conn)
+        objects = collect_objects(conn, schema)
+        if objects is None:
+            print("\n(当前 SQLite 未启用 dbstat，只统计各表行数)")
+            objects = count_rows(conn, schema)
+        print(f"\n统计完成, 用时 {time.perf_counter() - started:.2f}s")
+        print(f"   文件: {format_bytes(get_database_size(args.db)[0])}")
+        print(f"   页大小: {pragma_value(conn, 'page_size'):,} 字节, 总页数: {pragma_value(conn, 'page_count'):,}, "
+              f"空闲页: {pragma_value(conn, 'freelist_count'):,}")
+
+        analyzed = load_stat1(conn)
+        stale = stale_tables(objects, analyzed, args.min_rows, args.max_drift)
+        print_objects(objects, analyzed, stale, args.top)
+        timings = {}
+        if stale:
+            print(f"\n统计信息过期的表 (*): {len(stale)} 个")
+            if args.no_analyze:
+                print("   已跳过 ANALYZE (--no-analyze)")
+            else:
+                timings = analyze_tables(conn, stale, args.analysis_limit)
+                for table, seconds in timings.items():
+                    print(f"   ✓ ANALYZE {table} ({seconds:.2f}s)")
+        else:
+            print("\n✓ 统计信息均为最新")
+
+        if not args.no_history:
+            history = args.history or default_history_path(args.db)
+            append_history(history, take_snapshot(conn, args.db, objects, timings))
+            print(f"\n✓ 已追加到历史文件 {history}")
+        return 0
+    finally:
+        conn.close()
+
+def run_trend(args):
+    """trend 子命令"""
+    history = args.history or default_history_path(args.db)
+    if not os.path.exists(history):
+        print(f"错误: 历史文件不存在: {history}（先执行 report）")
+        return 1
+    records = load_history(history, args.days)
+    if len(records) < 2:
+        print(f"\n历史记录不足两次 ({len(records)} 次)，无法计算增长")
+        return 1
+    span = (records[-1][0] - records[0][0]).total_seconds() / 86400
+    print(f"\n{len(records)} 次记录, 跨度 {span:.1f} 天 ({records[0][0]:%Y-%m-%d} ~ {records[-1][0]:%Y-%m-%d})")
+    first_bytes, last_bytes = records[0][1]["fileBytes"], records[-1][1]["fileBytes"]
+    if span:
+        print(f"   文件: {format_bytes(last_bytes)}, 日均增长 {(last_bytes - first_bytes) / span / (1024 * 1024):.3f} MB")
+    print_trend(growth_rates(records), args.top)
+    if args.csv:
+        export_csv(records, args.csv)
+        print(f"\n✓ 已导出 {args.csv}")
+    return 0
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据库健康与统计报告")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("report", "统计表/索引并记录历史"), ("trend", "按历史计算增长速度")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+        command.add_argument("--history", help="历史文件路径（默认 <数据库>.stats.jsonl）")
+        command.add_argument("--top", type=int, default=20, help="输出前 N 个表/索引")
+        if name == "report":
+            command.add_argument("--no-analyze", action="store_true", help="只报告过期的统计信息，不执行 ANALYZE")
+            command.add_argument("--no-history", action="store_true", help="不追加历史记录")
+            command.add_argument("--min-rows", type=int, default=1000, help="行数少于该值的表不检查统计信息")
+            command.add_argument("--max-drift", type=float, default=0.2,
+                                 help="行数与 sqlite_stat1 记录的相对偏差超过该值时视为过期")
+            command.add_argument("--analysis-limit", type=int, default=0,
+                                 help="PRAGMA analysis_limit，大表近似统计以缩短 ANALYZE 时间（0 为精确）")
+        if name == "trend":
+            command.add_argument("--days", type=float, help="只使用最近若干天的记录")
+            command.add_argument("--csv", help="导出长表格式 CSV")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("数据库健康与统计报告")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    try:
+        return run_report(args) if args.command == "report" else run_trend(args)
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+部门树闭包表维护脚本
+维护 DepartmentClosure(AncestorId, DescendantId, Depth)，每个部门与其每个祖先（含自身，Depth=0）各一行，
+子树与祖先查询变为主键/索引上的区间查找，不再依赖 Ancestors LIKE 前缀扫描：
+
+- build:     全量重建闭包表
+- refresh:   增量刷新，只重算新增、移动、删除的部门所在子树
+- validate:  按 ParentId 一次深度优先遍历重算 Ancestors，报告（--repair 时修复）漂移、孤儿和环
+- benchmark: 在数据库副本上比较闭包表查询与 LIKE 前缀查询的延迟
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmark_workflow import run_workload, sample_column
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+CLOSURE_DDL = (
+    """CREATE TABLE IF NOT EXISTS DepartmentClosure (
+        AncestorId INTEGER NOT NULL,
+        DescendantId INTEGER NOT NULL,
+        Depth INTEGER NOT NULL,
+        PRIMARY KEY (AncestorId, DescendantId)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS IX_DepartmentClosure_DescendantId_Depth ON DepartmentClosure (DescendantId, Depth)",
+)
+
+# 子树：主键 (AncestorId, DescendantId) 上的区间查找
+SUBTREE_SQL = """
+    SELECT d.Id, d.DeptName, d.ParentId
+    FROM DepartmentClosure c
+    JOIN Departments d ON d.Id = c.DescendantId
+    WHERE c.AncestorId = ?
+"""
+
+# 祖先链（根在前）：(DescendantId, Depth) 索引上的区间查找
+ANCESTORS_SQL = """
+    SELECT d.Id, d.DeptName, d.ParentId
+    FROM DepartmentClosure c
+    JOIN Departments d ON d.Id = c.AncestorId
+    WHERE c.DescendantId = ? AND c.Depth > 0
+    ORDER BY c.Depth DESC
+"""
+
+# 现有做法：按 Ancestors 前缀匹配子树
+LIKE_SUBTREE_SQL = "SELECT Id, DeptName, ParentId FROM Departments WHERE Ancestors = ? OR Ancestors LIKE ? OR Id = ?"
+
+def get_connection(db_path, busy_timeout=5.0):
+    """获取数据库连接（自动提交模式，事务显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def ensure_closure_table(conn):
+    """创建闭包表及反向索引"""
+    for ddl in CLOSURE_DDL:
+        conn.execute(ddl)
+
+def resolve_parents(raw):
+    """
+    把 {部门Id: ParentId} 规范化：ParentId 为空、为 0 或指向不存在的部门时视为根
+    返回 (父节点映射, 孤儿部门Id列表)
+    """
+    parents, orphans = {}, []
+    for dept_id, parent_id in raw.items():
+        if parent_id in (None, 0):
+            parents[dept_id] = None
+        elif parent_id not in raw:
+            parents[dept_id] = None
+            orphans.append(dept_id)
+        else:
+            parents[dept_id] = parent_id
+    return parents, orphans
+
+def load_parent_map(conn):
+    """读取并规范化部门父子关系"""
+    return resolve_parents(dict(conn.execute("SELECT Id, ParentId FROM Departments")))
+
+def build_children(parents):
+    """{父Id: [子Id...]}"""
+    children = {}
+    for dept_id, parent_id in parents.items():
+        children.setdefault(parent_id, []).append(dept_id)
+    return children
+
+def ancestor_chain(parents, dept_id):
+    """从根到 dept_id 父节点的祖先列表；遇到环时抛出异常"""
+    chain, seen = [], {dept_id}
+    parent_id = parents.get(dept_id)
+    while parent_id is not None:
+        if parent_id in seen:
+            raise ValueError(f"部门 {dept_id} 的祖先链存在环")
+        seen.add(parent_id)
+        chain.append(parent_id)
+        parent_id = parents.get(parent_id)
+    chain.reverse()
+    return chain
+
+def closure_rows(top, chain, children, visited):
+    """
+    从 top 深度优先遍历子树，按路径栈生成闭包行 (AncestorId, DescendantId, Depth)
+    chain 为 top 的祖先（根在前）；visited 记录已输出的节点
+    """
+    path = list(chain)
+    stack = [(top, len(chain))]
+    while stack:
+        dept_id, level = stack.pop()
+        if dept_id in visited:
+            continue
+        visited.add(dept_id)
+        del path[level:]
+        path.append(dept_id)
+        for index, ancestor_id in enumerate(path):
+            yield ancestor_id, dept_id, level - index
+        for child_id in children.get(dept_id, ()):
+            stack.append((child_id, level + 1))
+
+def insert_closure(conn, rows, batch_size):
+    """分批 executemany 写入闭包行，返回行数"""
+    total, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.executemany("INSERT INTO DepartmentClosure (AncestorId, DescendantId, Depth) VALUES (?, ?, ?)", batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO DepartmentClosure (AncestorId, DescendantId, Depth) VALUES (?, ?, ?)", batch)
+        total += len(batch)
+    return total
+
+def build_closure(conn, batch_size):
+    """全量重建：清空闭包表后从所有根遍历写入；返回 (写入行数, 部门数, 未到达的部门数)"""
+    parents, _ = load_parent_map(conn)
+    children = build_children(parents)
+    visited = set()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ensure_closure_table(conn)
+        conn.execute("DELETE FROM DepartmentClosure")
+        written = 0
+        for root_id in children.get(None, ()):
+            written += insert_closure(conn, closure_rows(root_id, [], children, visited), batch_size)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return written, len(parents), len(parents) - len(visited)
+
+def refresh_closure(conn, batch_size):
+    """
+    增量刷新：用闭包表中 Depth<=1 的行还原上次刷新时的父子关系，与 Departments 比较
+    - 新增或父节点变化的部门：删除其子树的全部闭包行后按新祖先链重写（同一子树只处理最上层的变更节点）
+    - 已删除的部门：删除以其为祖先或后代的行
+    返回 (变更子树数, 删除行数, 写入行数, 已删除部门数)
+    """
+    ensure_closure_table(conn)
+    parents, _ = load_parent_map(conn)
+    children = build_children(parents)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        known = {}
+        for descendant_id, ancestor_id, depth in conn.execute(
+                "SELECT DescendantId, AncestorId, Depth FROM DepartmentClosure WHERE Depth <= 1"):
+            if depth == 1:
+                known[descendant_id] = ancestor_id
+            else:
+                known.setdefault(descendant_id, None)
+        removed = [dept_id for dept_id in known if dept_id not in parents]
+        dirty = {dept_id for dept_id, parent_id in parents.items()
+                 if dept_id not in known or known[dept_id] != parent_id}
+        tops = [dept_id for dept_id in dirty if not any(a in dirty for a in ancestor_chain(parents, dept_id))]
+
+        deleted = 0
+        for column in ("DescendantId", "AncestorId"):
+            before = conn.total_changes
+            conn.executemany(f"DELETE FROM DepartmentClosure WHERE {column} = ?", [(i,) for i in removed])
+            deleted += conn.total_changes - before
+        written = 0
+        for top in tops:
+            subtree, stack = [], [top]
+            while stack:
+                dept_id = stack.pop()
+                subtree.append((dept_id,))
+                stack.extend(children.get(dept_id, ()))
+            before = conn.total_changes
+            conn.executemany("DELETE FROM DepartmentClosure WHERE DescendantId = ?", subtree)
+            deleted += conn.total_changes - before
+            written += insert_closure(
+                conn, closure_rows(top, ancestor_chain(parents, top), children, set()), batch_size)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(tops), deleted, written, len(removed)
+
+def validate_ancestors(conn, repair, batch_size):
+    """
+    按 ParentId 一次深度优先遍历计算期望的 Ancestors（根为 "0"，子节点为 父节点串 + "," + 父Id），
+    遍历过程中逐个比较并流式输出需修复的行；repair 时分批 UPDATE
+    返回 (检查数, 漂移数, 孤儿列表, 未校验的部门数)
+    """
+    stored = {}
+    raw_parents = {}
+    for dept_id, parent_id, ancestors in conn.execute("SELECT Id, ParentId, Ancestors FROM Departments"):
+        stored[dept_id] = ancestors
+        raw_parents[dept_id] = parent_id
+    parents, orphans = resolve_parents(raw_parents)
+    children = build_children(parents)
+    orphan_set = set(orphans)
+
+    def traverse():
+        # 孤儿子树无法确定正确祖先，只遍历真正的根
+        stack = [(root_id, "0") for root_id in children.get(None, ()) if root_id not in orphan_set]
+        while stack:
+            dept_id, expected = stack.pop()
+            visited.add(dept_id)
+            if stored[dept_id] != expected:
+                yield expected, dept_id
+            child_prefix = f"{expected},{dept_id}"
+            for child_id in children.get(dept_id, ()):
+                stack.append((child_id, child_prefix))
+
+    visited = set()
+    drift, batch, samples = 0, [], []
+    if repair:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        for expected, dept_id in traverse():
+            drift += 1
+            if len(samples) < 10:
+                samples.append((dept_id, stored[dept_id], expected))
+            if repair:
+                batch.append((expected, dept_id))
+                if len(batch) >= batch_size:
+                    conn.executemany("UPDATE Departments SET Ancestors = ? WHERE Id = ?", batch)
+                    batch = []
+        if repair:
+            if batch:
+                conn.executemany("UPDATE Departments SET Ancestors = ? WHERE Id = ?", batch)
+            conn.execute("COMMIT")
+    except Exception:
+        if repair:
+            conn.execute("ROLLBACK")
+        raise
+    for dept_id, current, expected in samples:
+        print(f"   ~ {dept_id}: {current!r} -> {expected!r}")
+    return len(visited), drift, orphans, len(parents) - len(visited)
+
+def run_benchmark(db_path, samples, iterations, warmup, seed):
+    """在副本上构建闭包表，先核对两种查询结果一致，再分别计时"""
+    work_dir = tempfile.mkdtemp(prefix="workflow_closure_")
+    bench_path = os.path.join(work_dir, "bench.db")
+    try:
+        shutil.copy2(db_path, bench_path)
+        conn = get_connection(bench_path)
+        rows, _, _ = build_closure(conn, 10000)
+        print(f"   闭包表 {rows:,} 行")
+        rng = random.Random(seed)
+        subtree_ids = sample_column(
+            conn, "SELECT Id FROM Departments WHERE Id IN (SELECT DISTINCT ParentId FROM Departments)", rng, samples)
+        leaf_ids = sample_column(conn, "SELECT Id FROM Departments", rng, samples)
+        ancestors = dict(conn.execute("SELECT Id, Ancestors FROM Departments"))
+        if not subtree_ids:
+            raise RuntimeError("没有含下级的部门，无法测试子树查询")
+
+        def like_subtree(dept_id):
+            prefix = f"{ancestors[dept_id]},{dept_id}"
+            return conn.execute(LIKE_SUBTREE_SQL, (prefix, prefix + ",%", dept_id)).fetchall()
+
+        def like_ancestors(dept_id):
+            ids = [int(value) for value in ancestors[dept_id].split(",") if value != "0"]
+            if not ids:
+                return []
+            rows = conn.execute("SELECT Id, DeptName, ParentId FROM Departments WHERE Id IN (%s)" % ", ".join(
+                "?" * len(ids)), ids).fetchall()
+            order = {value: index for index, value in enumerate(ids)}
+            return sorted(rows, key=lambda row: order[row[0]])
+
+        mismatched = sum(1 for dept_id in subtree_ids
+                         if sorted(like_subtree(dept_id)) != sorted(conn.execute(SUBTREE_SQL, (dept_id,)).fetchall()))
+        mismatched += sum(1 for dept_id in leaf_ids
+                          if like_ancestors(dept_id) != conn.execute(ANCESTORS_SQL, (dept_id,)).fetchall())
+        if mismatched:
+            print(f"   ⚠ {mismatched} 个样本两种查询结果不一致，请先执行 validate --repair")
+
+        def cycle(values, query):
+            position = [0]
+
+            def operation():
+                position[0] += 1
+                return query(values[position[0] % len(values)])
+            return operation
+
+        cases = [
+            ("subtree_like", cycle(subtree_ids, like_subtree)),
+            ("subtree_closure", cycle(subtree_ids, lambda i: conn.execute(SUBTREE_SQL, (i,)).fetchall())),
+            ("ancestors_split", cycle(leaf_ids, like_ancestors)),
+            ("ancestors_closure", cycle(leaf_ids, lambda i: conn.execute(ANCESTORS_SQL, (i,)).fetchall())),
+        ]
+        results = {name: run_workload(operation, iterations, warmup) for name, operation in cases}
+        conn.close()
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="部门树闭包表维护")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("build", "全量重建闭包表"), ("refresh", "增量刷新闭包表"),
+                            ("validate", "按 ParentId 校验 Ancestors"), ("benchmark", "闭包表与 LIKE 查询对比")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+        command.add_argument("--batch-size", type=int, default=5000, help="每次 executemany 的行数")
+        if name == "validate":
+            command.add_argument("--repair", action="store_true", help="修复漂移的 Ancestors")
+        if name == "benchmark":
+            command.add_argument("--samples", type=int, default=200, help="采样部门数")
+            command.add_argument("--iterations", type=int, default=1000, help="每种查询的计时次数")
+            command.add_argument("--warmup", type=int, default=50, help="预热次数")
+            command.add_argument("--seed", type=int, default=42, help="采样随机种子")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("部门树闭包表维护脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    try:
+        if args.command == "benchmark":
+            print(f"\n在副本上测试 ({args.iterations:,} 次/查询)...")
+            results = run_benchmark(args.db, args.samples, args.iterations, args.warmup, args.seed)
+            print(f"\n{'查询':<20} {'平均(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'ops/s':>10}")
+            for name, stats in results.items():
+                print(f"{name:<20} {stats['mean_ms']:>10.3f} {stats['p50_ms']:>10.3f} "
+                      f"{stats['p95_ms']:>10.3f} {stats['ops_per_sec']:>10,.0f}")
+            for kind, baseline in (("subtree", "subtree_like"), ("ancestors", "ancestors_split")):
+                closure = results[f"{kind}_closure"]["mean_ms"]
+                if closure > 0:
+                    print(f"   {kind}: 闭包表为原做法的 {results[baseline]['mean_ms'] / closure:.1f} 倍速度")
+            return 0
+
+        conn = get_connection(args.db)
+        try:
+            started = time.perf_counter()
+            if args.command == "build":
+                written, total, unreachable = build_closure(conn, args.batch_size)
+                print(f"\n✓ 已重建: {total:,} 个部门, {written:,} 行闭包记录")
+                if unreachable:
+                    print(f"   ⚠ {unreachable} 个部门因 ParentId 成环未写入")
+            elif args.command == "refresh":
+                tops, deleted, written, removed = refresh_closure(conn, args.batch_size)
+                if not (tops or removed):
+                    print("\n✓ 闭包表已是最新")
+                else:
+                    print(f"\n✓ 已刷新: {tops} 个子树, {removed} 个已删除部门; 删除 {deleted:,} 行, 写入 {written:,} 行")
+            else:
+                checked, drift, orphans, unchecked = validate_ancestors(conn, args.repair, args.batch_size)
+                print(f"\n检查 {checked:,} 个部门, Ancestors 漂移 {drift:,} 个" + (" (已修复)" if args.repair and drift else ""))
+                if orphans:
+                    print(f"   ⚠ {len(orphans)} 个部门的 ParentId 指向不存在的部门 (示例: {orphans[:5]})")
+                if unchecked:
+                    print(f"   ⚠ {unchecked} 个部门位于孤儿子树或 ParentId 环中，未校验")
+                if drift and not args.repair:
+                    print("   使用 --repair 修复")
+            print(f"   用时 {time.perf_counter() - started:.2f}s")
+        finally:
+            conn.close()
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
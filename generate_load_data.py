@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+压测数据生成脚本
+按可配置规模向数据库生成租户、部门树、用户、流程定义、流程实例和任务实例，
+用于在本地复现待办列表、实例列表等慢查询。
+
+- 流式生成：按块 executemany 写入并提交，内存占用与总行数无关
+- 可复现：相同 --seed 与规模参数总是生成完全相同的数据（包括并发戳和时间）
+- Id 沿用 init_database.py 的 64 位分段方案，生成数据从段内偏移处起步，不与种子数据冲突
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from init_database import (
+    AUDIT_COLUMNS, BUSINESS_USER_COLUMNS, DB_PATH, DEPARTMENT_COLUMNS, TENANT_COLUMNS, insert_rows,
+)
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+INT64_MAX = 2 ** 63 - 1
+
+# 生成数据在各 Id 段内的起始偏移，段首保留给 init_database.py 的种子行
+GENERATED_OFFSET = 10 ** 15
+
+# 各表 Id 段起点（与 init_database.py 一致：用户 1e18、部门 2e18 ...），段宽 1e18
+ID_BASES = {
+    "Users": 1000000000000000000,
+    "Departments": 2000000000000000000,
+    "ProcessDefinitions": 8000000000000000000,
+    "ProcessInstances": 8100000000000000000,
+    "TaskInstances": 8500000000000000000,
+}
+
+# 租户 Id 为小整数，业务表中的 TenantId 使用由其派生的 Guid（与 database-init.sql 的写法一致）
+TENANT_ID_BASE = 1000
+
+# 每个流程实例最多生成的任务数，任务 Id = 段起点 + 实例序号 * MAX_TASKS_PER_INSTANCE + 节点序号
+MAX_TASKS_PER_INSTANCE = 8
+
+# 流程实例按全局序号分块使用独立随机流，按块边界切分 Id 区间时生成结果不变
+INSTANCE_BLOCK_SIZE = 10000
+
+# 固定的数据基准时间，保证同一种子生成的数据逐字节一致
+DEFAULT_BASE_TIME = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+PROCESS_TEMPLATES = [
+    ("leave", "请假审批"),
+    ("expense", "费用报销"),
+    ("purchase", "采购申请"),
+    ("travel", "出差申请"),
+    ("contract", "合同审批"),
+]
+
+APPROVAL_NODES = ["部门主管审批", "部门经理审批", "财务审核", "人事审核", "总经理审批", "董事长审批", "归档", "抄送"]
+
+# 状态 / 优先级分布（取值, 权重）
+INSTANCE_STATUS_WEIGHTS = (("Running", 25), ("Completed", 65), ("Terminated", 10))
+TASK_PRIORITY_WEIGHTS = ((0, 70), (1, 20), (2, 8), (3, 2))
+
+PROCESS_DEFINITION_COLUMNS = ("Id", "Name", "Key", "Version", "Description", "Content", "ContentFormat", "IsEnabled", "TenantId")
+
+PROCESS_INSTANCE_COLUMNS = (
+    "Id", "ProcessDefinitionId", "BusinessKey", "Title", "InitiatorId", "Status", "Variables",
+    "StartTime", "EndTime", "TenantId", "CreationTime", "LastModificationTime", "ExtraProperties", "ConcurrencyStamp",
+)
+
+TASK_INSTANCE_COLUMNS = (
+    "Id", "ProcessInstanceId", "NodeId", "Name", "TaskType", "AssigneeId", "CandidateUsers", "CandidateGroups",
+    "Status", "Priority", "DueDate", "CompleteTime", "Variables", "Comment", "TenantId",
+    "CreationTime", "LastModificationTime", "ExtraProperties", "ConcurrencyStamp",
+)
+
+def get_connection(db_path):
+    """获取数据库连接"""
+    return sql_profiler.connect(db_path)
+
+def split_evenly(total, parts, index):
+    """把 total 均分为 parts 份，返回第 index 份的 (起始偏移, 数量)"""
+    size, remainder = divmod(total, parts)
+    return index * size + min(index, remainder), size + (1 if index < remainder else 0)
+
+def tree_size(depth, fanout):
+    """给定层数与扇出时，一棵部门树的节点总数"""
+    return sum(fanout ** level for level in range(depth))
+
+def tenant_guid(tenant_id):
+    """由租户整数 Id 派生业务表使用的 TenantId"""
+    return str(uuid.UUID(int=tenant_id))
+
+def segment_end(table):
+    """表 Id 段的上界（下一个段的起点）"""
+    base = ID_BASES[table]
+    return min((b for b in ID_BASES.values() if b > base), default=INT64_MAX)
+
+def check_id_capacity(table, last_id):
+    """确认生成的最大 Id 没有越过下一个 Id 段"""
+    upper = segment_end(table)
+    if last_id >= upper:
+        raise ValueError(f"{table} 的 Id 超出分段上限: {last_id} >= {upper}")
+
+def weighted_choice(rng, weights):
+    """按 (取值, 权重) 列表抽样"""
+    values, probs = zip(*weights)
+    return rng.choices(values, probs)[0]
+
+def stamp(rng):
+    """由随机源生成可复现的并发戳"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def iso(moment):
+    """与 init_database.py 一致的时间格式"""
+    return moment.isoformat()
+
+class LoadPlan:
+    """生成规模与各租户 Id 区间的计算，生成器按租户独立工作"""
+
+    def __init__(self, args):
+        self.seed = args.seed
+        self.tenants = args.tenants
+        self.dept_depth = args.dept_depth
+        self.dept_fanout = args.dept_fanout
+        self.users = args.users
+        self.instances = args.instances
+        self.max_tasks = min(args.max_tasks, MAX_TASKS_PER_INSTANCE)
+        self.days = args.days
+        self.base_time = args.base_time
+        self.depts_per_tenant = tree_size(self.dept_depth, self.dept_fanout)
+
+    def rng(self, table, tenant_index):
+        """每个 (表, 租户) 使用独立随机流，结果与生成顺序和分片方式无关"""
+        return random.Random(f"{self.seed}:{table}:{tenant_index}")
+
+    def tenant_id(self, tenant_index):
+        return TENANT_ID_BASE + tenant_index
+
+    def dept_range(self, tenant_index):
+        start = ID_BASES["Departments"] + GENERATED_OFFSET + tenant_index * self.depts_per_tenant
+        return start, self.depts_per_tenant
+
+    def user_range(self, tenant_index):
+        offset, count = split_evenly(self.users, self.tenants, tenant_index)
+        return ID_BASES["Users"] + GENERATED_OFFSET + offset, count
+
+    def definition_range(self, tenant_index):
+        start = ID_BASES["ProcessDefinitions"] + GENERATED_OFFSET + tenant_index * len(PROCESS_TEMPLATES)
+        return start, len(PROCESS_TEMPLATES)
+
+    def instance_range(self, tenant_index):
+        offset, count = split_evenly(self.instances, self.tenants, tenant_index)
+        return offset, count
+
+    def validate(self):
+        """生成前检查所有 Id 段容量"""
+        last = self.tenants - 1
+        dept_start, dept_count = self.dept_range(last)
+        user_start, user_count = self.user_range(last)
+        def_start, def_count = self.definition_range(last)
+        check_id_capacity("Departments", dept_start + dept_count)
+        check_id_capacity("Users", user_start + user_count)
+        check_id_capacity("ProcessDefinitions", def_start + def_count)
+        check_id_capacity("ProcessInstances", ID_BASES["ProcessInstances"] + GENERATED_OFFSET + self.instances)
+        check_id_capacity("TaskInstances",
+                          ID_BASES["TaskInstances"] + GENERATED_OFFSET + self.instances * MAX_TASKS_PER_INSTANCE)
+
+def generate_tenants(plan, tenant_indexes):
+    """租户行"""
+    now = iso(plan.base_time)
+    for index in tenant_indexes:
+        rng = plan.rng("Tenants", index)
+        tenant_id = plan.tenant_id(index)
+        yield (tenant_id, f"压测租户{index + 1:04d}", f"load-tenant-{index + 1:04d}",
+               f"tenant{index + 1}@example.com", 1, 0, now, now, "{}", stamp(rng))
+
+def generate_departments(plan, tenant_index):
+    """深度优先生成一棵部门树，Ancestors 为从根到父节点的逗号串（与 init_departments 一致）"""
+    rng = plan.rng("Departments", tenant_index)
+    tenant = tenant_guid(plan.tenant_id(tenant_index))
+    now = iso(plan.base_time)
+    next_id, _ = plan.dept_range(tenant_index)
+    # 栈元素: (层级, 父Id, 祖先串, 同级序号, 编码)
+    stack = [(0, None, "0", 1, f"T{tenant_index + 1:04d}")]
+    while stack:
+        level, parent_id, ancestors, order_num, code = stack.pop()
+        dept_id = next_id
+        next_id += 1
+        name = "总公司" if level == 0 else f"部门{code.split('-', 1)[-1]}"
+        status = "0" if rng.random() < 0.97 else "1"
+        yield (dept_id, name, code, parent_id, ancestors, order_num, status, tenant) + (0, now, now, "{}", stamp(rng))
+        if level + 1 < plan.dept_depth:
+            child_ancestors = f"{ancestors},{dept_id}"
+            for child in range(plan.dept_fanout, 0, -1):
+                stack.append((level + 1, dept_id, child_ancestors, child, f"{code}-{child}"))
+
+def generate_users(plan, tenant_index):
+    """业务用户行，均匀分布到租户内各部门"""
+    rng = plan.rng("Users", tenant_index)
+    tenant = tenant_guid(plan.tenant_id(tenant_index))
+    dept_start, dept_count = plan.dept_range(tenant_index)
+    user_start, user_count = plan.user_range(tenant_index)
+    now = iso(plan.base_time)
+    for offset in range(user_count):
+        user_id = user_start + offset
+        user_name = f"u{tenant_index + 1:04d}_{offset + 1:07d}"
+        manager_id = user_start + rng.randrange(offset) if offset else None
+        yield (user_id, None, stamp(rng), now, None, None, None,
+               dept_start + rng.randrange(dept_count), f"{user_name}@example.com", "{}", 0,
+               1 if rng.random() < 0.95 else 0, None, None, manager_id, "", None,
+               f"用户{tenant_index + 1}-{offset + 1}", tenant, user_name)
+
+def generate_definitions(plan, tenant_index):
+    """每个租户一组流程定义"""
+    rng = plan.rng("ProcessDefinitions", tenant_index)
+    tenant = tenant_guid(plan.tenant_id(tenant_index))
+    start, _ = plan.definition_range(tenant_index)
+    now = iso(plan.base_time)
+    for offset, (key, name) in enumerate(PROCESS_TEMPLATES):
+        content = json.dumps({"nodes": APPROVAL_NODES[:plan.max_tasks]}, ensure_ascii=False)
+        yield (start + offset, name, key, 1, f"{name}流程", content, "JSON", 1, tenant) + (0, now, now, "{}", stamp(rng))
+
+def instance_blocks(plan, tenant_index):
+    """租户内流程实例序号按 INSTANCE_BLOCK_SIZE 对齐切分的 (起, 止) 区间"""
+    seq_start, count = plan.instance_range(tenant_index)
+    seq_end = seq_start + count
+    start = seq_start
+    while start < seq_end:
+        end = min((start // INSTANCE_BLOCK_SIZE + 1) * INSTANCE_BLOCK_SIZE, seq_end)
+        yield start, end
+        start = end
+
+def generate_instances(plan, tenant_index, seq_range=None):
+    """
+    流程实例及其任务实例，每次产出 (实例行, [任务行...])
+    任务按节点顺序推进：已完成实例的任务全部完成，运行中实例的最后一个任务待处理，终止实例的后续任务被跳过
+    seq_range 限定实例序号区间（须在块边界或租户边界上切分），默认生成租户的全部实例
+    """
+    tenant = tenant_guid(plan.tenant_id(tenant_index))
+    def_start, def_count = plan.definition_range(tenant_index)
+    user_start, user_count = plan.user_range(tenant_index)
+    dept_start, dept_count = plan.dept_range(tenant_index)
+    if seq_range is None:
+        seq_start, count = plan.instance_range(tenant_index)
+        seq_range = (seq_start, seq_start + count)
+    window_seconds = plan.days * 86400
+    rng, block = None, None
+    for seq in range(*seq_range):
+        if seq // INSTANCE_BLOCK_SIZE != block:
+            block = seq // INSTANCE_BLOCK_SIZE
+            rng = plan.rng("ProcessInstances", f"{tenant_index}:{block}")
+        instance_id = ID_BASES["ProcessInstances"] + GENERATED_OFFSET + seq
+        definition_offset = rng.randrange(def_count)
+        key, template_name = PROCESS_TEMPLATES[definition_offset]
+        initiator_id = user_start + rng.randrange(user_count)
+        status = weighted_choice(rng, INSTANCE_STATUS_WEIGHTS)
+        start_time = plan.base_time - timedelta(seconds=rng.randrange(window_seconds))
+        variables = json.dumps({
+            "amount": round(rng.lognormvariate(7, 1.2), 2),
+            "applicantDeptId": dept_start + rng.randrange(dept_count),
+            "days": rng.randint(1, 15),
+            "urgent": rng.random() < 0.1,
+        })
+
+        task_rows = []
+        task_total = rng.randint(1, plan.max_tasks)
+        moment = start_time
+        for node in range(task_total):
+            created = moment
+            due = created + timedelta(hours=rng.choice((24, 48, 72, 168)))
+            is_last = node == task_total - 1
+            if status == "Running" and is_last:
+                task_status, completed = "Pending", None
+            elif status == "Terminated" and is_last:
+                task_status, completed = "Skipped", None
+            else:
+                task_status = "Completed"
+                completed = created + timedelta(minutes=rng.randrange(5, 4 * 24 * 60))
+                moment = completed
+            assignee = user_start + rng.randrange(user_count)
+            task_rows.append((
+                ID_BASES["TaskInstances"] + GENERATED_OFFSET + seq * MAX_TASKS_PER_INSTANCE + node,
+                instance_id, f"node_{node + 1}", APPROVAL_NODES[node], "UserTask", assignee,
+                json.dumps([assignee]), None, task_status, weighted_choice(rng, TASK_PRIORITY_WEIGHTS),
+                iso(due), iso(completed) if completed else None, None,
+                "同意" if task_status == "Completed" else None, tenant,
+                iso(created), iso(completed or created), "{}", stamp(rng),
+            ))
+
+        end_time = iso(moment) if status != "Running" else None
+        yield (
+            (instance_id, def_start + definition_offset, f"{key.upper()}-{seq + 1:09d}",
+             f"{template_name}-{seq + 1}", initiator_id, status, variables,
+             iso(start_time), end_time, tenant, iso(start_time), end_time or iso(start_time), "{}", stamp(rng)),
+            task_rows,
+        )
+
+class RateMeter:
+    """统计各表写入行数与速率"""
+
+    def __init__(self):
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def add(self, table, rows):
+        self.counts[table] = self.counts.get(table, 0) + rows
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        total = sum(self.counts.values())
+        for table, rows in self.counts.items():
+            print(f"   {table:<20} {rows:>14,} 行")
+        print(f"   {'合计':<18} {total:>14,} 行, 用时 {elapsed:.2f}s, {total / elapsed:,.0f} 行/秒")
+
+def write_chunked(conn, table, columns, rows, chunk_size, meter):
+    """按块写入一个行流，每块一个事务"""
+    cursor = conn.cursor()
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        insert_rows(cursor, table, columns, chunk)
+        conn.commit()
+        meter.add(table, len(chunk))
+
+def write_instances(conn, instances, chunk_size, meter):
+    """流程实例与其任务同批写入，保持两张表进度一致"""
+    cursor = conn.cursor()
+    while True:
+        batch = list(itertools.islice(instances, chunk_size))
+        if not batch:
+            break
+        task_rows = [task for _, tasks in batch for task in tasks]
+        insert_rows(cursor, "ProcessInstances", PROCESS_INSTANCE_COLUMNS, [instance for instance, _ in batch])
+        insert_rows(cursor, "TaskInstances", TASK_INSTANCE_COLUMNS, task_rows)
+        conn.commit()
+        meter.add("ProcessInstances", len(batch))
+        meter.add("TaskInstances", len(task_rows))
+
+def generate_tenant_base(conn, plan, tenant_index, chunk_size, meter):
+    """生成一个租户的租户行、部门树、用户和流程定义"""
+    write_chunked(conn, "Tenants", TENANT_COLUMNS + AUDIT_COLUMNS, generate_tenants(plan, [tenant_index]), chunk_size, meter)
+    write_chunked(conn, "Departments", DEPARTMENT_COLUMNS + AUDIT_COLUMNS,
+                  generate_departments(plan, tenant_index), chunk_size, meter)
+    write_chunked(conn, "Users", BUSINESS_USER_COLUMNS, generate_users(plan, tenant_index), chunk_size, meter)
+    write_chunked(conn, "ProcessDefinitions", PROCESS_DEFINITION_COLUMNS + AUDIT_COLUMNS,
+                  generate_definitions(plan, tenant_index), chunk_size, meter)
+
+def generate_tenant_data(conn, plan, tenant_indexes, chunk_size, meter, progress=True):
+    """为一组租户生成全部数据"""
+    for done, index in enumerate(tenant_indexes, 1):
+        generate_tenant_base(conn, plan, index, chunk_size, meter)
+        write_instances(conn, generate_instances(plan, index), chunk_size, meter)
+        if progress:
+            elapsed = max(time.perf_counter() - meter.started, 1e-9)
+            rows = sum(meter.counts.values())
+            print(f"   租户 {done}/{len(tenant_indexes)} 完成, 累计 {rows:,} 行, {rows / elapsed:,.0f} 行/秒")
+
+def reset_generated(conn):
+    """删除之前生成的数据（仅限生成 Id 段，不影响种子数据）"""
+    cursor = conn.cursor()
+    for table, base in ID_BASES.items():
+        cursor.execute(f"DELETE FROM {table} WHERE Id >= ? AND Id < ?", (base + GENERATED_OFFSET, segment_end(table)))
+    cursor.execute("DELETE FROM Tenants WHERE Id >= ?", (TENANT_ID_BASE,))
+    conn.commit()
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="生成压测用的流程实例、任务实例等数据")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，相同种子生成相同数据")
+    parser.add_argument("--tenants", type=int, default=4, help="租户数")
+    parser.add_argument("--dept-depth", type=int, default=4, help="每个租户部门树的层数")
+    parser.add_argument("--dept-fanout", type=int, default=5, help="每个部门的子部门数")
+    parser.add_argument("--users", type=int, default=20000, help="用户总数")
+    parser.add_argument("--instances", type=int, default=1000000, help="流程实例总数")
+    parser.add_argument("--max-tasks", type=int, default=4, help=f"每个实例最多任务数 (≤{MAX_TASKS_PER_INSTANCE})")
+    parser.add_argument("--days", type=int, default=365, help="实例发起时间分布在基准时间之前的天数")
+    parser.add_argument("--base-time", type=datetime.fromisoformat, default=DEFAULT_BASE_TIME,
+                        help="数据基准时间 (ISO 格式)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每个事务写入的行数")
+    parser.add_argument("--reset", action="store_true", help="生成前删除之前生成的数据")
+    args = parser.parse_args(argv)
+    if args.base_time.tzinfo is None:
+        args.base_time = args.base_time.replace(tzinfo=timezone.utc)
+    if args.tenants < 1 or args.users < args.tenants or args.dept_depth < 1 or args.max_tasks < 1:
+        parser.error("租户数、部门层数、每实例任务数至少为 1，且用户数不能少于租户数")
+    return args
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("压测数据生成脚本")
+    print("=" * 60)
+
+    plan = LoadPlan(args)
+    try:
+        plan.validate()
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    print(f"\n数据库: {args.db}")
+    print(f"规模: {args.tenants} 个租户, 每租户 {plan.depts_per_tenant:,} 个部门, "
+          f"{args.users:,} 个用户, {args.instances:,} 个流程实例, 种子 {args.seed}")
+
+    conn = get_connection(args.db)
+    try:
+        if args.reset:
+            print("\n清理之前生成的数据...")
+            reset_generated(conn)
+        print("\n开始生成...")
+        meter = RateMeter()
+        generate_tenant_data(conn, plan, range(args.tenants), args.chunk_size, meter)
+        print("\n生成统计:")
+        meter.report()
+        print("\n✓ 压测数据生成完成！")
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,22 +3,28 @@
 """
 数据库初始化脚本
 初始化基础数据：用户、部门、角色、菜单、字典、系统配置
+
+默认对已有数据的表整表跳过；--reconcile 按主键对账，只补齐新增种子和内容变化的行，
+--dry-run 只输出差异不写入
 """
-import sqlite3
+import argparse
+import hashlib
 import sys
 import os
 import uuid
 from datetime import datetime, timezone
 
+import sql_profiler
+
 # 设置输出编码
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 数据库路径
 DB_PATH = r'D:\Code\WorkFlowCore\WorkFlowCore\src\WorkFlowCore.API\workflow_dev.db'
 
-def get_connection():
+def get_connection(db_path=DB_PATH):
     """获取数据库连接"""
-    return sqlite3.connect(DB_PATH)
+    return sql_profiler.connect(db_path)
 
 def execute_sql(cursor, sql, params=None):
     """执行SQL语句"""
@@ -28,6 +34,233 @@ def execute_sql(cursor, sql, params=None):
         cursor.execute(sql)
     return cursor.fetchone()
 
+# ---------------------------------------------------------------------------
+# 种子数据集
+# 每张表的种子行按列顺序声明为元组，审计字段由 with_audit 统一补齐
+# ---------------------------------------------------------------------------
+
+# 通用审计字段（追加在业务列之后）
+AUDIT_COLUMNS = ("IsDeleted", "CreationTime", "LastModificationTime", "ExtraProperties", "ConcurrencyStamp")
+
+# 默认密码 admin123 / test123 的BCrypt哈希
+DEFAULT_PASSWORD_HASH = "$2a$10$N9qo8uLOickgx2ZMRZoMyeIjZAgcfl7p92ldGxad68LJZdL17lhWy"
+
+TENANT_COLUMNS = ("Id", "Name", "Code", "ContactEmail", "IsEnabled")
+TENANT_SEEDS = [
+    (1, "测试租户", "test-tenant", "test@example.com", 1),
+]
+
+ABP_USER_COLUMNS = (
+    "Id", "TenantId", "UserName", "NormalizedUserName", "Name", "Surname", "Email", "NormalizedEmail",
+    "EmailConfirmed", "PasswordHash", "SecurityStamp", "IsExternal", "PhoneNumber", "PhoneNumberConfirmed",
+    "IsActive", "TwoFactorEnabled", "LockoutEnd", "LockoutEnabled", "AccessFailedCount",
+    "ShouldChangePasswordOnNextLogin", "EntityVersion", "LastPasswordChangeTime", "Discriminator",
+    "NickName", "Avatar", "DepartmentId", "ManagerId", "LoginFailCount", "LastLoginTime", "LastLoginIp",
+    "Status", "ExtraProperties", "ConcurrencyStamp", "CreationTime", "CreatorId",
+    "LastModificationTime", "LastModifierId", "IsDeleted", "DeleterId", "DeletionTime",
+)
+
+BUSINESS_USER_COLUMNS = (
+    "Id", "AbpUserId", "ConcurrencyStamp", "CreationTime", "CreatorId", "DeleterId", "DeletionTime",
+    "DepartmentId", "Email", "ExtraProperties", "IsDeleted", "IsEnabled", "LastModificationTime",
+    "LastModifierId", "ManagerId", "PasswordHash", "Phone", "RealName", "TenantId", "UserName",
+)
+
+# (业务用户ID, 用户名, 姓名, 邮箱, 昵称, 是否关联Admin角色)
+USER_SEEDS = [
+    (1000000000000000000, "admin", "系统管理员", "admin@workflowcore.com", "Admin", True),
+    (1000000000000000001, "test", "测试用户", "test@workflowcore.com", "Test", False),
+]
+
+DEPARTMENT_COLUMNS = ("Id", "DeptName", "Code", "ParentId", "Ancestors", "OrderNum", "Status", "TenantId")
+DEPARTMENT_SEEDS = [
+    (2000000000000000000, "总公司", "ROOT", None, "0", 1, "0", None),
+    (2000000000000000001, "技术部", "TECH", 2000000000000000000, "0,2000000000000000000", 1, "0", None),
+    (2000000000000000002, "市场部", "MARKET", 2000000000000000000, "0,2000000000000000000", 2, "0", None),
+    (2000000000000000003, "人事部", "HR", 2000000000000000000, "0,2000000000000000000", 3, "0", None),
+]
+
+ROLE_COLUMNS = ("Id", "Name", "Code", "Description", "TenantId")
+ROLE_SEEDS = [
+    (3000000000000000000, "普通用户", "USER", "普通用户角色", None),
+    (3000000000000000001, "部门经理", "MANAGER", "部门经理角色", None),
+]
+
+MENU_COLUMNS = (
+    "Id", "MenuName", "MenuType", "ParentId", "Path", "Component", "PermissionCode",
+    "Icon", "OrderNum", "Visible", "IsFrame", "Status", "TenantId",
+)
+MENU_SEEDS = [
+    # 系统管理目录
+    (4000000000000000000, "系统管理", "M", None, "/system", None, None, "setting", 1, 1, 0, "0", None),
+    (4000000000000000001, "用户管理", "C", 4000000000000000000, "/system/users", "system/user/index", "system:user:list", "user", 1, 1, 0, "0", None),
+    (4000000000000000002, "角色管理", "C", 4000000000000000000, "/system/roles", "system/role/index", "system:role:list", "peoples", 2, 1, 0, "0", None),
+    (4000000000000000003, "部门管理", "C", 4000000000000000000, "/system/departments", "system/department/index", "system:dept:list", "tree", 3, 1, 0, "0", None),
+    (4000000000000000004, "菜单管理", "C", 4000000000000000000, "/system/menus", "system/menu/index", "system:menu:list", "tree-table", 4, 1, 0, "0", None),
+    # 工作流目录
+    (4000000000000000005, "工作流", "M", None, "/workflow", None, None, "guide", 2, 1, 0, "0", None),
+    (4000000000000000006, "流程定义", "C", 4000000000000000005, "/workflow/definitions", "workflow/definition/index", "workflow:definition:list", "documentation", 1, 1, 0, "0", None),
+    (4000000000000000007, "流程实例", "C", 4000000000000000005, "/workflow/instances", "workflow/instance/index", "workflow:instance:list", "list", 2, 1, 0, "0", None),
+    # 系统设置目录
+    (4000000000000000008, "系统设置", "M", None, "/settings", None, None, "tool", 3, 1, 0, "0", None),
+    (4000000000000000009, "字典管理", "C", 4000000000000000008, "/settings/dict", "settings/dict/index", "settings:dict:list", "dict", 1, 1, 0, "0", None),
+    (4000000000000000010, "系统配置", "C", 4000000000000000008, "/settings/config", "settings/config/index", "settings:config:list", "edit", 2, 1, 0, "0", None),
+]
+
+ROLE_MENU_COLUMNS = ("Id", "RoleId", "MenuId")
+MENU_ID_BASE = 4000000000000000000
+ROLE_MENU_ID_BASE = 5000000000000000000
+
+DICT_TYPE_COLUMNS = ("Id", "DictName", "DictTypeCode", "Status", "Remark")
+DICT_TYPE_SEEDS = [
+    (6000000000000000000, "用户状态", "user_status", "0", "用户状态字典"),
+    (6000000000000000003, "性别", "gender", "0", "性别字典"),
+    (6000000000000000006, "是否", "yes_no", "0", "是否字典"),
+]
+
+DICT_DATA_COLUMNS = ("Id", "DictTypeId", "DictLabel", "DictValue", "DictSort", "Status", "IsDefault")
+DICT_DATA_SEEDS = [
+    # 用户状态
+    (6000000000000000001, 6000000000000000000, "正常", "0", 1, "0", 1),
+    (6000000000000000002, 6000000000000000000, "停用", "1", 2, "0", 0),
+    # 性别
+    (6000000000000000004, 6000000000000000003, "男", "M", 1, "0", 1),
+    (6000000000000000005, 6000000000000000003, "女", "F", 2, "0", 0),
+    # 是否
+    (6000000000000000007, 6000000000000000006, "是", "Y", 1, "0", 1),
+    (6000000000000000008, 6000000000000000006, "否", "N", 2, "0", 0),
+]
+
+SYSTEM_CONFIG_COLUMNS = ("Id", "ConfigKey", "ConfigValue", "ConfigName", "ConfigType", "Remark")
+SYSTEM_CONFIG_SEEDS = [
+    (7000000000000000000, "system.name", "WorkFlowCore", "系统名称", "Y", "系统名称配置"),
+    (7000000000000000001, "system.logo", "/logo.png", "系统Logo", "Y", "系统Logo路径"),
+    (7000000000000000002, "system.version", "1.0.0", "系统版本", "Y", "系统版本号"),
+]
+
+# 以"表是否为空"决定是否跳过的种子表（一次查询完成全部预检查）
+GUARDED_TABLES = ("Departments", "Roles", "Menus", "DictTypes", "SystemConfigs")
+
+def with_audit(rows, now):
+    """为种子行补齐审计字段，每行生成独立的并发戳"""
+    return [tuple(row) + (0, now, now, "{}", str(uuid.uuid4())) for row in rows]
+
+def insert_rows(cursor, table, columns, rows):
+    """使用一条预编译的INSERT语句，通过 executemany 批量写入整张表"""
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return 0
+    placeholders = ", ".join("?" * len(columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+def admin_role_menu_rows(admin_role_id):
+    """Admin 角色的全部菜单权限；Id 由 MenuId 在菜单段内的偏移推出，与 MENU_SEEDS 中的顺序无关"""
+    return [(ROLE_MENU_ID_BASE + menu[0] - MENU_ID_BASE, admin_role_id, menu[0]) for menu in MENU_SEEDS]
+
+def load_populated_tables(cursor, tables):
+    """一次查询返回已存在数据的表集合，替代逐表 COUNT(*)"""
+    probes = ", ".join(f"EXISTS (SELECT 1 FROM {table})" for table in tables)
+    flags = cursor.execute(f"SELECT {probes}").fetchone()
+    return {table for table, flag in zip(tables, flags) if flag}
+
+# ---------------------------------------------------------------------------
+# 对账模式
+# 按键（主键，关联表为自然键）把库中已有的种子行与期望种子集逐行比较内容哈希，只写入缺失和内容不同的行
+# ---------------------------------------------------------------------------
+
+def desired_seed_sets(admin_role_id):
+    """期望的种子集：(表名, 业务列, 种子行, 是否带审计字段, 对账键列)，按外键依赖顺序排列"""
+    return [
+        ("Tenants", TENANT_COLUMNS, TENANT_SEEDS, True, ("Id",)),
+        ("Departments", DEPARTMENT_COLUMNS, DEPARTMENT_SEEDS, True, ("Id",)),
+        ("Roles", ROLE_COLUMNS, ROLE_SEEDS, True, ("Id",)),
+        ("Menus", MENU_COLUMNS, MENU_SEEDS, True, ("Id",)),
+        # 唯一索引 (RoleId, MenuId)：按自然键对账，已有行的 Id 无论来自哪个版本的种子都保留
+        ("RoleMenus", ROLE_MENU_COLUMNS, admin_role_menu_rows(admin_role_id), False, ("RoleId", "MenuId")),
+        ("DictTypes", DICT_TYPE_COLUMNS, DICT_TYPE_SEEDS, True, ("Id",)),
+        ("DictDatas", DICT_DATA_COLUMNS, DICT_DATA_SEEDS, True, ("Id",)),
+        ("SystemConfigs", SYSTEM_CONFIG_COLUMNS, SYSTEM_CONFIG_SEEDS, True, ("Id",)),
+    ]
+
+def row_hash(row):
+    """业务列内容哈希（不含审计字段，重复运行不会因时间戳、并发戳而判定为变更）"""
+    return hashlib.sha1(repr(tuple(row)).encode("utf-8")).hexdigest()
+
+def load_existing_rows(cursor, table, columns, key_columns, keys):
+    """一次键查询取出种子键对应的现有行，返回 {键元组: 业务列元组}"""
+    key_indexes = [columns.index(name) for name in key_columns]
+    row_marks = ", ".join([f"({', '.join('?' * len(key_columns))})"] * len(keys))
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} "
+                   f"WHERE ({', '.join(key_columns)}) IN (VALUES {row_marks})",
+                   [value for key in keys for value in key])
+    return {tuple(row[index] for index in key_indexes): row for row in cursor.fetchall()}
+
+def diff_seed_rows(cursor, table, columns, seeds, key_columns=("Id",)):
+    """
+    按键比较内容哈希，返回 (待插入行, 待更新行及变更列)
+    键不是 Id 时 Id 不参与比较，已有行保留原 Id
+    """
+    key_indexes = [columns.index(name) for name in key_columns]
+    compared = [index for index, name in enumerate(columns) if name != "Id" or "Id" in key_columns]
+    keys = [tuple(seed[index] for index in key_indexes) for seed in seeds]
+    existing = load_existing_rows(cursor, table, columns, key_columns, keys)
+    inserts, updates = [], []
+    for key, seed in zip(keys, seeds):
+        current = existing.get(key)
+        if current is None:
+            inserts.append(seed)
+            continue
+        current_values = [current[index] for index in compared]
+        seed_values = [seed[index] for index in compared]
+        if row_hash(current_values) != row_hash(seed_values):
+            changed = [(columns[index], current[index], seed[index]) for index in compared
+                       if current[index] != seed[index]]
+            updates.append((seed, changed))
+    return inserts, updates
+
+def upsert_rows(cursor, table, columns, rows, audited, now, key_columns=("Id",)):
+    """
+    一条 INSERT ... ON CONFLICT(键) DO UPDATE 语句通过 executemany 写入新增与变更行
+    更新时保留 Id 与 CreationTime，刷新 LastModificationTime 与 ConcurrencyStamp；除键外没有业务列时 DO NOTHING
+    """
+    if not rows:
+        return 0
+    all_columns = columns + AUDIT_COLUMNS if audited else columns
+    assignments = [f"{name} = excluded.{name}" for name in columns if name != "Id" and name not in key_columns]
+    if audited:
+        assignments += ["LastModificationTime = excluded.LastModificationTime",
+                        "ConcurrencyStamp = excluded.ConcurrencyStamp"]
+    action = f"DO UPDATE SET {', '.join(assignments)}" if assignments else "DO NOTHING"
+    placeholders = ", ".join("?" * len(all_columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(all_columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT({', '.join(key_columns)}) {action}",
+        with_audit(rows, now) if audited else rows)
+    return len(rows)
+
+def reconcile_seeds(cursor, admin_role_id, dry_run=False):
+    """对账全部种子表，打印差异；dry_run 时只输出差异不写入。返回变更行数"""
+    print("\n4. 对账种子数据...")
+    now = datetime.now(timezone.utc).isoformat()
+    total = 0
+    for table, columns, seeds, audited, key_columns in desired_seed_sets(admin_role_id):
+        inserts, updates = diff_seed_rows(cursor, table, columns, seeds, key_columns)
+        if not inserts and not updates:
+            print(f"   ✓ {table}: 一致 ({len(seeds)} 行)")
+            continue
+        print(f"   {table}: 新增 {len(inserts)} 行, 更新 {len(updates)} 行")
+        for seed in inserts:
+            label = next((value for value in seed[1:] if isinstance(value, str)), "")
+            print(f"     + {seed[0]} {label}")
+        for seed, changed in updates:
+            print(f"     ~ {seed[0]} " + ", ".join(f"{name}: {old!r} -> {new!r}" for name, old, new in changed))
+        if not dry_run:
+            upsert_rows(cursor, table, columns, inserts + [seed for seed, _ in updates], audited, now, key_columns)
+        total += len(inserts) + len(updates)
+    return total
+
 def init_tenants(cursor):
     """初始化租户数据"""
     print("\n1. 初始化租户数据...")
@@ -40,15 +273,12 @@ def init_tenants(cursor):
     
     # 创建测试租户
     now = datetime.now(timezone.utc).isoformat()
-    cursor.execute("""
-        INSERT INTO Tenants (Id, Name, Code, ContactEmail, IsEnabled, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (1, "测试租户", "test-tenant", "test@example.com", 1, 0, now, now, "{}", str(uuid.uuid4())))
+    insert_rows(cursor, "Tenants", TENANT_COLUMNS + AUDIT_COLUMNS, with_audit(TENANT_SEEDS, now))
     
     print("   ✓ 测试租户已创建")
 
-def init_abp_roles(cursor):
-    """初始化ABP角色"""
+def init_abp_roles(cursor, dry_run=False):
+    """初始化ABP角色；dry_run 时只检查，角色不存在返回 None"""
     print("\n2. 初始化ABP角色...")
     
     # 检查Admin角色是否存在
@@ -58,311 +288,136 @@ def init_abp_roles(cursor):
         role_id = result[0]
         print(f"   ✓ Admin角色已存在 (ID: {role_id})")
         return role_id
+    if dry_run:
+        print("   + Admin角色不存在，将创建")
+        return None
     
     # 创建Admin角色
     role_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     cursor.execute("""
-        INSERT INTO AbpRoles (Id, Name, NormalizedName, IsDefault, IsPublic, IsStatic, ConcurrencyStamp, ExtraProperties, CreationTime)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (role_id, "Admin", "ADMIN", 0, 0, 0, str(uuid.uuid4()), "{}", now))
+        INSERT INTO AbpRoles (Id, Name, NormalizedName, IsDefault, IsPublic, IsStatic, EntityVersion, ConcurrencyStamp, ExtraProperties, CreationTime)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (role_id, "Admin", "ADMIN", 0, 0, 0, 0, str(uuid.uuid4()), "{}", now))
     
     print(f"   ✓ Admin角色已创建 (ID: {role_id})")
     return role_id
 
-def init_users(cursor, admin_role_id):
-    """初始化用户数据"""
+def init_users(cursor, admin_role_id, dry_run=False):
+    """初始化用户数据；dry_run 时只列出将创建的用户"""
     print("\n3. 初始化用户数据...")
     
-    # 检查admin用户是否存在
-    cursor.execute("SELECT COUNT(*) FROM AbpUsers WHERE UserName = ?", ("admin",))
-    if cursor.fetchone()[0] > 0:
-        print("   ✓ admin用户已存在，跳过")
+    # 一次查询取出已存在的种子用户
+    user_names = [seed[1] for seed in USER_SEEDS]
+    placeholders = ", ".join("?" * len(user_names))
+    cursor.execute(f"SELECT UserName FROM AbpUsers WHERE UserName IN ({placeholders})", user_names)
+    existing_abp = {row[0] for row in cursor.fetchall()}
+    cursor.execute(f"SELECT UserName FROM Users WHERE UserName IN ({placeholders})", user_names)
+    existing_business = {row[0] for row in cursor.fetchall()}
+    
+    missing = [seed for seed in USER_SEEDS if seed[1] not in existing_abp]
+    if not missing:
+        print("   ✓ 用户数据已存在，跳过")
+        return
+    if dry_run:
+        print(f"   + 将创建用户: {', '.join(seed[1] for seed in missing)}")
         return
     
-    # 创建admin用户
-    admin_user_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
-    
-    # 插入ABP用户（密码: admin123，使用BCrypt哈希）
-    password_hash = "$2a$10$N9qo8uLOickgx2ZMRZoMyeIjZAgcfl7p92ldGxad68LJZdL17lhWy"  # admin123的BCrypt哈希
-    security_stamp = str(uuid.uuid4())
-    concurrency_stamp = str(uuid.uuid4())
-    
-    cursor.execute("""
-        INSERT INTO AbpUsers (Id, TenantId, UserName, NormalizedUserName, Name, Surname, Email, NormalizedEmail, 
-                              EmailConfirmed, PasswordHash, SecurityStamp, IsExternal, PhoneNumber, PhoneNumberConfirmed, 
-                              IsActive, TwoFactorEnabled, LockoutEnd, LockoutEnabled, AccessFailedCount, 
-                              ShouldChangePasswordOnNextLogin, EntityVersion, LastPasswordChangeTime, Discriminator,
-                              NickName, Avatar, DepartmentId, ManagerId, LoginFailCount, LastLoginTime, LastLoginIp,
-                              Status, ExtraProperties, ConcurrencyStamp, CreationTime, CreatorId, 
-                              LastModificationTime, LastModifierId, IsDeleted, DeleterId, DeletionTime)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (admin_user_id, None, "admin", "ADMIN", "系统管理员", None, "admin@workflowcore.com", "ADMIN@WORKFLOWCORE.COM",
-          1, password_hash, security_stamp, 0, None, 0, 1, 0, None, 1, 0, 0, 1, None, "AppUser",
-          "Admin", None, None, None, 0, None, None, "0", "{}", concurrency_stamp, now, None, None, None, 0, None, None))
-    
-    # 关联Admin角色
-    cursor.execute("""
-        INSERT INTO AbpUserRoles (UserId, RoleId, TenantId)
-        VALUES (?, ?, ?)
-    """, (admin_user_id, admin_role_id, None))
-    
-    # 创建业务User记录
-    cursor.execute("SELECT Id FROM Users WHERE UserName = ?", ("admin",))
-    if not cursor.fetchone():
-        user_id = 1000000000000000000
-        concurrency_stamp_user = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO Users (Id, AbpUserId, ConcurrencyStamp, CreationTime, CreatorId, DeleterId, DeletionTime,
-                              DepartmentId, Email, ExtraProperties, IsDeleted, IsEnabled, LastModificationTime,
-                              LastModifierId, ManagerId, PasswordHash, Phone, RealName, TenantId, UserName)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, admin_user_id, concurrency_stamp_user, now, None, None, None,
-              None, "admin@workflowcore.com", "{}", 0, 1, None, None, None, "", None, "系统管理员", None, "admin"))
-    
-    # 创建test用户
-    cursor.execute("SELECT COUNT(*) FROM AbpUsers WHERE UserName = ?", ("test",))
-    if cursor.fetchone()[0] == 0:
-        test_user_id = str(uuid.uuid4())
-        test_password_hash = "$2a$10$N9qo8uLOickgx2ZMRZoMyeIjZAgcfl7p92ldGxad68LJZdL17lhWy"  # test123的BCrypt哈希
-        test_security_stamp = str(uuid.uuid4())
-        test_concurrency_stamp = str(uuid.uuid4())
-        
-        cursor.execute("""
-            INSERT INTO AbpUsers (Id, TenantId, UserName, NormalizedUserName, Name, Surname, Email, NormalizedEmail, 
-                                  EmailConfirmed, PasswordHash, SecurityStamp, IsExternal, PhoneNumber, PhoneNumberConfirmed, 
-                                  IsActive, TwoFactorEnabled, LockoutEnd, LockoutEnabled, AccessFailedCount, 
-                                  ShouldChangePasswordOnNextLogin, EntityVersion, LastPasswordChangeTime, Discriminator,
-                                  NickName, Avatar, DepartmentId, ManagerId, LoginFailCount, LastLoginTime, LastLoginIp,
-                                  Status, ExtraProperties, ConcurrencyStamp, CreationTime, CreatorId, 
-                                  LastModificationTime, LastModifierId, IsDeleted, DeleterId, DeletionTime)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (test_user_id, None, "test", "TEST", "测试用户", None, "test@workflowcore.com", "TEST@WORKFLOWCORE.COM",
-              1, test_password_hash, test_security_stamp, 0, None, 0, 1, 0, None, 1, 0, 0, 1, None, "AppUser",
-              "Test", None, None, None, 0, None, None, "0", "{}", test_concurrency_stamp, now, None, None, None, 0, None, None))
-        
+    abp_rows, user_role_rows, business_rows = [], [], []
+    for user_id, user_name, real_name, email, nick_name, is_admin in missing:
+        abp_user_id = str(uuid.uuid4())
+        abp_rows.append((
+            abp_user_id, None, user_name, user_name.upper(), real_name, None, email, email.upper(),
+            1, DEFAULT_PASSWORD_HASH, str(uuid.uuid4()), 0, None, 0, 1, 0, None, 1, 0, 0, 1, None, "AppUser",
+            nick_name, None, None, None, 0, None, None, "0", "{}", str(uuid.uuid4()), now, None, None, None, 0, None, None))
+        # 关联Admin角色
+        if is_admin:
+            user_role_rows.append((abp_user_id, admin_role_id, None))
         # 创建业务User记录
-        user_id2 = 1000000000000000001
-        concurrency_stamp_user2 = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO Users (Id, AbpUserId, ConcurrencyStamp, CreationTime, CreatorId, DeleterId, DeletionTime,
-                              DepartmentId, Email, ExtraProperties, IsDeleted, IsEnabled, LastModificationTime,
-                              LastModifierId, ManagerId, PasswordHash, Phone, RealName, TenantId, UserName)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id2, test_user_id, concurrency_stamp_user2, now, None, None, None,
-              None, "test@workflowcore.com", "{}", 0, 1, None, None, None, "", None, "测试用户", None, "test"))
+        if user_name not in existing_business:
+            business_rows.append((
+                user_id, abp_user_id, str(uuid.uuid4()), now, None, None, None,
+                None, email, "{}", 0, 1, None, None, None, "", None, real_name, None, user_name))
     
-    print("   ✓ 用户数据已初始化 (admin, test)")
+    insert_rows(cursor, "AbpUsers", ABP_USER_COLUMNS, abp_rows)
+    insert_rows(cursor, "AbpUserRoles", ("UserId", "RoleId", "TenantId"), user_role_rows)
+    insert_rows(cursor, "Users", BUSINESS_USER_COLUMNS, business_rows)
+    
+    print(f"   ✓ 用户数据已初始化 ({', '.join(seed[1] for seed in missing)})")
 
-def init_departments(cursor):
+def init_departments(cursor, populated):
     """初始化部门数据"""
     print("\n4. 初始化部门数据...")
     
-    cursor.execute("SELECT COUNT(*) FROM Departments")
-    if cursor.fetchone()[0] > 0:
+    if "Departments" in populated:
         print("   ✓ 部门数据已存在，跳过")
         return
     
     now = datetime.now(timezone.utc).isoformat()
+    count = insert_rows(cursor, "Departments", DEPARTMENT_COLUMNS + AUDIT_COLUMNS,
+                        with_audit(DEPARTMENT_SEEDS, now))
     
-    # 创建根部门（总公司）
-    root_id = 2000000000000000000
-    concurrency_stamp_dept = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO Departments (Id, DeptName, Code, ParentId, Ancestors, OrderNum, Status, 
-                                 TenantId, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (root_id, "总公司", "ROOT", None, "0", 1, "0", None, 0, now, now, "{}", concurrency_stamp_dept))
-    
-    # 创建子部门
-    depts = [
-        (2000000000000000001, "技术部", "TECH", root_id, f"0,{root_id}", 1),
-        (2000000000000000002, "市场部", "MARKET", root_id, f"0,{root_id}", 2),
-        (2000000000000000003, "人事部", "HR", root_id, f"0,{root_id}", 3),
-    ]
-    
-    for dept_id, name, code, parent_id, ancestors, order_num in depts:
-        dept_concurrency_stamp = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO Departments (Id, DeptName, Code, ParentId, Ancestors, OrderNum, Status, 
-                                     TenantId, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (dept_id, name, code, parent_id, ancestors, order_num, "0", None, 0, now, now, "{}", dept_concurrency_stamp))
-    
-    print("   ✓ 部门数据已初始化 (总公司、技术部、市场部、人事部)")
+    print(f"   ✓ 部门数据已初始化 ({count}个部门)")
 
-def init_business_roles(cursor):
+def init_business_roles(cursor, populated):
     """初始化业务角色"""
     print("\n5. 初始化业务角色...")
     
-    cursor.execute("SELECT COUNT(*) FROM Roles")
-    if cursor.fetchone()[0] > 0:
+    if "Roles" in populated:
         print("   ✓ 业务角色数据已存在，跳过")
         return
     
     now = datetime.now(timezone.utc).isoformat()
+    count = insert_rows(cursor, "Roles", ROLE_COLUMNS + AUDIT_COLUMNS, with_audit(ROLE_SEEDS, now))
     
-    roles = [
-        (3000000000000000000, "普通用户", "USER", "普通用户角色"),
-        (3000000000000000001, "部门经理", "MANAGER", "部门经理角色"),
-    ]
-    
-    for role_id, name, code, desc in roles:
-        role_concurrency_stamp = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO Roles (Id, Name, Code, Description, TenantId, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (role_id, name, code, desc, None, 0, now, now, "{}", role_concurrency_stamp))
-    
-    print("   ✓ 业务角色数据已初始化 (普通用户、部门经理)")
+    print(f"   ✓ 业务角色数据已初始化 ({count}个角色)")
 
-def init_menus(cursor, admin_role_id):
+def init_menus(cursor, admin_role_id, populated):
     """初始化菜单数据"""
     print("\n6. 初始化菜单数据...")
     
-    cursor.execute("SELECT COUNT(*) FROM Menus")
-    if cursor.fetchone()[0] > 0:
+    if "Menus" in populated:
         print("   ✓ 菜单数据已存在，跳过")
         return
     
     now = datetime.now(timezone.utc).isoformat()
-    
-    # 创建菜单（目录和菜单项）
-    menus = [
-        # 系统管理目录
-        (4000000000000000000, "系统管理", "M", None, "/system", None, None, "setting", 1, 1, "0"),
-        (4000000000000000001, "用户管理", "C", 4000000000000000000, "/system/users", "system/user/index", "system:user:list", "user", 1, 1, "0"),
-        (4000000000000000002, "角色管理", "C", 4000000000000000000, "/system/roles", "system/role/index", "system:role:list", "peoples", 2, 1, "0"),
-        (4000000000000000003, "部门管理", "C", 4000000000000000000, "/system/departments", "system/department/index", "system:dept:list", "tree", 3, 1, "0"),
-        (4000000000000000004, "菜单管理", "C", 4000000000000000000, "/system/menus", "system/menu/index", "system:menu:list", "tree-table", 4, 1, "0"),
-        # 工作流目录
-        (4000000000000000005, "工作流", "M", None, "/workflow", None, None, "guide", 2, 1, "0"),
-        (4000000000000000006, "流程定义", "C", 4000000000000000005, "/workflow/definitions", "workflow/definition/index", "workflow:definition:list", "documentation", 1, 1, "0"),
-        (4000000000000000007, "流程实例", "C", 4000000000000000005, "/workflow/instances", "workflow/instance/index", "workflow:instance:list", "list", 2, 1, "0"),
-        # 系统设置目录
-        (4000000000000000008, "系统设置", "M", None, "/settings", None, None, "tool", 3, 1, "0"),
-        (4000000000000000009, "字典管理", "C", 4000000000000000008, "/settings/dict", "settings/dict/index", "settings:dict:list", "dict", 1, 1, "0"),
-        (4000000000000000010, "系统配置", "C", 4000000000000000008, "/settings/config", "settings/config/index", "settings:config:list", "edit", 2, 1, "0"),
-    ]
-    
-    for menu_id, name, menu_type, parent_id, path, component, permission, icon, order_num, visible, status in menus:
-        menu_concurrency_stamp = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO Menus (Id, MenuName, MenuType, ParentId, Path, Component, PermissionCode, 
-                              Icon, OrderNum, Visible, IsFrame, Status, TenantId, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (menu_id, name, menu_type, parent_id, path, component, permission, icon, order_num, visible, 0, status, None, 0, now, now, "{}", menu_concurrency_stamp))
+    count = insert_rows(cursor, "Menus", MENU_COLUMNS + AUDIT_COLUMNS, with_audit(MENU_SEEDS, now))
     
     # 为Admin角色分配所有菜单权限
-    menu_ids = [m[0] for m in menus]
-    for idx, menu_id in enumerate(menu_ids):
-        role_menu_id = 5000000000000000000 + idx
-        cursor.execute("""
-            INSERT INTO RoleMenus (Id, RoleId, MenuId)
-            VALUES (?, ?, ?)
-        """, (role_menu_id, admin_role_id, menu_id))
+    insert_rows(cursor, "RoleMenus", ROLE_MENU_COLUMNS, admin_role_menu_rows(admin_role_id))
     
-    print("   ✓ 菜单数据已初始化 (11个菜单项)")
+    print(f"   ✓ 菜单数据已初始化 ({count}个菜单项)")
 
-def init_dicts(cursor):
+def init_dicts(cursor, populated):
     """初始化字典数据"""
     print("\n7. 初始化字典数据...")
     
-    cursor.execute("SELECT COUNT(*) FROM DictTypes")
-    if cursor.fetchone()[0] > 0:
+    if "DictTypes" in populated:
         print("   ✓ 字典数据已存在，跳过")
         return
     
     now = datetime.now(timezone.utc).isoformat()
+    type_count = insert_rows(cursor, "DictTypes", DICT_TYPE_COLUMNS + AUDIT_COLUMNS,
+                             with_audit(DICT_TYPE_SEEDS, now))
+    data_count = insert_rows(cursor, "DictDatas", DICT_DATA_COLUMNS + AUDIT_COLUMNS,
+                             with_audit(DICT_DATA_SEEDS, now))
     
-    # 用户状态字典
-    user_status_type_id = 6000000000000000000
-    dict_type_stamp1 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictTypes (Id, DictName, DictTypeCode, Status, Remark, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (user_status_type_id, "用户状态", "user_status", "0", "用户状态字典", 0, now, now, "{}", dict_type_stamp1))
-    
-    dict_data_stamp1 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000001, user_status_type_id, "正常", "0", 1, "0", 1, 0, now, now, "{}", dict_data_stamp1))
-    
-    dict_data_stamp2 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000002, user_status_type_id, "停用", "1", 2, "0", 0, 0, now, now, "{}", dict_data_stamp2))
-    
-    # 性别字典
-    gender_type_id = 6000000000000000003
-    dict_type_stamp2 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictTypes (Id, DictName, DictTypeCode, Status, Remark, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (gender_type_id, "性别", "gender", "0", "性别字典", 0, now, now, "{}", dict_type_stamp2))
-    
-    dict_data_stamp3 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000004, gender_type_id, "男", "M", 1, "0", 1, 0, now, now, "{}", dict_data_stamp3))
-    
-    dict_data_stamp4 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000005, gender_type_id, "女", "F", 2, "0", 0, 0, now, now, "{}", dict_data_stamp4))
-    
-    # 是否字典
-    yes_no_type_id = 6000000000000000006
-    dict_type_stamp3 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictTypes (Id, DictName, DictTypeCode, Status, Remark, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (yes_no_type_id, "是否", "yes_no", "0", "是否字典", 0, now, now, "{}", dict_type_stamp3))
-    
-    dict_data_stamp5 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000007, yes_no_type_id, "是", "Y", 1, "0", 1, 0, now, now, "{}", dict_data_stamp5))
-    
-    dict_data_stamp6 = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO DictDatas (Id, DictTypeId, DictLabel, DictValue, DictSort, Status, IsDefault, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (6000000000000000008, yes_no_type_id, "否", "N", 2, "0", 0, 0, now, now, "{}", dict_data_stamp6))
-    
-    print("   ✓ 字典数据已初始化 (3个字典类型，6个字典项)")
+    print(f"   ✓ 字典数据已初始化 ({type_count}个字典类型，{data_count}个字典项)")
 
-def init_system_configs(cursor):
+def init_system_configs(cursor, populated):
     """初始化系统配置"""
     print("\n8. 初始化系统配置...")
     
-    cursor.execute("SELECT COUNT(*) FROM SystemConfigs")
-    if cursor.fetchone()[0] > 0:
+    if "SystemConfigs" in populated:
         print("   ✓ 系统配置已存在，跳过")
         return
     
     now = datetime.now(timezone.utc).isoformat()
+    count = insert_rows(cursor, "SystemConfigs", SYSTEM_CONFIG_COLUMNS + AUDIT_COLUMNS,
+                        with_audit(SYSTEM_CONFIG_SEEDS, now))
     
-    configs = [
-        (7000000000000000000, "system.name", "WorkFlowCore", "系统名称", "Y", "系统名称配置"),
-        (7000000000000000001, "system.logo", "/logo.png", "系统Logo", "Y", "系统Logo路径"),
-        (7000000000000000002, "system.version", "1.0.0", "系统版本", "Y", "系统版本号"),
-    ]
-    
-    for config_id, key, value, name, config_type, remark in configs:
-        config_stamp = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO SystemConfigs (Id, ConfigKey, ConfigValue, ConfigName, ConfigType, Remark, IsDeleted, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (config_id, key, value, name, config_type, remark, 0, now, now, "{}", config_stamp))
-    
-    print("   ✓ 系统配置已初始化 (3个配置项)")
+    print(f"   ✓ 系统配置已初始化 ({count}个配置项)")
 
 def vacuum_database(cursor):
     """优化数据库"""
@@ -370,39 +425,72 @@ def vacuum_database(cursor):
     cursor.execute("VACUUM")
     print("   ✓ 数据库优化完成")
 
-def main():
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="初始化基础数据")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--reconcile", action="store_true", help="按主键对账种子数据，只写入新增和变化的行")
+    parser.add_argument("--dry-run", action="store_true", help="对账时只输出差异，不写入 (隐含 --reconcile)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
     print("=" * 60)
     print("数据库初始化脚本")
     print("=" * 60)
-    
-    if not os.path.exists(DB_PATH):
-        print(f"错误: 数据库文件不存在: {DB_PATH}")
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
         return
-    
-    conn = get_connection()
+
+    conn = get_connection(args.db)
     cursor = conn.cursor()
-    
+
     try:
         # 开始事务
         cursor.execute("BEGIN TRANSACTION")
-        
-        # 初始化各项数据
-        init_tenants(cursor)
-        admin_role_id = init_abp_roles(cursor)
-        init_users(cursor, admin_role_id)
-        init_departments(cursor)
-        init_business_roles(cursor)
-        init_menus(cursor, admin_role_id)
-        init_dicts(cursor)
-        init_system_configs(cursor)
-        
-        # 提交事务
-        cursor.execute("COMMIT")
-        
-        # 优化数据库
-        vacuum_database(cursor)
-        
+
+        if args.reconcile or args.dry_run:
+            # 对账模式：用户按用户名补齐，其余种子表按主键与内容哈希对账
+            with sql_profiler.step("ABP角色与用户"):
+                admin_role_id = init_abp_roles(cursor, args.dry_run)
+                init_users(cursor, admin_role_id, args.dry_run)
+            with sql_profiler.step("对账种子数据"):
+                changed = reconcile_seeds(cursor, admin_role_id, args.dry_run)
+            if args.dry_run:
+                cursor.execute("ROLLBACK")
+                print(f"\n(dry-run: 共 {changed} 行差异，未写入)")
+                return
+            with sql_profiler.step("提交"):
+                cursor.execute("COMMIT")
+            # 无变更时不做 VACUUM，重复运行只有几次主键查询
+            if changed:
+                with sql_profiler.step("VACUUM"):
+                    vacuum_database(cursor)
+        else:
+            # 初始化各项数据
+            with sql_profiler.step("租户"):
+                init_tenants(cursor)
+            with sql_profiler.step("ABP角色与用户"):
+                admin_role_id = init_abp_roles(cursor)
+                init_users(cursor, admin_role_id)
+            with sql_profiler.step("种子表"):
+                populated = load_populated_tables(cursor, GUARDED_TABLES)
+                init_departments(cursor, populated)
+                init_business_roles(cursor, populated)
+                init_menus(cursor, admin_role_id, populated)
+                init_dicts(cursor, populated)
+                init_system_configs(cursor, populated)
+
+            # 提交事务
+            with sql_profiler.step("提交"):
+                cursor.execute("COMMIT")
+
+            # 优化数据库
+            with sql_profiler.step("VACUUM"):
+                vacuum_database(cursor)
+
         print("\n" + "=" * 60)
         print("数据库初始化完成！")
         print("=" * 60)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流程变量 JSON 索引脚本
+ProcessInstances.Variables、TaskInstances.Variables 为自由格式 JSON，按业务字段（金额、申请部门等）过滤时
+每一行都要解析 JSON。本脚本把常用键提取为 json_extract 生成列并建索引：
+
+- profile:   按主键分批流式读取，蓄水池抽样后统计各键路径的出现率、类型与基数，并给出建议
+- apply:     为指定键（缺省为 profile 的建议）添加生成列与索引
+- drop:      删除本脚本添加的列、索引与触发器
+- benchmark: 在数据库副本上比较 json_extract 过滤与生成列索引过滤的延迟
+
+列名为 Var_<键路径>，报表按列名过滤即可走索引。两种存储方式：
+- virtual（默认）：VIRTUAL 生成列，无需回填，建索引时一次扫描计算
+- stored：普通列 + 插入/更新触发器，按主键分批回填（每批一个短事务），索引建在已算好的列上
+
+EF Core 迁移重建表时会丢弃这些列，迁移后重新执行 apply 即可。
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmark_workflow import copy_database, run_workload
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+TABLES = ("ProcessInstances", "TaskInstances")
+
+# 本脚本添加的列名前缀
+COLUMN_PREFIX = "Var_"
+
+# 每个键最多记录的不同取值数，超过后基数显示为 "N+"
+DISTINCT_CAP = 1000
+
+# 表定义（生成列）或触发器（普通列）中本脚本写入的取值表达式：(列名, 路径字面量)
+COLUMN_SOURCE = re.compile(r'"(' + COLUMN_PREFIX + r'\w+)"\s*(?:GENERATED ALWAYS AS \(|=\s*)'
+                           r"CASE WHEN json_valid\([\w.]+\) THEN json_extract\([\w.]+, '((?:[^']|'')*)'\)")
+
+def get_connection(db_path, busy_timeout=5.0):
+    """获取数据库连接（自动提交模式，事务显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def child_path(path, key):
+    """拼接 JSON 路径；非标识符键按 SQLite 语法加双引号"""
+    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", key):
+        return f"{path}.{key}"
+    return f'{path}."{key}"'
+
+def normalize_path(key):
+    """命令行键转为 JSON 路径：amount、form.amount 或 $.form.amount"""
+    if key.startswith("$"):
+        return key
+    path = "$"
+    for part in key.split("."):
+        path = child_path(path, part)
+    return path
+
+def column_name(path):
+    """JSON 路径对应的列名，如 $.form.amount -> Var_form_amount"""
+    return COLUMN_PREFIX + re.sub(r"\W+", "_", path[2:]).strip("_")
+
+def extract_expr(path, source="Variables"):
+    """取值表达式；非法 JSON 取 NULL，否则 json_extract 报错会让整条 INSERT/UPDATE 失败"""
+    literal = path.replace("'", "''")
+    return f"CASE WHEN json_valid({source}) THEN json_extract({source}, '{literal}') END"
+
+def json_type(value):
+    """Python 值对应的 JSON 类型名"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "real"
+    if isinstance(value, str):
+        return "text"
+    return "array"
+
+class KeyStats:
+    """单个键路径的抽样统计"""
+
+    def __init__(self):
+        self.present = 0
+        self.types = Counter()
+        self.values = set()
+
+    def add(self, value):
+        self.present += 1
+        self.types[json_type(value)] += 1
+        if value is not None and not isinstance(value, list) and len(self.values) < DISTINCT_CAP:
+            self.values.add(value)
+
+    def distinct(self):
+        return f"{len(self.values)}+" if len(self.values) >= DISTINCT_CAP else str(len(self.values))
+
+    def indexable(self):
+        """非空值全部为同一类标量（整数与小数视为同类）时可建索引"""
+        kinds = set(self.types) - {"null"}
+        return bool(kinds) and (kinds <= {"integer", "real"} or kinds in ({"text"}, {"boolean"}))
+
+def sample_variables(conn, table, size, batch_size, rng):
+    """按主键键集分页流式读取非空 Variables，蓄水池抽样；返回 (扫描行数, 样本)"""
+    reservoir, seen, last_id = [], 0, -2 ** 63
+    while True:
+        rows = conn.execute(f"""
+            SELECT Id, Variables FROM {table}
+            WHERE Id > ? AND Variables IS NOT NULL AND Variables NOT IN ('', '{{}}')
+            ORDER BY Id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        if not rows:
+            return seen, reservoir
+        last_id = rows[-1][0]
+        for _, variables in rows:
+            seen += 1
+            if len(reservoir) < size:
+                reservoir.append(variables)
+            else:
+                slot = rng.randrange(seen)
+                if slot < size:
+                    reservoir[slot] = variables
+
+def profile_sample(sample):
+    """解析样本并按键路径汇总；返回 (键路径 -> KeyStats, 非法 JSON 数, 非对象数)"""
+    stats, invalid, non_object = {}, 0, 0
+    for text in sample:
+        try:
+            document = json.loads(text)
+        except ValueError:
+            invalid += 1
+            continue
+        if not isinstance(document, dict):
+            non_object += 1
+            continue
+        stack = [("$", document)]
+        while stack:
+            path, node = stack.pop()
+            for key, value in node.items():
+                key_path = child_path(path, key)
+                if isinstance(value, dict):
+                    stack.append((key_path, value))
+                else:
+                    stats.setdefault(key_path, KeyStats()).add(value)
+    return stats, invalid, non_object
+
+def profile_table(conn, table, size, batch_size, seed):
+    """抽样统计一张表；返回 (扫描行数, 样本数, 统计, 非法 JSON 数, 非对象数)"""
+    seen, sample = sample_variables(conn, table, size, batch_size, random.Random(seed))
+    stats, invalid, non_object = profile_sample(sample)
+    return seen, len(sample), stats, invalid, non_object
+
+def suggest_paths(stats, sample_count, min_coverage):
+    """建议建索引的键：可索引的标量、出现率不低于阈值、至少两个不同取值"""
+    return sorted(path for path, item in stats.items()
+                  if item.indexable() and len(item.values) >= 2
+                  and sample_count and item.present / sample_count >= min_coverage)
+
+def existing_columns(conn, table):
+    """本脚本已添加的列：列名 -> 是否为生成列"""
+    return {row[1]: row[6] != 0 for row in conn.execute(f"PRAGMA table_xinfo({table})")
+            if row[1].startswith(COLUMN_PREFIX)}
+
+def column_sources(conn, table):
+    """已添加的列各自对应的 JSON 路径，从表定义与触发器的 SQL 中解析"""
+    sources = {}
+    for (sql,) in conn.execute("SELECT sql FROM sqlite_schema WHERE tbl_name = ? AND type IN ('table', 'trigger')",
+                               (table,)):
+        for column, literal in COLUMN_SOURCE.findall(sql or ""):
+            sources.setdefault(column, literal.replace("''", "'"))
+    return sources
+
+def check_collisions(conn, table, paths):
+    """不同键路径映射到同一列名时报错（如 $.form.amount 与 $.form_amount 都对应 Var_form_amount）"""
+    owners = column_sources(conn, table)
+    for path in paths:
+        column = column_name(path)
+        owner = owners.setdefault(column, path)
+        if owner != path:
+            raise ValueError(f"{table}: 键 {path} 与 {owner} 对应同一列 {column}，请只保留其中一个")
+
+def index_name(table, column):
+    return f"IX_{table}_{column}"
+
+def trigger_names(table, column):
+    return f"TR_{table}_{column}_Insert", f"TR_{table}_{column}_Update"
+
+def add_virtual_column(conn, table, path):
+    """添加 VIRTUAL 生成列并建索引（ALTER TABLE 不支持添加 STORED 生成列）"""
+    column = column_name(path)
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" '
+                 f'GENERATED ALWAYS AS ({extract_expr(path)}) VIRTUAL')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name(table, column)}" ON {table} ("{column}")')
+
+def add_stored_column(conn, table, path):
+    """添加普通列与维护触发器；回填前先建触发器，回填期间新写入的行也会被覆盖"""
+    column = column_name(path)
+    insert_trigger, update_trigger = trigger_names(table, column)
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}"')
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS "{insert_trigger}" AFTER INSERT ON {table} BEGIN
+            UPDATE {table} SET "{column}" = {extract_expr(path, "NEW.Variables")} WHERE Id = NEW.Id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS "{update_trigger}" AFTER UPDATE OF Variables ON {table} BEGIN
+            UPDATE {table} SET "{column}" = {extract_expr(path, "NEW.Variables")} WHERE Id = NEW.Id;
+        END
+    """)
+
+def backfill_columns(conn, table, paths, batch_size, pause, progress=True):
+    """按主键分批回填普通列，每批一个 BEGIN IMMEDIATE 短事务；返回回填行数"""
+    assignments = ", ".join(f'"{column_name(path)}" = {extract_expr(path)}' for path in paths)
+    last_id, total = -2 ** 63, 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            upper, count = conn.execute(f"""
+                SELECT MAX(Id), COUNT(*) FROM (SELECT Id FROM {table} WHERE Id > ? ORDER BY Id LIMIT ?)
+            """, (last_id, batch_size)).fetchone()
+            if count:
+                conn.execute(f"UPDATE {table} SET {assignments} WHERE Id > ? AND Id <= ?", (last_id, upper))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not count:
+            return total
+        last_id, total = upper, total + count
+        if progress:
+            print(f"   回填 {table}: {total:,} 行", end="\r")
+        if pause:
+            time.sleep(pause)
+
+def apply_columns(conn, table, paths, storage="virtual", batch_size=5000, pause=0.0, progress=True):
+    """为尚未添加的键建列与索引；返回新增的键路径列表。列名冲突时报错，不做任何修改"""
+    check_collisions(conn, table, paths)
+    present = existing_columns(conn, table)
+    added = [path for path in paths if column_name(path) not in present]
+    if not added:
+        return added
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for path in added:
+            (add_virtual_column if storage == "virtual" else add_stored_column)(conn, table, path)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if storage == "stored":
+        total = backfill_columns(conn, table, added, batch_size, pause, progress)
+        if progress:
+            print(f"   ✓ {table} 回填 {total:,} 行" + " " * 20)
+        for path in added:
+            column = column_name(path)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name(table, column)}" ON {table} ("{column}")')
+    conn.execute(f"ANALYZE {table}")
+    return added
+
+def drop_columns(conn, table, paths=None):
+    """删除本脚本添加的列（paths 为空时全部删除）；列由其他键路径生成时报错。返回删除的列名列表"""
+    if paths:
+        check_collisions(conn, table, paths)
+    present = existing_columns(conn, table)
+    columns = sorted(present) if not paths else [column_name(path) for path in paths if column_name(path) in present]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for column in columns:
+            for trigger in trigger_names(table, column):
+                conn.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+            conn.execute(f'DROP INDEX IF EXISTS "{index_name(table, column)}"')
+            conn.execute(f'ALTER TABLE {table} DROP COLUMN "{column}"')
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return columns
+
+def resolve_paths(conn, table, keys, args):
+    """命令行指定的键，未指定时取 profile 的建议"""
+    if keys:
+        return [normalize_path(key) for key in keys]
+    _, sample_count, stats, _, _ = profile_table(conn, table, args.sample, args.batch_size, args.seed)
+    paths = suggest_paths(stats, sample_count, args.min_coverage)
+    print(f"   {table} 建议的键: {', '.join(paths) if paths else '无'}")
+    return paths
+
+def filter_ranges(conn, table, path, rng, count=200):
+    """过滤参数：从取值的有序样本中取相邻约 1% 的区间，低基数键退化为等值"""
+    values = sorted(row[0] for row in conn.execute(f"""
+        SELECT value FROM (SELECT {extract_expr(path)} AS value FROM {table}) WHERE value IS NOT NULL
+        ORDER BY random() LIMIT 2000
+    """))
+    if not values:
+        return []
+    span = len(values) // 100
+    ranges = []
+    for _ in range(count):
+        start = rng.randrange(len(values))
+        ranges.append((values[start], values[min(start + span, len(values) - 1)]))
+    return ranges
+
+def run_benchmark(db_path, table, keys, args):
+    """在副本上先测 json_extract 过滤，再添加列后测生成列过滤；返回 {键路径: (前, 后, 查询计划)} 与添加耗时"""
+    work_dir = tempfile.mkdtemp(prefix="workflow_json_")
+    bench_path = os.path.join(work_dir, "bench.db")
+    try:
+        copy_database(db_path, bench_path)
+        conn = get_connection(bench_path)
+        paths = resolve_paths(conn, table, keys, args)
+        rng = random.Random(args.seed)
+        ranges = {path: filter_ranges(conn, table, path, rng) for path in paths}
+        paths = [path for path in paths if ranges[path]]
+
+        def cycle(sql, values):
+            position = [0]
+
+            def operation():
+                position[0] += 1
+                return conn.execute(sql, values[position[0] % len(values)]).fetchone()
+            return operation
+
+        before = {path: run_workload(cycle(f"SELECT COUNT(*) FROM {table} WHERE {extract_expr(path)} BETWEEN ? AND ?",
+                                           ranges[path]), args.iterations, args.warmup)
+                  for path in paths}
+        started = time.perf_counter()
+        apply_columns(conn, table, paths, args.storage, args.batch_size, 0.0, progress=False)
+        apply_seconds = time.perf_counter() - started
+        results = {}
+        for path in paths:
+            sql = f'SELECT COUNT(*) FROM {table} WHERE "{column_name(path)}" BETWEEN ? AND ?'
+            plan = " / ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", ranges[path][0]))
+            results[path] = (before[path], run_workload(cycle(sql, ranges[path]), args.iterations, args.warmup), plan)
+        conn.close()
+        return results, apply_seconds
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_profile(table, seen, sample_count, stats, invalid, non_object, min_coverage):
+    """输出抽样统计表"""
+    suggested = set(suggest_paths(stats, sample_count, min_coverage))
+    print(f"\n{table}: 非空 Variables {seen:,} 行, 抽样 {sample_count:,} 行"
+          f" (非法 JSON {invalid}, 非对象 {non_object})")
+    if not stats:
+        return
+    print(f"   {'键路径':<32} {'出现率':>8} {'基数':>7}  {'类型':<24} 建议")
+    for path, item in sorted(stats.items(), key=lambda entry: -entry[1].present):
+        coverage = item.present / sample_count * 100 if sample_count else 0
+        types = ", ".join(f"{name}:{count}" for name, count in item.types.most_common())
+        print(f"   {path:<32} {coverage:>7.1f}% {item.distinct():>7}  {types:<24} "
+              f"{'✓ ' + column_name(path) if path in suggested else ''}")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="流程变量 JSON 生成列与索引维护")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("profile", "抽样统计 JSON 键"), ("apply", "添加生成列与索引"),
+                            ("drop", "删除生成列与索引"), ("benchmark", "json_extract 与生成列过滤对比")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+        command.add_argument("--table", choices=TABLES, action="append",
+                             help="目标表，可重复；缺省为全部（benchmark 缺省为 ProcessInstances）")
+        if name != "profile":
+            command.add_argument("--key", action="append", default=[],
+                                 help="JSON 键或路径（amount / form.amount / $.form.amount），可重复；"
+                                      "apply、benchmark 缺省为 profile 的建议，drop 缺省为全部")
+        if name != "drop":
+            command.add_argument("--sample", type=int, default=20000, help="抽样行数")
+            command.add_argument("--min-coverage", type=float, default=0.5, help="建议键的最低出现率")
+            command.add_argument("--seed", type=int, default=42, help="抽样随机种子")
+            command.add_argument("--batch-size", type=int, default=5000, help="分页读取与回填的每批行数")
+        if name in ("apply", "benchmark"):
+            command.add_argument("--storage", choices=("virtual", "stored"), default="virtual",
+                                 help="virtual: 生成列；stored: 普通列 + 触发器 + 分批回填")
+        if name == "apply":
+            command.add_argument("--sleep", type=float, default=0.05, help="回填批间暂停秒数")
+        if name == "benchmark":
+            command.add_argument("--iterations", type=int, default=50, help="每种查询的计时次数")
+            command.add_argument("--warmup", type=int, default=3, help="预热次数")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("流程变量 JSON 索引脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+    tables = args.table or (["ProcessInstances"] if args.command == "benchmark" else list(TABLES))
+
+    try:
+        if args.command == "benchmark":
+            for table in tables:
+                print(f"\n在副本上测试 {table} ({args.iterations} 次/查询, storage={args.storage})...")
+                results, apply_seconds = run_benchmark(args.db, table, args.key, args)
+                if not results:
+                    print("   没有可测试的键")
+                    continue
+                print(f"   添加列与索引用时 {apply_seconds:.2f}s")
+                print(f"\n   {'键路径':<28} {'前 p50(ms)':>11} {'后 p50(ms)':>11} {'后 p95(ms)':>11} {'加速':>8}")
+                for path, (before, after, plan) in results.items():
+                    speedup = before["p50_ms"] / after["p50_ms"] if after["p50_ms"] else 0
+                    print(f"   {path:<28} {before['p50_ms']:>11.3f} {after['p50_ms']:>11.3f} "
+                          f"{after['p95_ms']:>11.3f} {speedup:>7.1f}x")
+                    print(f"      {plan}")
+            return 0
+
+        conn = get_connection(args.db)
+        try:
+            started = time.perf_counter()
+            for table in tables:
+                if args.command == "profile":
+                    print_profile(table, *profile_table(conn, table, args.sample, args.batch_size, args.seed),
+                                  args.min_coverage)
+                elif args.command == "apply":
+                    paths = resolve_paths(conn, table, args.key, args)
+                    added = apply_columns(conn, table, paths, args.storage, args.batch_size, args.sleep)
+                    skipped = len(paths) - len(added)
+                    print(f"\n✓ {table}: 新增 {len(added)} 列" + (f", {skipped} 列已存在" if skipped else ""))
+                    for path in added:
+                        print(f"   + {column_name(path)} <- {path}")
+                else:
+                    dropped = drop_columns(conn, table, [normalize_path(key) for key in args.key])
+                    print(f"\n✓ {table}: 删除 {len(dropped)} 列")
+                    for column in dropped:
+                        print(f"   - {column}")
+            print(f"\n   用时 {time.perf_counter() - started:.3f}s")
+        finally:
+            conn.close()
+        return 0
+    except ValueError as e:
+        print(f"\n错误: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并行压测数据生成脚本
+用进程池把 generate_load_data.py 的生成工作分片到多个临时 SQLite 分片库并行写入，
+最后通过 ATTACH DATABASE + INSERT ... SELECT 合并到目标库。
+
+- 工作单元：每个租户的基础数据（租户/部门/用户/流程定义）一个单元，
+  流程实例按 INSTANCE_BLOCK_SIZE 对齐的序号区间切成多个单元
+- 各单元的 Id 区间由 LoadPlan 计算，天然互不重叠；生成结果与单进程模式逐行一致
+- --scaling 1,2,4 依次用不同进程数生成到目标库副本，输出加速比
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_load_data import (
+    DB_PATH, LoadPlan, RateMeter, generate_instances, generate_tenant_base, instance_blocks,
+    parse_args as parse_load_args, reset_generated, write_instances,
+)
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 合并顺序（父表在前）
+GENERATED_TABLES = ["Tenants", "Departments", "Users", "ProcessDefinitions", "ProcessInstances", "TaskInstances"]
+
+def get_connection(db_path):
+    """获取数据库连接"""
+    return sql_profiler.connect(db_path)
+
+def plan_work_units(plan):
+    """
+    切分工作单元，返回 [(估计行数, 单元)]
+    单元为 ("base", 租户序号) 或 ("instances", 租户序号, 起始序号, 结束序号)
+    """
+    avg_tasks = (1 + plan.max_tasks) / 2
+    units = []
+    for tenant_index in range(plan.tenants):
+        _, user_count = plan.user_range(tenant_index)
+        units.append((1 + plan.depts_per_tenant + user_count, ("base", tenant_index)))
+        for start, end in instance_blocks(plan, tenant_index):
+            units.append((int((end - start) * (1 + avg_tasks)), ("instances", tenant_index, start, end)))
+    return units
+
+def assign_units(units, workers):
+    """按估计行数贪心分配（最大的单元优先放到当前最轻的分片）"""
+    shards = [[0, []] for _ in range(workers)]
+    for weight, unit in sorted(units, key=lambda item: -item[0]):
+        lightest = min(shards, key=lambda shard: shard[0])
+        lightest[0] += weight
+        lightest[1].append(unit)
+    return [shard[1] for shard in shards if shard[1]]
+
+def load_table_schemas(db_path):
+    """读取目标库中生成表的建表语句（分片库不建索引，合并时由目标库维护）"""
+    conn = get_connection(db_path)
+    try:
+        placeholders = ", ".join("?" * len(GENERATED_TABLES))
+        rows = conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+            GENERATED_TABLES).fetchall()
+        return dict(rows)
+    finally:
+        conn.close()
+
+def run_shard(job):
+    """
+    子进程入口：在独立分片库中生成分配到的单元
+    返回 (分片路径, 各表行数, 用时秒)
+    """
+    shard_path, schemas, args, units = job
+    plan = LoadPlan(args)
+    conn = get_connection(shard_path)
+    # 分片库是临时文件，崩溃后直接丢弃，可以关闭日志与同步
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for table in GENERATED_TABLES:
+        conn.execute(schemas[table])
+    meter = RateMeter()
+    try:
+        for unit in units:
+            if unit[0] == "base":
+                generate_tenant_base(conn, plan, unit[1], args.chunk_size, meter)
+            else:
+                _, tenant_index, start, end = unit
+                write_instances(conn, generate_instances(plan, tenant_index, (start, end)), args.chunk_size, meter)
+        conn.commit()
+    finally:
+        conn.close()
+    return shard_path, meter.counts, time.perf_counter() - meter.started
+
+def merge_shards(target, shard_paths):
+    """把各分片依次 ATTACH 到目标库，逐表 INSERT ... SELECT，每个分片一个事务"""
+    conn = get_connection(target)
+    conn.isolation_level = None
+    try:
+        columns = {}
+        for table in GENERATED_TABLES:
+            columns[table] = ", ".join(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
+        merged = 0
+        for shard_path in shard_paths:
+            conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for table in GENERATED_TABLES:
+                    cursor = conn.execute(
+                        f"INSERT INTO main.{table} ({columns[table]}) SELECT {columns[table]} FROM shard.{table}")
+                    merged += cursor.rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.execute("DETACH DATABASE shard")
+        return merged
+    finally:
+        conn.close()
+
+def parallel_generate(target, args, workers, verbose=True):
+    """并行生成并合并，返回 (生成用时, 合并用时, 各表行数)"""
+    plan = LoadPlan(args)
+    plan.validate()
+    shards = assign_units(plan_work_units(plan), workers)
+    schemas = load_table_schemas(target)
+    missing = [table for table in GENERATED_TABLES if table not in schemas]
+    if missing:
+        raise ValueError(f"目标库缺少数据表: {', '.join(missing)}")
+
+    shard_dir = tempfile.mkdtemp(prefix="workflow_shards_", dir=os.path.dirname(os.path.abspath(target)))
+    try:
+        jobs = [(os.path.join(shard_dir, f"shard_{i:03d}.db"), schemas, args, units) for i, units in enumerate(shards)]
+        started = time.perf_counter()
+        counts = {}
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(run_shard, jobs))
+        generate_seconds = time.perf_counter() - started
+        for shard_path, shard_counts, seconds in results:
+            for table, rows in shard_counts.items():
+                counts[table] = counts.get(table, 0) + rows
+            if verbose:
+                print(f"   {os.path.basename(shard_path)}: {sum(shard_counts.values()):,} 行, {seconds:.2f}s")
+
+        started = time.perf_counter()
+        merge_shards(target, [result[0] for result in results])
+        merge_seconds = time.perf_counter() - started
+        return generate_seconds, merge_seconds, counts
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+def run_scaling(args, worker_counts):
+    """在目标库副本上依次测试不同进程数，输出耗时与加速比"""
+    print(f"\nCPU 核数: {os.cpu_count()}")
+    print(f"\n{'进程数':>6} {'生成(s)':>10} {'合并(s)':>10} {'总计(s)':>10} {'行/秒':>12} {'加速比':>8}")
+    baseline = None
+    for workers in worker_counts:
+        fd, copy_path = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(args.db)))
+        os.close(fd)
+        try:
+            shutil.copyfile(args.db, copy_path)
+            conn = get_connection(copy_path)
+            reset_generated(conn)
+            conn.close()
+            generate_seconds, merge_seconds, counts = parallel_generate(copy_path, args, workers, verbose=False)
+        finally:
+            os.remove(copy_path)
+        total = generate_seconds + merge_seconds
+        baseline = baseline or total
+        rows = sum(counts.values())
+        print(f"{workers:>8} {generate_seconds:>10.2f} {merge_seconds:>10.2f} {total:>10.2f} "
+              f"{rows / total:>12,.0f} {baseline / total:>7.2f}x")
+
+def parse_args(argv=None):
+    """解析命令行参数：在 generate_load_data.py 参数基础上增加并行选项"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument("--scaling", help="逗号分隔的进程数列表，在数据库副本上测试加速比，例如 1,2,4,8")
+    own, rest = parser.parse_known_args(argv)
+    if "-h" in rest or "--help" in rest:
+        parser.print_help()
+    args = parse_load_args(rest)
+    args.workers = max(1, own.workers)
+    args.scaling = [int(n) for n in own.scaling.split(",")] if own.scaling else None
+    return args
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("并行压测数据生成脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    try:
+        if args.scaling:
+            run_scaling(args, args.scaling)
+            return 0
+
+        if args.reset:
+            print("\n清理之前生成的数据...")
+            conn = get_connection(args.db)
+            reset_generated(conn)
+            conn.close()
+
+        print(f"\n使用 {args.workers} 个进程生成分片...")
+        generate_seconds, merge_seconds, counts = parallel_generate(args.db, args, args.workers)
+        total = generate_seconds + merge_seconds
+        rows = sum(counts.values())
+        print("\n生成统计:")
+        for table in GENERATED_TABLES:
+            print(f"   {table:<20} {counts.get(table, 0):>14,} 行")
+        print(f"   生成 {generate_seconds:.2f}s + 合并 {merge_seconds:.2f}s = {total:.2f}s, {rows / total:,.0f} 行/秒")
+        print("\n✓ 并行数据生成完成！")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+日志保留清理脚本
+按各表的保留天数删除 LoginLogs、OperationLogs、SysTaskLogs 中的过期记录，可在 API 运行期间执行：
+
+- 按 (时间列, Id) 键集分页，每批不超过 --batch-size 行，每批一个短事务（BEGIN IMMEDIATE ... COMMIT）
+- 批间暂停，写锁很快释放，WAL 由自动检查点及时回收
+- 可选 --archive-dir：删除前先把该批记录追加到 gzip 压缩的 JSON Lines 归档文件
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 数据库路径
+DB_PATH = r'D:\Code\WorkFlowCore\WorkFlowCore\src\WorkFlowCore.API\workflow_dev.db'
+
+# 表名 -> (时间列, 默认保留天数)；时间列均已建索引
+RETENTION_POLICIES = {
+    "LoginLogs": ("LoginTime", 180),
+    "OperationLogs": ("CreationTime", 90),
+    "SysTaskLogs": ("CreationTime", 30),
+}
+
+def get_connection(db_path, busy_timeout):
+    """获取数据库连接（自动提交模式，事务由批次显式控制）"""
+    conn = sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+    return conn
+
+def format_cutoff(moment):
+    """EF Core 写入 SQLite 的 DateTime 文本格式，截止时间按同样格式比较"""
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_retention(values):
+    """解析 --retention 表名=天数 覆盖项"""
+    policies = {table: days for table, (_, days) in RETENTION_POLICIES.items()}
+    for value in values or []:
+        table, _, days = value.partition("=")
+        if table not in RETENTION_POLICIES or not days.isdigit():
+            raise ValueError(f"无效的保留策略: {value}（格式: 表名=天数，表名限 {', '.join(RETENTION_POLICIES)}）")
+        policies[table] = int(days)
+    return policies
+
+class ArchiveWriter:
+    """把清理的记录追加到 gzip 压缩的 JSON Lines 文件，每行一个 {列名: 值} 对象"""
+
+    def __init__(self, archive_dir, table, columns):
+        os.makedirs(archive_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(archive_dir, f"{table}_{stamp}.jsonl.gz")
+        self.columns = columns
+        self.file = gzip.open(self.path, "at", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False))
+            self.file.write("\n")
+        # 每批落盘后才提交删除
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class PurgeStats:
+    """单表清理统计"""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0
+        self.batches = 0
+        self.lock_seconds = 0.0
+        self.max_lock_seconds = 0.0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_batch(self, rows, held):
+        self.rows += rows
+        self.batches += 1
+        self.lock_seconds += held
+        self.max_lock_seconds = max(self.max_lock_seconds, held)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0
+
+def count_expired(conn, table, time_column, cutoff):
+    """统计过期记录数（走时间列索引）"""
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {time_column} < ?", (cutoff,)).fetchone()[0]
+
+def purge_table(conn, table, time_column, cutoff, batch_size, pause, archive_dir=None):
+    """
+    键集分页删除一张表的过期记录
+    每批：BEGIN IMMEDIATE -> 取下一页 (时间列, Id) 之后的记录 -> 归档 -> 按 Id 删除 -> COMMIT
+    """
+    stats = PurgeStats(table)
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    select_list = ", ".join(columns) if archive_dir else f"{time_column}, Id"
+    time_index = columns.index(time_column) if archive_dir else 0
+    id_index = columns.index("Id") if archive_dir else 1
+    archive = ArchiveWriter(archive_dir, table, columns) if archive_dir else None
+    last_key = None
+    try:
+        while True:
+            if last_key is None:
+                where, params = f"{time_column} < ?", (cutoff,)
+            else:
+                where = f"{time_column} < ? AND ({time_column}, Id) > (?, ?)"
+                params = (cutoff,) + last_key
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT {select_list} FROM {table} WHERE {where} ORDER BY {time_column}, Id LIMIT ?",
+                    params + (batch_size,)).fetchall()
+                if not rows:
+                    conn.execute("COMMIT")
+                    break
+                if archive:
+                    archive.write(rows)
+                conn.executemany(f"DELETE FROM {table} WHERE Id = ?", [(row[id_index],) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            stats.add_batch(len(rows), time.perf_counter() - started)
+            last_key = (rows[-1][time_index], rows[-1][id_index])
+            if stats.batches % 100 == 0:
+                print(f"   {table}: 已删除 {stats.rows:,} 行")
+            if len(rows) < batch_size:
+                break
+            time.sleep(pause)
+    finally:
+        if archive:
+            archive.close()
+    stats.finish()
+    return stats, archive.path if archive else None
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="按保留策略分批清理审计日志")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--tables", nargs="+", choices=list(RETENTION_POLICIES), default=list(RETENTION_POLICIES),
+                        help="要清理的表 (默认全部)")
+    parser.add_argument("--retention", action="append", metavar="表名=天数", help="覆盖默认保留天数，可多次指定")
+    parser.add_argument("--batch-size", type=int, default=2000, help="每批删除的最大行数")
+    parser.add_argument("--pause", type=float, default=0.05, help="批间暂停秒数")
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="获取写锁的等待秒数")
+    parser.add_argument("--archive-dir", help="删除前归档到该目录 (gzip JSON Lines)")
+    parser.add_argument("--dry-run", action="store_true", help="只统计过期记录数，不删除")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("日志保留清理脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+    try:
+        policies = parse_retention(args.retention)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    conn = get_connection(args.db, args.busy_timeout)
+    now = datetime.now(timezone.utc)
+    results = []
+    try:
+        for table in args.tables:
+            time_column, _ = RETENTION_POLICIES[table]
+            cutoff = format_cutoff(now - timedelta(days=policies[table]))
+            with sql_profiler.step(f"{table} 统计过期"):
+                expired = count_expired(conn, table, time_column, cutoff)
+            print(f"\n{table}: 保留 {policies[table]} 天, 截止 {cutoff}, 过期 {expired:,} 行")
+            if args.dry_run or expired == 0:
+                continue
+
+            with sql_profiler.step(f"{table} 分批删除"):
+                stats, archive_path = purge_table(conn, table, time_column, cutoff,
+                                                  args.batch_size, args.pause, args.archive_dir)
+            # 清理完一张表后做一次被动检查点，避免 WAL 持续增长
+            with sql_profiler.step(f"{table} 检查点"):
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            results.append(stats)
+            print(f"   ✓ 删除 {stats.rows:,} 行, {stats.batches} 批, {stats.rate():,.0f} 行/秒")
+            if archive_path:
+                print(f"   ✓ 已归档到 {archive_path}")
+
+        if results:
+            print("\n清理统计:")
+            print(f"   {'表名':<16} {'行数':>12} {'行/秒':>10} {'锁合计(s)':>10} {'单批最长(ms)':>12}")
+            for stats in results:
+                print(f"   {stats.table:<18} {stats.rows:>12,} {stats.rate():>10,.0f} "
+                      f"{stats.lock_seconds:>10.2f} {stats.max_lock_seconds * 1000:>12.1f}")
+        print("\n✓ 日志清理完成！")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+角色菜单快照脚本
+把每个 ABP 角色的可见菜单树与权限码物化到 RoleMenuSnapshots 表，登录/getInfo 只需按角色读取快照，
+不再每次联接 AbpUserRoles -> RoleMenus -> Menus：
+
+- refresh:   按源数据指纹检测过期角色，只重建变化的快照（--force 全量重建）
+- check:     只报告过期、缺失、多余的快照，有差异时退出码为 1
+- show:      输出某个角色的快照内容
+- benchmark: 在数据库副本上比较联接查询与读取快照的延迟
+
+指纹为该角色授权的 (MenuId, 菜单内容列) 按 MenuId 排序后的 SHA-1，一次按 RoleId 有序的联接扫描即可算出全部角色的指纹；
+菜单内容、状态、软删除或授权关系变化都会改变指纹。
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+
+from audit_query_plans import HOT_QUERIES
+from benchmark_workflow import copy_database, run_workload
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+SNAPSHOT_DDL = """
+    CREATE TABLE IF NOT EXISTS RoleMenuSnapshots (
+        RoleId TEXT NOT NULL PRIMARY KEY,
+        Fingerprint TEXT NOT NULL,
+        MenuCount INTEGER NOT NULL,
+        PermissionCount INTEGER NOT NULL,
+        Snapshot BLOB NOT NULL,
+        BuiltTime TEXT NOT NULL
+    ) WITHOUT ROWID
+"""
+
+# 参与指纹与快照的菜单列
+MENU_COLUMNS = ("Id", "ParentId", "MenuName", "MenuType", "Path", "Component", "PermissionCode",
+                "Icon", "OrderNum", "Visible", "IsFrame", "Status", "IsDeleted")
+
+# 快照格式版本，格式变化时所有快照都视为过期
+SNAPSHOT_VERSION = 1
+
+def get_connection(db_path, busy_timeout=5.0):
+    """获取数据库连接（自动提交模式，事务显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def role_menu_rows(conn, role_ids=None):
+    """按 (RoleId, MenuId) 顺序流式返回 (RoleId, 菜单列...)；走 RoleMenus(RoleId, MenuId) 唯一索引"""
+    select = ", ".join(f"m.{name}" for name in MENU_COLUMNS)
+    where = ""
+    params = ()
+    if role_ids is not None:
+        where = "WHERE rm.RoleId IN (%s)" % ", ".join("?" * len(role_ids))
+        params = tuple(role_ids)
+    return conn.execute(f"""
+        SELECT rm.RoleId, {select}
+        FROM RoleMenus rm
+        JOIN Menus m ON m.Id = rm.MenuId
+        {where}
+        ORDER BY rm.RoleId, rm.MenuId
+    """, params)
+
+def compute_fingerprints(conn):
+    """一次有序扫描计算全部角色的指纹；没有任何授权的角色指纹为空内容的哈希"""
+    digests = {}
+    for row in role_menu_rows(conn):
+        digest = digests.get(row[0])
+        if digest is None:
+            digest = digests[row[0]] = hashlib.sha1(f"v{SNAPSHOT_VERSION}".encode())
+        digest.update(repr(row[1:]).encode("utf-8"))
+    empty = hashlib.sha1(f"v{SNAPSHOT_VERSION}".encode()).hexdigest()
+    fingerprints = {role_id: empty for (role_id,) in conn.execute("SELECT Id FROM AbpRoles")}
+    fingerprints.update((role_id, digest.hexdigest()) for role_id, digest in digests.items())
+    return fingerprints
+
+def build_menu_tree(menus):
+    """按 (ParentId, OrderNum, Id) 排序组装菜单树；父菜单未授权时子菜单挂到根"""
+    menus = sorted(menus, key=lambda menu: (menu["parentId"] or 0, menu["orderNum"] or 0, menu["id"]))
+    nodes = {menu["id"]: dict(menu, children=[]) for menu in menus}
+    roots = []
+    for menu in menus:
+        parent = nodes.get(menu["parentId"])
+        (parent["children"] if parent else roots).append(nodes[menu["id"]])
+    return roots
+
+def menu_from_row(row):
+    """菜单列元组转为快照中的菜单对象"""
+    menu_id, parent_id, name, menu_type, path, component, permission, icon, order_num, visible, is_frame = row[:11]
+    return {"id": menu_id, "parentId": parent_id, "name": name, "type": menu_type, "path": path,
+            "component": component, "permission": permission, "icon": icon, "orderNum": order_num,
+            "visible": visible, "isFrame": is_frame}
+
+def build_snapshot(role_id, rows):
+    """由角色的授权菜单行生成快照（只含启用且未删除的菜单），返回 (压缩后的 JSON, 菜单数, 权限数)"""
+    menus = [menu_from_row(row) for row in rows if row[11] == "0" and not row[12]]
+    permissions = sorted({menu["permission"] for menu in menus if menu["permission"]})
+    snapshot = {"version": SNAPSHOT_VERSION, "roleId": role_id, "menus": build_menu_tree(menus),
+                "permissions": permissions}
+    blob = zlib.compress(json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return blob, len(menus), len(permissions)
+
+def load_snapshot(blob):
+    """解压快照"""
+    return json.loads(zlib.decompress(blob))
+
+def merge_snapshots(snapshots):
+    """合并用户多个角色的快照：菜单按 Id 去重后重新组树，权限码取并集"""
+    if len(snapshots) == 1:
+        return snapshots[0]["menus"], snapshots[0]["permissions"]
+    menus, permissions = {}, set()
+    for snapshot in snapshots:
+        permissions.update(snapshot["permissions"])
+        stack = list(snapshot["menus"])
+        while stack:
+            node = stack.pop()
+            stack.extend(node["children"])
+            menus[node["id"]] = {key: value for key, value in node.items() if key != "children"}
+    return build_menu_tree(menus.values()), sorted(permissions)
+
+def snapshot_table_exists(conn):
+    """快照表是否已建；只有 refresh 建表，check/show 不写库"""
+    row = conn.execute("SELECT 1 FROM sqlite_schema WHERE type = 'table' AND name = 'RoleMenuSnapshots'").fetchone()
+    return row is not None
+
+def diff_snapshots(conn):
+    """比较当前指纹与已存快照，返回 (当前指纹, 过期或缺失的角色, 多余的角色)；快照表不存在时全部角色都过期"""
+    current = compute_fingerprints(conn)
+    stored = {}
+    if snapshot_table_exists(conn):
+        stored = dict(conn.execute("SELECT RoleId, Fingerprint FROM RoleMenuSnapshots"))
+    stale = sorted(role_id for role_id, fingerprint in current.items() if stored.get(role_id) != fingerprint)
+    extra = sorted(role_id for role_id in stored if role_id not in current)
+    return current, stale, extra
+
+def refresh_snapshots(conn, force=False):
+    """重建过期快照并删除多余快照，一个事务内完成；返回 (重建角色数, 删除数, 角色总数)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(SNAPSHOT_DDL)
+        current, stale, extra = diff_snapshots(conn)
+        if force:
+            stale = sorted(current)
+        rows_by_role = {role_id: [] for role_id in stale}
+        if stale:
+            for row in role_menu_rows(conn, stale):
+                rows_by_role[row[0]].append(row[1:])
+        now = datetime.now(timezone.utc).isoformat()
+        records = []
+        for role_id in stale:
+            blob, menu_count, permission_count = build_snapshot(role_id, rows_by_role[role_id])
+            records.append((role_id, current[role_id], menu_count, permission_count, blob, now))
+        conn.executemany("""
+            INSERT INTO RoleMenuSnapshots (RoleId, Fingerprint, MenuCount, PermissionCount, Snapshot, BuiltTime)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(RoleId) DO UPDATE SET Fingerprint = excluded.Fingerprint, MenuCount = excluded.MenuCount,
+                PermissionCount = excluded.PermissionCount, Snapshot = excluded.Snapshot, BuiltTime = excluded.BuiltTime
+        """, records)
+        conn.executemany("DELETE FROM RoleMenuSnapshots WHERE RoleId = ?", [(role_id,) for role_id in extra])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(records), len(extra), len(current)
+
+def user_menus_from_snapshots(conn, user_id):
+    """登录路径：按用户角色读取快照并合并"""
+    blobs = conn.execute("""
+        SELECT s.Snapshot FROM AbpUserRoles ur
+        JOIN RoleMenuSnapshots s ON s.RoleId = ur.RoleId
+        WHERE ur.UserId = ?
+    """, (user_id,)).fetchall()
+    if not blobs:
+        return [], []
+    return merge_snapshots([load_snapshot(blob) for (blob,) in blobs])
+
+def user_menus_from_join(conn, user_id):
+    """原做法：联接查询后在内存中组树并收集权限码"""
+    rows = conn.execute(HOT_QUERIES["role_menu_resolution"]["sql"], (user_id,)).fetchall()
+    menus = [{"id": row[0], "parentId": row[1], "name": row[2], "type": row[3], "path": row[4],
+              "component": row[5], "permission": row[6], "orderNum": row[7]} for row in rows]
+    return build_menu_tree(menus), sorted({menu["permission"] for menu in menus if menu["permission"]})
+
+def run_benchmark(db_path, iterations, warmup):
+    """在副本上刷新快照后，对有角色的用户轮流执行两种登录路径"""
+    work_dir = tempfile.mkdtemp(prefix="workflow_snapshot_")
+    bench_path = os.path.join(work_dir, "bench.db")
+    try:
+        copy_database(db_path, bench_path)
+        conn = get_connection(bench_path)
+        refresh_snapshots(conn)
+        users = [row[0] for row in conn.execute("SELECT DISTINCT UserId FROM AbpUserRoles LIMIT 500")]
+        if not users:
+            raise RuntimeError("AbpUserRoles 中没有数据")
+
+        def cycle(function):
+            position = [0]
+
+            def operation():
+                position[0] += 1
+                return function(conn, users[position[0] % len(users)])
+            return operation
+
+        results = {name: run_workload(cycle(function), iterations, warmup)
+                   for name, function in (("join", user_menus_from_join), ("snapshot", user_menus_from_snapshots))}
+        conn.close()
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="角色菜单快照维护")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("refresh", "重建过期快照"), ("check", "检查快照是否过期"),
+                            ("show", "输出角色快照"), ("benchmark", "联接查询与快照读取对比")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+        if name == "refresh":
+            command.add_argument("--force", action="store_true", help="忽略指纹，全量重建")
+        if name == "show":
+            command.add_argument("--role", required=True, help="ABP 角色 Id 或名称")
+        if name == "benchmark":
+            command.add_argument("--iterations", type=int, default=2000, help="每种路径的计时次数")
+            command.add_argument("--warmup", type=int, default=100, help="预热次数")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("角色菜单快照脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    try:
+        if args.command == "benchmark":
+            print(f"\n在副本上测试 ({args.iterations:,} 次/路径)...")
+            results = run_benchmark(args.db, args.iterations, args.warmup)
+            print(f"\n{'路径':<12} {'平均(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'ops/s':>10}")
+            for name, stats in results.items():
+                print(f"{name:<14} {stats['mean_ms']:>10.3f} {stats['p50_ms']:>10.3f} "
+                      f"{stats['p95_ms']:>10.3f} {stats['ops_per_sec']:>10,.0f}")
+            return 0
+
+        conn = get_connection(args.db)
+        try:
+            started = time.perf_counter()
+            if args.command == "refresh":
+                rebuilt, removed, total = refresh_snapshots(conn, args.force)
+                if rebuilt or removed:
+                    print(f"\n✓ 重建 {rebuilt} 个角色快照, 删除 {removed} 个多余快照 (共 {total} 个角色)")
+                else:
+                    print(f"\n✓ 全部 {total} 个角色快照均为最新")
+                print(f"   用时 {time.perf_counter() - started:.3f}s")
+            elif args.command == "check":
+                current, stale, extra = diff_snapshots(conn)
+                print(f"\n{len(current)} 个角色, 过期或缺失 {len(stale)} 个, 多余 {len(extra)} 个")
+                for role_id in stale[:20]:
+                    print(f"   ~ {role_id}")
+                for role_id in extra[:20]:
+                    print(f"   - {role_id}")
+                return 1 if stale or extra else 0
+            else:
+                row = snapshot_table_exists(conn) and conn.execute("""
+                    SELECT s.RoleId, s.Fingerprint, s.BuiltTime, s.Snapshot FROM RoleMenuSnapshots s
+                    LEFT JOIN AbpRoles r ON r.Id = s.RoleId
+                    WHERE s.RoleId = ? OR r.Name = ?
+                """, (args.role, args.role)).fetchone()
+                if not row:
+                    print(f"\n错误: 没有角色 {args.role} 的快照，请先执行 refresh")
+                    return 1
+                print(f"\n角色 {row[0]}  指纹 {row[1]}  生成于 {row[2]}")
+                print(json.dumps(load_snapshot(row[3]), ensure_ascii=False, indent=2))
+        finally:
+            conn.close()
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分片上传存储巡检脚本
+对照 FileAttachments / FileChunks 检查本地存储目录（--storage-root，即 StoragePath 的根目录）：
+
+- 已上传分片：文件是否存在、大小是否一致、内容哈希是否与 ChunkHash 相同（按哈希长度识别 MD5/SHA-1/SHA-256）
+- 已完成附件：合并后的文件是否存在、大小是否一致，--verify-files 时校验整文件 MD5
+- 孤儿文件：存储目录中没有任何记录引用、且超过 --min-age-hours 未修改的文件
+- 过期上传：长时间停留在上传中状态的附件
+- 重复文件：Md5Hash 与 FileSize 相同但存放在不同路径的已完成附件（只报告可回收的空间；API 删除附件时
+  直接删除其 StoragePath 而不做引用计数，让多条记录共享一个文件会在删除任一记录时丢失其余记录的数据）
+
+目录清单写入连接内的临时表，与库中路径的比对在 SQL 中完成；哈希由线程池通过 mmap 读取，
+在途任务数固定，内存占用与文件总量无关。默认只报告，清理动作需显式指定，按批次提交；
+清理时逐行复查扫描时看到的状态，扫描之后被 API 推进的上传和分片保持不变。
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from init_database import DB_PATH
+from purge_logs import format_cutoff
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# FileAttachments.UploadStatus
+UPLOAD_UPLOADING, UPLOAD_COMPLETED, UPLOAD_CANCELLED = 0, 1, 3
+# FileChunks.UploadStatus
+CHUNK_COMPLETED, CHUNK_FAILED = 2, 3
+
+# 按十六进制摘要长度识别哈希算法
+HASH_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+# mmap 每次送入哈希的窗口大小
+HASH_WINDOW = 8 * 1024 * 1024
+
+# 报告中每类问题最多列出的示例数
+SAMPLE_LIMIT = 10
+
+def get_connection(db_path, busy_timeout):
+    """获取数据库连接（自动提交模式，清理批次显式控制事务；临时表落盘，不占用内存）"""
+    conn = sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+    conn.execute("PRAGMA temp_store = FILE")
+    return conn
+
+def hash_file(path, algorithm):
+    """通过 mmap 分窗口计算文件摘要，返回 (十六进制摘要, 字节数)"""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, size, HASH_WINDOW):
+                        digest.update(view[offset:offset + HASH_WINDOW])
+    return digest.hexdigest(), size
+
+class HashPool:
+    """
+    限制在途任务数的哈希线程池：submit 在队列满时先取回最早的结果，
+    结果按提交顺序交给 callback(任务上下文, 摘要或异常)
+    """
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = deque()
+        self.limit = workers * 4
+        self.bytes = 0
+        self.files = 0
+        self.seconds = 0.0
+        self.started = None
+
+    def submit(self, path, algorithm, callback, context):
+        if self.started is None:
+            self.started = time.perf_counter()
+        while len(self.pending) >= self.limit:
+            self.collect_one()
+        self.pending.append((callback, context, self.executor.submit(hash_file, path, algorithm)))
+
+    def collect_one(self):
+        callback, context, future = self.pending.popleft()
+        try:
+            digest, size = future.result()
+        except OSError as e:
+            callback(context, e)
+            return
+        self.bytes += size
+        self.files += 1
+        callback(context, digest)
+
+    def drain(self):
+        while self.pending:
+            self.collect_one()
+        if self.started is not None:
+            self.seconds += time.perf_counter() - self.started
+            self.started = None
+
+    def close(self):
+        self.drain()
+        self.executor.shutdown()
+
+    def rate(self):
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds > 0 else 0
+
+class ScanReport:
+    """各类问题的计数与示例"""
+
+    def __init__(self):
+        self.counts = {}
+        self.samples = {}
+        # 需标记为失败的分片 Id
+        self.failed_chunks = []
+
+    def add(self, kind, detail, size=0):
+        count, total = self.counts.get(kind, (0, 0))
+        self.counts[kind] = (count + 1, total + size)
+        samples = self.samples.setdefault(kind, [])
+        if len(samples) < SAMPLE_LIMIT:
+            samples.append(detail)
+
+    def count(self, kind):
+        return self.counts.get(kind, (0, 0))[0]
+
+def storage_path(root, relative):
+    """StoragePath 统一使用 / 分隔"""
+    return os.path.join(root, *relative.split("/"))
+
+def index_storage(conn, root, batch_size):
+    """遍历存储目录，把 (相对路径, 大小, 修改时间) 分批写入临时表；返回 (文件数, 总字节数)"""
+    conn.execute("DROP TABLE IF EXISTS temp.StorageFiles")
+    conn.execute("CREATE TEMP TABLE StorageFiles (Path TEXT PRIMARY KEY, Size INTEGER, MTime REAL) WITHOUT ROWID")
+    files, total, batch = 0, 0, []
+    stack = [""]
+    while stack:
+        relative_dir = stack.pop()
+        with os.scandir(os.path.join(root, relative_dir) if relative_dir else root) as entries:
+            for entry in entries:
+                relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(relative)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    batch.append((relative, stat.st_size, stat.st_mtime))
+                    files += 1
+                    total += stat.st_size
+                    if len(batch) >= batch_size:
+                        conn.executemany("INSERT INTO temp.StorageFiles VALUES (?, ?, ?)", batch)
+                        batch = []
+    if batch:
+        conn.executemany("INSERT INTO temp.StorageFiles VALUES (?, ?, ?)", batch)
+    conn.execute("DROP TABLE IF EXISTS temp.ReferencedPaths")
+    conn.execute("CREATE TEMP TABLE ReferencedPaths (Path TEXT PRIMARY KEY) WITHOUT ROWID")
+    conn.execute("""
+        INSERT OR IGNORE INTO temp.ReferencedPaths
+        SELECT StoragePath FROM FileAttachments WHERE StoragePath <> ''
+        UNION ALL
+        SELECT StoragePath FROM FileChunks WHERE StoragePath <> ''
+    """)
+    return files, total
+
+def check_chunks(conn, root, pool, report):
+    """上传中附件的已完成分片：缺失、大小不符，或（有 ChunkHash 时）内容哈希不符"""
+    def on_hashed(context, result):
+        chunk_id, attachment_id, chunk_index, expected = context
+        if isinstance(result, Exception):
+            report.add("chunk_unreadable", (chunk_id, str(result)))
+        elif result != expected:
+            report.add("chunk_corrupt", (chunk_id, attachment_id, chunk_index))
+            report.failed_chunks.append(chunk_id)
+
+    for chunk_id, attachment_id, chunk_index, chunk_hash, chunk_size, path, actual_size in conn.execute(f"""
+        SELECT c.Id, c.AttachmentId, c.ChunkIndex, c.ChunkHash, c.ChunkSize, c.StoragePath, f.Size
+        FROM FileChunks c
+        JOIN FileAttachments a ON a.Id = c.AttachmentId
+        LEFT JOIN temp.StorageFiles f ON f.Path = c.StoragePath
+        WHERE a.UploadStatus = {UPLOAD_UPLOADING} AND a.IsDeleted = 0
+          AND c.UploadStatus = {CHUNK_COMPLETED} AND c.IsDeleted = 0
+        ORDER BY c.AttachmentId, c.ChunkIndex
+    """):
+        if actual_size is None:
+            report.add("chunk_missing", (chunk_id, attachment_id, chunk_index, path))
+            report.failed_chunks.append(chunk_id)
+        elif actual_size != chunk_size:
+            report.add("chunk_size_mismatch", (chunk_id, attachment_id, chunk_index, chunk_size, actual_size))
+            report.failed_chunks.append(chunk_id)
+        elif chunk_hash and len(chunk_hash) in HASH_ALGORITHMS:
+            pool.submit(storage_path(root, path), HASH_ALGORITHMS[len(chunk_hash)], on_hashed,
+                        (chunk_id, attachment_id, chunk_index, chunk_hash.lower()))
+        else:
+            report.add("chunk_unverified", (chunk_id,))
+    pool.drain()
+
+def check_attachments(conn, root, pool, report, verify_files):
+    """已完成附件：合并文件缺失、大小不符；verify_files 时按路径去重后校验整文件 MD5"""
+    def on_hashed(context, result):
+        path, expected = context
+        if isinstance(result, Exception):
+            report.add("file_unreadable", (path, str(result)))
+        elif result != expected:
+            report.add("file_corrupt", (path, expected, result))
+
+    last_path = None
+    for attachment_id, path, file_size, md5_hash, actual_size in conn.execute(f"""
+        SELECT a.Id, a.StoragePath, a.FileSize, a.Md5Hash, f.Size
+        FROM FileAttachments a
+        LEFT JOIN temp.StorageFiles f ON f.Path = a.StoragePath
+        WHERE a.UploadStatus = {UPLOAD_COMPLETED} AND a.IsDeleted = 0
+        ORDER BY a.StoragePath
+    """):
+        if actual_size is None:
+            report.add("file_missing", (attachment_id, path), file_size or 0)
+        elif actual_size != file_size:
+            report.add("file_size_mismatch", (attachment_id, path, file_size, actual_size))
+        elif verify_files and path != last_path and len(md5_hash or "") == 32:
+            pool.submit(storage_path(root, path), "md5", on_hashed, (path, md5_hash.lower()))
+        last_path = path
+    pool.drain()
+
+def orphan_files(conn, min_mtime):
+    """流式返回没有任何记录引用且足够旧的文件 (路径, 大小)"""
+    return conn.execute("""
+        SELECT f.Path, f.Size FROM temp.StorageFiles f
+        WHERE f.MTime < ? AND NOT EXISTS (SELECT 1 FROM temp.ReferencedPaths r WHERE r.Path = f.Path)
+        ORDER BY f.Path
+    """, (min_mtime,))
+
+def delete_orphans(conn, root, min_mtime, batch_size):
+    """按批读取孤儿文件清单并删除，返回 (删除数, 释放字节数)"""
+    cursor = orphan_files(conn, min_mtime)
+    deleted, freed = 0, 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return deleted, freed
+        count, size = delete_files(root, [path for path, _ in batch])
+        deleted += count
+        freed += size
+
+def find_stale_uploads(conn, cutoff, report):
+    """CreationTime 早于截止时间且仍在上传中的附件"""
+    stale = conn.execute(f"""
+        SELECT Id, OriginalFileName, CreationTime, UploadedChunks, TotalChunks FROM FileAttachments
+        WHERE UploadStatus = {UPLOAD_UPLOADING} AND IsDeleted = 0 AND CreationTime < ?
+        ORDER BY Id
+    """, (cutoff,)).fetchall()
+    for row in stale:
+        report.add("stale_upload", row)
+    return [row[0] for row in stale]
+
+def find_duplicates(conn, report):
+    """
+    Md5Hash 与 FileSize 相同、存放在多个路径的已完成附件（走 Md5Hash 索引分组），只报告；
+    每组可回收的空间按 (路径数 - 1) * FileSize 计
+    """
+    for md5_hash, file_size, paths in conn.execute(f"""
+        SELECT Md5Hash, FileSize, COUNT(DISTINCT StoragePath) FROM FileAttachments
+        WHERE UploadStatus = {UPLOAD_COMPLETED} AND IsDeleted = 0 AND Md5Hash <> ''
+        GROUP BY Md5Hash, FileSize
+        HAVING COUNT(DISTINCT StoragePath) > 1
+    """):
+        report.add("duplicate_group", (md5_hash, paths), (paths - 1) * (file_size or 0))
+
+def delete_files(root, paths):
+    """删除文件，返回 (删除数, 释放字节数)"""
+    deleted, freed = 0, 0
+    for path in paths:
+        full_path = storage_path(root, path)
+        try:
+            size = os.path.getsize(full_path)
+            os.remove(full_path)
+        except FileNotFoundError:
+            continue
+        deleted += 1
+        freed += size
+    return deleted, freed
+
+def run_batches(conn, items, batch_size, pause, apply_batch):
+    """按批执行清理：每批一个 BEGIN IMMEDIATE 短事务，提交后再处理文件"""
+    done = 0
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            after_commit = apply_batch(batch)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if after_commit:
+            after_commit()
+        done += len(batch)
+        time.sleep(pause)
+    return done
+
+def cancel_stale_uploads(conn, root, attachment_ids, batch_size, pause):
+    """
+    把过期上传标记为已取消并删除其分片文件（与 API 取消上传的处理一致）
+    更新条件复查 UploadStatus 仍为上传中，扫描后已完成或已取消的附件不改动、不删分片；返回 (取消数, 释放字节数)
+    """
+    now = format_cutoff(datetime.now(timezone.utc))
+    cancelled, freed = [0], [0]
+
+    def apply_batch(batch):
+        applied = [attachment_id for attachment_id in batch if conn.execute(f"""
+            UPDATE FileAttachments SET UploadStatus = {UPLOAD_CANCELLED}, LastModificationTime = ?, ConcurrencyStamp = ?
+            WHERE Id = ? AND UploadStatus = {UPLOAD_UPLOADING}
+        """, (now, str(uuid.uuid4()), attachment_id)).rowcount == 1]
+        cancelled[0] += len(applied)
+        if not applied:
+            return None
+        placeholders = ", ".join("?" * len(applied))
+        paths = [row[0] for row in conn.execute(
+            f"SELECT StoragePath FROM FileChunks WHERE AttachmentId IN ({placeholders}) AND StoragePath <> ''", applied)]
+        return lambda: freed.__setitem__(0, freed[0] + delete_files(root, paths)[1])
+    run_batches(conn, attachment_ids, batch_size, pause, apply_batch)
+    return cancelled[0], freed[0]
+
+def mark_chunks_failed(conn, chunk_ids, batch_size, pause):
+    """
+    把缺失或损坏的分片标记为失败并重算附件已上传分片数，客户端续传时会重新上传这些分片
+    更新条件复查扫描时的状态（分片已完成、附件仍在上传中），返回实际标记的分片数
+    """
+    marked = [0]
+
+    def apply_batch(batch):
+        applied = [chunk_id for chunk_id in batch if conn.execute(f"""
+            UPDATE FileChunks SET UploadStatus = {CHUNK_FAILED}, ConcurrencyStamp = ?
+            WHERE Id = ? AND UploadStatus = {CHUNK_COMPLETED}
+              AND AttachmentId IN (SELECT Id FROM FileAttachments WHERE UploadStatus = {UPLOAD_UPLOADING})
+        """, (str(uuid.uuid4()), chunk_id)).rowcount == 1]
+        marked[0] += len(applied)
+        if not applied:
+            return None
+        placeholders = ", ".join("?" * len(applied))
+        conn.execute(f"""
+            UPDATE FileAttachments SET UploadedChunks = (
+                SELECT COUNT(*) FROM FileChunks c WHERE c.AttachmentId = FileAttachments.Id AND c.UploadStatus = {CHUNK_COMPLETED})
+            WHERE Id IN (SELECT AttachmentId FROM FileChunks WHERE Id IN ({placeholders}))
+        """, applied)
+    run_batches(conn, chunk_ids, batch_size, pause, apply_batch)
+    return marked[0]
+
+def print_report(report):
+    """输出问题汇总"""
+    labels = {
+        "chunk_missing": "分片文件缺失", "chunk_size_mismatch": "分片大小不符", "chunk_corrupt": "分片哈希不符",
+        "chunk_unreadable": "分片无法读取", "chunk_unverified": "分片无哈希未校验",
+        "file_missing": "附件文件缺失", "file_size_mismatch": "附件大小不符", "file_corrupt": "附件 MD5 不符",
+        "file_unreadable": "附件无法读取", "orphan_file": "孤儿文件", "stale_upload": "过期上传",
+        "duplicate_group": "重复文件组(可回收)",
+    }
+    print("\n巡检结果:")
+    if not report.counts:
+        print("   ✓ 未发现问题")
+    for kind, label in labels.items():
+        if kind not in report.counts:
+            continue
+        count, size = report.counts[kind]
+        print(f"   {label:<14} {count:>10,}" + (f"   {size / 1024 / 1024:,.1f} MB" if size else ""))
+        for sample in report.samples[kind]:
+            print(f"      {sample}")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="巡检分片上传存储目录与数据库记录")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--storage-root", required=True, help="存储根目录（StoragePath 相对于该目录）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="哈希线程数")
+    parser.add_argument("--verify-files", action="store_true", help="校验已完成附件的整文件 MD5")
+    parser.add_argument("--min-age-hours", type=float, default=24, help="孤儿文件的最小未修改时长")
+    parser.add_argument("--stale-hours", type=float, default=48, help="上传中附件超过该时长视为过期")
+    parser.add_argument("--delete-orphans", action="store_true", help="删除孤儿文件")
+    parser.add_argument("--cancel-stale", action="store_true", help="取消过期上传并删除其分片文件")
+    parser.add_argument("--mark-failed", action="store_true", help="把缺失或损坏的分片标记为失败以便续传")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批清理的记录数")
+    parser.add_argument("--pause", type=float, default=0.05, help="批间暂停秒数")
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="获取写锁的等待秒数")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("分片上传存储巡检脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+    if not os.path.isdir(args.storage_root):
+        print(f"错误: 存储目录不存在: {args.storage_root}")
+        return 1
+
+    conn = get_connection(args.db, args.busy_timeout)
+    pool = HashPool(max(1, args.workers))
+    report = ScanReport()
+    now = datetime.now(timezone.utc)
+    try:
+        started = time.perf_counter()
+        files, total = index_storage(conn, args.storage_root, 5000)
+        print(f"\n存储目录: {files:,} 个文件, {total / 1024 / 1024:,.1f} MB ({time.perf_counter() - started:.1f}s)")
+
+        check_chunks(conn, args.storage_root, pool, report)
+        check_attachments(conn, args.storage_root, pool, report, args.verify_files)
+        if pool.files:
+            print(f"已校验 {pool.files:,} 个文件, {pool.bytes / 1024 / 1024:,.1f} MB, {pool.rate():,.1f} MB/s")
+        min_mtime = (now - timedelta(hours=args.min_age_hours)).timestamp()
+        for path, size in orphan_files(conn, min_mtime):
+            report.add("orphan_file", (path, size), size)
+        stale = find_stale_uploads(conn, format_cutoff(now - timedelta(hours=args.stale_hours)), report)
+        find_duplicates(conn, report)
+        print_report(report)
+
+        if args.mark_failed and report.failed_chunks:
+            count = mark_chunks_failed(conn, report.failed_chunks, args.batch_size, args.pause)
+            print(f"\n✓ 已标记 {count:,} 个分片为失败")
+        if args.cancel_stale and stale:
+            count, freed = cancel_stale_uploads(conn, args.storage_root, stale, args.batch_size, args.pause)
+            print(f"✓ 已取消 {count:,} 个过期上传, 释放 {freed / 1024 / 1024:,.1f} MB")
+        if args.delete_orphans and report.count("orphan_file"):
+            deleted, freed = delete_orphans(conn, args.storage_root, min_mtime, args.batch_size)
+            print(f"✓ 已删除 {deleted:,} 个孤儿文件, 释放 {freed / 1024 / 1024:,.1f} MB")
+        print(f"\n用时 {time.perf_counter() - started:.1f}s")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        pool.close()
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQL 执行统计
+各脚本的 get_connection 通过 connect() 打开数据库；未启用统计时直接返回普通 sqlite3 连接，没有额外开销。
+启用后返回带统计的连接，按归一化语句（字面量替换为 ?、IN 列表折叠）记录：
+
+- 执行次数、总/平均/最大耗时、耗时分布（对数分桶）、影响或返回的行数
+- 锁等待：连接以 timeout=0 打开，SQLITE_BUSY 由这里按退避重试直到原 timeout，累计等待时间与重试次数
+- 可选 trace 模式（set_trace_callback 输出每条语句）与慢语句监视（set_progress_handler 在语句运行超过阈值时提示）
+
+启用方式：
+- 环境变量 WORKFLOW_SQL_PROFILE=1（结束时输出汇总表）或 =文件路径.json（同时导出 JSON），
+  WORKFLOW_SQL_TRACE=1，WORKFLOW_SQL_SLOW_MS=毫秒
+- 或作为启动器运行其他脚本: python sql_profiler.py [--json 路径] [--trace] [--slow-ms N] purge_logs.py --dry-run
+"""
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import re
+import runpy
+import sqlite3
+import sys
+import time
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 耗时分桶上界（毫秒），最后一桶为超过 1s
+HISTOGRAM_BOUNDS_MS = (0.1, 1, 10, 100, 1000)
+
+# 忙重试退避（秒）
+BUSY_BACKOFF = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """归一化语句：压缩空白，字面量替换为 ?，IN (?, ?, ...) 与多行 VALUES 折叠"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _VALUES_LIST.sub("(...)", sql)
+
+def is_busy(error):
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message or "database table is locked" in message
+
+class StatementStats:
+    """单个归一化语句的统计"""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.lock_wait = 0.0
+        self.retries = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, seconds, rows, lock_wait, retries):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.lock_wait += lock_wait
+        self.retries += retries
+        milliseconds = seconds * 1000
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if milliseconds < bound),
+                      len(HISTOGRAM_BOUNDS_MS))
+        self.histogram[bucket] += 1
+
+    def to_dict(self):
+        return {
+            "sql": self.sql, "count": self.count, "errors": self.errors,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3), "rows": self.rows,
+            "lock_wait_ms": round(self.lock_wait * 1000, 3), "busy_retries": self.retries,
+            "histogram_ms": dict(zip([f"<{bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">={HISTOGRAM_BOUNDS_MS[-1]}"],
+                                     self.histogram)),
+        }
+
+class Profiler:
+    """进程内的统计汇总；trace 输出每条语句，slow_ms 启用慢语句监视"""
+
+    def __init__(self, json_path=None, trace=False, slow_ms=None):
+        self.json_path = json_path
+        self.trace = trace
+        self.slow_ms = slow_ms
+        self.statements = {}
+        self.steps = []
+        self.started = time.perf_counter()
+
+    def statement(self, sql):
+        key = normalize_sql(sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = StatementStats(key)
+        return stats
+
+    @contextlib.contextmanager
+    def step(self, name):
+        """记录一个步骤的耗时、语句数与锁等待"""
+        before = self.totals()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = self.totals()
+            self.steps.append({"name": name, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+                               "statements": after[0] - before[0],
+                               "lock_wait_ms": round((after[1] - before[1]) * 1000, 3)})
+
+    def totals(self):
+        return (sum(stats.count for stats in self.statements.values()),
+                sum(stats.lock_wait for stats in self.statements.values()))
+
+    def summary_table(self, top=25):
+        """按总耗时排序的汇总表"""
+        lines = []
+        if self.steps:
+            lines.append(f"\n{'步骤':<30} {'耗时(ms)':>12} {'语句数':>8} {'锁等待(ms)':>12}")
+            for step in self.steps:
+                lines.append(f"{step['name'][:32]:<32} {step['elapsed_ms']:>12,.1f} "
+                             f"{step['statements']:>8,} {step['lock_wait_ms']:>12,.1f}")
+        ordered = sorted(self.statements.values(), key=lambda stats: stats.total, reverse=True)
+        lines.append(f"\n{'次数':>8} {'总计(ms)':>10} {'平均(ms)':>10} {'最大(ms)':>10} {'行数':>10} "
+                     f"{'锁等待(ms)':>10} {'重试':>6}  语句")
+        for stats in ordered[:top]:
+            sql = stats.sql if len(stats.sql) <= 90 else stats.sql[:87] + "..."
+            lines.append(f"{stats.count:>10,} {stats.total * 1000:>12,.1f} {stats.total * 1000 / stats.count:>12,.3f} "
+                         f"{stats.max * 1000:>12,.1f} {stats.rows:>12,} {stats.lock_wait * 1000:>14,.1f} "
+                         f"{stats.retries:>8,}  {sql}")
+        if len(ordered) > top:
+            lines.append(f"... 另有 {len(ordered) - top} 种语句")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return {
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "steps": self.steps,
+            "statements": [stats.to_dict() for stats in
+                           sorted(self.statements.values(), key=lambda stats: stats.total, reverse=True)],
+        }
+
+    def report(self):
+        """输出汇总表，并按配置导出 JSON"""
+        if not self.statements and not self.steps:
+            return
+        print("\n" + "=" * 60)
+        print("SQL 执行统计")
+        print("=" * 60)
+        print(self.summary_table())
+        if self.json_path:
+            with open(self.json_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+            print(f"\n✓ 统计已导出到 {self.json_path}")
+
+class ProfiledCursor(sqlite3.Cursor):
+    """记录 execute/executemany/executescript 耗时，并把取数耗时与行数计入当前语句"""
+
+    _profile_stats = None
+    _profile_elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self.connection._profile_run(self, sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.connection._profile_run(self, sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.connection._profile_run(self, sqlite3.Cursor.executescript, sql_script, None)
+
+    def _fetched(self, started, rows):
+        if self._profile_stats is not None:
+            # 取数耗时计入本次执行，max 为单次执行（含取数）的最长耗时
+            seconds = time.perf_counter() - started
+            self._profile_elapsed += seconds
+            self._profile_stats.total += seconds
+            self._profile_stats.max = max(self._profile_stats.max, self._profile_elapsed)
+            self._profile_stats.rows += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+class ProfiledConnection(sqlite3.Connection):
+    """带统计的连接；busy_timeout 为应用层忙重试的总时长"""
+
+    profiler = None
+    busy_timeout = 5.0
+    running_sql = None
+    running_since = None
+    slow_reported = False
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # Connection.execute 等快捷方法在 C 层直接创建游标，需显式转到 ProfiledCursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        self._profile_run(self.cursor(), lambda cursor, sql: sqlite3.Connection.commit(self), "COMMIT", None)
+
+    def _profile_run(self, cursor, method, sql, parameters):
+        stats = self.profiler.statement(sql)
+        # executemany 传入生成器时参数会被消费，无法安全重放，不做忙重试
+        replayable = parameters is None or isinstance(parameters, (list, tuple, dict))
+        waited, retries = 0.0, 0
+        started = time.perf_counter()
+        self.running_sql, self.running_since, self.slow_reported = sql, started, False
+        try:
+            while True:
+                changes = self.total_changes
+                try:
+                    if parameters is None:
+                        method(cursor, sql)
+                    else:
+                        method(cursor, sql, parameters)
+                    break
+                except sqlite3.OperationalError as e:
+                    # 只在本次调用尚未写入任何行时重试，避免 executemany 部分成功后重复执行
+                    if (not is_busy(e) or not replayable or self.total_changes != changes
+                            or time.perf_counter() - started >= self.busy_timeout):
+                        stats.errors += 1
+                        raise
+                    delay = BUSY_BACKOFF[min(retries, len(BUSY_BACKOFF) - 1)]
+                    time.sleep(delay)
+                    waited += delay
+                    retries += 1
+        finally:
+            self.running_sql = None
+        elapsed = time.perf_counter() - started
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        stats.add(elapsed, rows, waited, retries)
+        cursor._profile_stats, cursor._profile_elapsed = stats, elapsed
+        slow_ms = self.profiler.slow_ms
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            print(f"   [慢语句] {elapsed * 1000:,.1f}ms: {normalize_sql(sql)[:200]}", file=sys.stderr)
+        return cursor
+
+    def _watch_slow(self):
+        """progress handler：语句运行超过阈值时提示一次，不中断执行"""
+        if (self.running_sql is not None and not self.slow_reported
+                and (time.perf_counter() - self.running_since) * 1000 >= self.profiler.slow_ms):
+            self.slow_reported = True
+            print(f"   [运行中] 已超过 {self.profiler.slow_ms}ms: {normalize_sql(self.running_sql)[:200]}",
+                  file=sys.stderr)
+        return 0
+
+_profiler = None
+
+def enable(json_path=None, trace=False, slow_ms=None):
+    """启用统计（进程内一次），结束时自动输出汇总"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(json_path, trace, slow_ms)
+        atexit.register(_profiler.report)
+    return _profiler
+
+def _enable_from_environment():
+    value = os.environ.get("WORKFLOW_SQL_PROFILE")
+    trace = os.environ.get("WORKFLOW_SQL_TRACE") == "1"
+    slow_ms = os.environ.get("WORKFLOW_SQL_SLOW_MS")
+    if value or trace or slow_ms:
+        enable(value if value and value.lower().endswith(".json") else None, trace,
+               float(slow_ms) if slow_ms else None)
+
+def get_profiler():
+    return _profiler
+
+def connect(database, timeout=5.0, **kwargs):
+    """sqlite3.connect 的替代：未启用统计时返回普通连接"""
+    if _profiler is None:
+        return sqlite3.connect(database, timeout=timeout, **kwargs)
+    conn = ProfiledConnection(database, timeout=0, **kwargs)
+    conn.profiler = _profiler
+    conn.busy_timeout = timeout
+    if _profiler.trace:
+        conn.set_trace_callback(lambda sql: print(f"   [SQL] {sql}", file=sys.stderr))
+    if _profiler.slow_ms is not None:
+        conn.set_progress_handler(conn._watch_slow, 10000)
+    return conn
+
+def step(name):
+    """按步骤统计耗时；未启用统计时为空操作"""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.step(name)
+
+_enable_from_environment()
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="启用 SQL 执行统计后运行指定脚本")
+    parser.add_argument("--json", help="导出统计 JSON 的路径")
+    parser.add_argument("--trace", action="store_true", help="输出每条执行的语句")
+    parser.add_argument("--slow-ms", type=float, help="慢语句阈值（毫秒），运行中超过时即提示")
+    parser.add_argument("script", help="要运行的脚本，如 purge_logs.py")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="传给脚本的参数")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    # 以启动器运行时本模块名为 __main__，让目标脚本 import 到同一个实例
+    sys.modules.setdefault("sql_profiler", sys.modules[__name__])
+    enable(args.json, args.trace, args.slow_ms)
+    script = os.path.abspath(args.script)
+    sys.argv = [script] + args.script_args
+    sys.path.insert(0, os.path.dirname(script))
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        return e.code
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
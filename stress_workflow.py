@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+并发压力测试脚本
+在数据库副本上用多个进程（或线程）模拟 API 并发写入，测出锁竞争的上限：
+
+- 负载混合：发起流程实例、认领任务、完成任务（推进到下一节点或结束实例）、写登录日志、写操作日志、待办查询
+- 配置矩阵：journal_mode × busy_timeout × 事务方式（DEFERRED / IMMEDIATE）× 并发数，每个组合使用全新副本
+- 指标：成功吞吐量、成功操作的 p50/p95/p99 延迟、busy 错误率（database is locked）、乐观并发冲突数与其延迟；
+        待办池已空时认领/完成任务不算一次尝试；busy 以外的数据库错误说明脚本或表结构有问题，立即终止本次测试
+
+worker 直接使用 sqlite3.connect 而不经 sql_profiler：忙等待必须由 SQLite 自身的 busy_timeout 处理，
+测出的才是 API 实际会遇到的 busy 错误率。读后写的事务在 DEFERRED 方式下从读锁升级为写锁，
+WAL 模式下若快照已过期会立即返回 busy（不等待 busy_timeout），这是突发审批时 "database is locked" 的主要来源。
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from audit_query_plans import HOT_QUERIES
+from benchmark_workflow import copy_database, percentile, sample_column
+from generate_load_data import weighted_choice
+from init_database import DB_PATH
+from sql_profiler import is_busy
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 默认负载混合 (操作, 权重)
+DEFAULT_MIX = (
+    ("start_instance", 15),
+    ("claim_task", 20),
+    ("complete_task", 25),
+    ("login_log", 15),
+    ("operation_log", 15),
+    ("inbox_read", 10),
+)
+
+# 每个 worker 的新 Id 区块宽度，各 worker 从 MAX(Id) + 1 + 序号 * 宽度 起分配，互不重叠
+ID_STRIDE = 10 ** 9
+
+# 每次运行前所有 worker 的启动缓冲（秒），保证同时开始计时
+START_DELAY = 1.0
+
+# 操作没有可用的待办任务时的返回值，不计入尝试次数
+IDLE = "idle"
+
+# 计入尝试次数的结果
+OUTCOMES = ("ok", "busy", "conflict")
+
+def get_connection(db_path, busy_timeout):
+    """worker 连接：自动提交模式，busy_timeout 由 SQLite 处理（秒）"""
+    return sqlite3.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def parse_list(text, cast=str):
+    """逗号分隔的参数列表"""
+    return [cast(item.strip()) for item in text.split(",") if item.strip()]
+
+def parse_mix(text):
+    """name=weight,name=weight 形式的负载混合"""
+    known = dict(DEFAULT_MIX)
+    mix = []
+    for item in parse_list(text):
+        name, _, weight = item.partition("=")
+        if name not in known:
+            raise ValueError(f"未知操作: {name}（可选 {', '.join(known)}）")
+        mix.append((name, float(weight or known[name])))
+    return tuple(mix)
+
+class Operations:
+    """单个 worker 的操作集合；读后写的操作按 tx_style 开启事务，返回 False 表示乐观并发冲突，IDLE 表示待办池已空"""
+
+    def __init__(self, conn, tx_style, rng, pools, id_bases):
+        self.conn = conn
+        self.begin = f"BEGIN {tx_style.upper()}"
+        self.rng = rng
+        self.pending = list(pools["pending_tasks"])
+        self.users = pools["users"]
+        self.definitions = pools["definitions"]
+        self.next_ids = dict(id_bases)
+        self.created = []
+
+    def allocate(self, table):
+        value = self.next_ids[table]
+        self.next_ids[table] += 1
+        return value
+
+    def transaction(self, work):
+        """在事务中执行 work(conn)；提交成功后新建的任务才进入待办池，异常时回滚"""
+        conn = self.conn
+        self.created = []
+        conn.execute(self.begin)
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self.pending.extend(self.created)
+        return result
+
+    def new_task(self, instance_id, node, assignee, tenant_id, now):
+        return (self.allocate("TaskInstances"), instance_id, f"node_{node}", f"审批{node}", "UserTask", assignee,
+                "Pending", 0, tenant_id, now, now, "{}", str(uuid.uuid4()))
+
+    def insert_tasks(self, conn, tasks):
+        conn.executemany("""
+            INSERT INTO TaskInstances (Id, ProcessInstanceId, NodeId, Name, TaskType, AssigneeId, Status, Priority,
+                                       TenantId, CreationTime, LastModificationTime, ExtraProperties, ConcurrencyStamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, tasks)
+        self.created.extend(task[0] for task in tasks)
+
+    def start_instance(self):
+        user_id, tenant_id = self.rng.choice(self.users)[:2]
+        definition_id, definition_name = self.rng.choice(self.definitions)
+        now = datetime.now(timezone.utc).isoformat()
+        instance_id = self.allocate("ProcessInstances")
+
+        def work(conn):
+            conn.execute("""
+                INSERT INTO ProcessInstances (Id, ProcessDefinitionId, BusinessKey, Title, InitiatorId, Status,
+                                              Variables, StartTime, TenantId, CreationTime, ExtraProperties,
+                                              ConcurrencyStamp)
+                VALUES (?, ?, ?, ?, ?, 'Running', ?, ?, ?, ?, '{}', ?)
+            """, (instance_id, definition_id, f"STRESS-{instance_id}", f"{definition_name}-压测", user_id,
+                  json.dumps({"amount": self.rng.randint(100, 50000)}), now, tenant_id, now, str(uuid.uuid4())))
+            self.insert_tasks(conn, [self.new_task(instance_id, 1, self.rng.choice(self.users)[0], tenant_id, now)])
+        return self.transaction(work)
+
+    def pick_pending(self):
+        if not self.pending:
+            return None
+        index = self.rng.randrange(len(self.pending))
+        self.pending[index], self.pending[-1] = self.pending[-1], self.pending[index]
+        return self.pending[-1]
+
+    def claim_task(self):
+        task_id = self.pick_pending()
+        if task_id is None:
+            return IDLE
+        user_id = self.rng.choice(self.users)[0]
+        now = datetime.now(timezone.utc).isoformat()
+
+        def work(conn):
+            row = conn.execute("SELECT ConcurrencyStamp FROM TaskInstances WHERE Id = ? AND Status = 'Pending'",
+                               (task_id,)).fetchone()
+            if row is None:
+                return False
+            cursor = conn.execute("""
+                UPDATE TaskInstances SET AssigneeId = ?, LastModificationTime = ?, ConcurrencyStamp = ?
+                WHERE Id = ? AND ConcurrencyStamp = ?
+            """, (user_id, now, str(uuid.uuid4()), task_id, row[0]))
+            return cursor.rowcount == 1
+        return self.transaction(work)
+
+    def complete_task(self):
+        task_id = self.pick_pending()
+        if task_id is None:
+            return IDLE
+        self.pending.pop()
+        now = datetime.now(timezone.utc).isoformat()
+
+        def work(conn):
+            row = conn.execute("""
+                SELECT ConcurrencyStamp, ProcessInstanceId, NodeId, TenantId FROM TaskInstances
+                WHERE Id = ? AND Status = 'Pending'
+            """, (task_id,)).fetchone()
+            if row is None:
+                return False
+            stamp, instance_id, node_id, tenant_id = row
+            cursor = conn.execute("""
+                UPDATE TaskInstances
+                SET Status = 'Completed', CompleteTime = ?, Comment = '同意', LastModificationTime = ?,
+                    ConcurrencyStamp = ?
+                WHERE Id = ? AND ConcurrencyStamp = ?
+            """, (now, now, str(uuid.uuid4()), task_id, stamp))
+            if cursor.rowcount != 1:
+                return False
+            node = int(node_id.rsplit("_", 1)[-1]) if node_id and node_id.rsplit("_", 1)[-1].isdigit() else 1
+            if node < 3 and self.rng.random() < 0.6:
+                self.insert_tasks(conn, [self.new_task(instance_id, node + 1, self.rng.choice(self.users)[0],
+                                                       tenant_id, now)])
+            else:
+                conn.execute("""
+                    UPDATE ProcessInstances SET Status = 'Completed', EndTime = ?, LastModificationTime = ?,
+                        ConcurrencyStamp = ?
+                    WHERE Id = ?
+                """, (now, now, str(uuid.uuid4()), instance_id))
+            return True
+        return self.transaction(work)
+
+    def login_log(self):
+        _, tenant_id, abp_user_id, user_name = self.rng.choice(self.users)
+        now = datetime.now(timezone.utc).isoformat()
+        # UserId 为 ABP 用户的 Guid（与 LoginLogService 一致），没有关联 ABP 用户时为 NULL
+        self.conn.execute("""
+            INSERT INTO LoginLogs (Id, UserId, UserName, TenantId, Ipaddr, LoginLocation, Browser, Os, Status, Msg,
+                                   LoginTime, CreationTime, ExtraProperties, ConcurrencyStamp)
+            VALUES (?, ?, ?, ?, '127.0.0.1', '', 'stress', 'linux', '0', '登录成功', ?, ?, '{}', ?)
+        """, (self.allocate("LoginLogs"), abp_user_id, user_name, tenant_id, now, now, str(uuid.uuid4())))
+
+    def operation_log(self):
+        now = datetime.now(timezone.utc).isoformat()
+        self.conn.execute("""
+            INSERT INTO OperationLogs (Id, Title, BusinessType, OperatorName, RequestMethod, RequestUrl, Status,
+                                       ExecutionTime, IsDeleted, CreationTime)
+            VALUES (?, '流程审批', 'UPDATE', 'stress', 'POST', '/api/workflow/tasks/complete', '0', ?, 0, ?)
+        """, (self.allocate("OperationLogs"), self.rng.randint(5, 200), now))
+
+    def inbox_read(self):
+        self.conn.execute(HOT_QUERIES["task_inbox"]["sql"], (self.rng.choice(self.users)[0], "Pending")).fetchall()
+
+def run_worker(job):
+    """worker 入口：等到统一开始时间后循环执行负载，返回 {操作: 统计}；busy 以外的数据库错误直接抛出"""
+    db_path, index, config, pools, id_bases, mix, start_at, duration, think, seed = job
+    rng = random.Random(seed * 1000 + index)
+    conn = get_connection(db_path, config["busy_timeout_ms"] / 1000)
+    bases = {table: base + index * ID_STRIDE for table, base in id_bases.items()}
+    ops = Operations(conn, config["tx_style"], rng, pools, bases)
+    stats = {name: {"ok": 0, "busy": 0, "conflict": 0, IDLE: 0,
+                    "latencies": [], "busy_latencies": [], "conflict_latencies": []}
+             for name, _ in mix}
+    try:
+        time.sleep(max(0.0, start_at - time.time()))
+        deadline = start_at + duration
+        while time.time() < deadline:
+            name = weighted_choice(rng, mix)
+            started = time.perf_counter()
+            try:
+                result = getattr(ops, name)()
+                outcome = IDLE if result == IDLE else "conflict" if result is False else "ok"
+            except sqlite3.OperationalError as e:
+                if not is_busy(e):
+                    raise RuntimeError(f"{name} 失败: {e}") from e
+                outcome = "busy"
+            except sqlite3.DatabaseError as e:
+                raise RuntimeError(f"{name} 失败: {e}") from e
+            elapsed = (time.perf_counter() - started) * 1000
+            item = stats[name]
+            item[outcome] += 1
+            if outcome == "ok":
+                item["latencies"].append(elapsed)
+            elif outcome != IDLE:
+                item[f"{outcome}_latencies"].append(elapsed)
+            if think:
+                time.sleep(rng.uniform(0, 2 * think))
+    finally:
+        conn.close()
+    return stats
+
+def load_pools(conn, seed):
+    """从库中抽取负载参数与各表下一个可用 Id"""
+    rng = random.Random(seed)
+    pools = {
+        "pending_tasks": sample_column(conn, "SELECT Id FROM TaskInstances WHERE Status = 'Pending' LIMIT 200000",
+                                       rng, 20000),
+        "users": conn.execute("SELECT Id, TenantId, AbpUserId, UserName FROM Users LIMIT 5000").fetchall(),
+        "definitions": conn.execute("SELECT Id, Name FROM ProcessDefinitions LIMIT 1000").fetchall(),
+    }
+    if not pools["users"] or not pools["definitions"]:
+        raise RuntimeError("库中没有用户或流程定义，请先执行 init_database.py / generate_load_data.py")
+    id_bases = {table: (conn.execute(f"SELECT MAX(Id) FROM {table}").fetchone()[0] or 0) + 1
+                for table in ("ProcessInstances", "TaskInstances", "LoginLogs", "OperationLogs")}
+    return pools, id_bases
+
+def summarize(results, duration):
+    """合并各 worker 的统计：吞吐量与延迟分位数只计成功的操作，busy 与冲突的延迟单独统计"""
+    latencies, busy_latencies, conflict_latencies = [], [], []
+    totals = {key: 0 for key in OUTCOMES + (IDLE,)}
+    per_op = {}
+    for stats in results:
+        for name, item in stats.items():
+            op = per_op.setdefault(name, {key: 0 for key in totals})
+            for key in totals:
+                totals[key] += item[key]
+                op[key] += item[key]
+            latencies.extend(item["latencies"])
+            busy_latencies.extend(item["busy_latencies"])
+            conflict_latencies.extend(item["conflict_latencies"])
+    latencies.sort()
+    busy_latencies.sort()
+    conflict_latencies.sort()
+    attempts = sum(totals[key] for key in OUTCOMES)
+    return {
+        **totals,
+        "attempts": attempts,
+        "ops_per_sec": totals["ok"] / duration,
+        "busy_rate": totals["busy"] / attempts if attempts else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "busy_p50_ms": percentile(busy_latencies, 0.50),
+        "conflict_p50_ms": percentile(conflict_latencies, 0.50),
+        "per_operation": per_op,
+    }
+
+def run_config(db_path, work_dir, config, concurrency, args, mix):
+    """在全新副本上以指定配置与并发数运行一次"""
+    run_path = os.path.join(work_dir, "run.db")
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(run_path + suffix):
+            os.remove(run_path + suffix)
+    copy_database(db_path, run_path)
+    conn = sqlite3.connect(run_path, isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA journal_mode = {config['journal_mode']}").fetchone()
+        pools, id_bases = load_pools(conn, args.seed)
+    finally:
+        conn.close()
+
+    start_at = time.time() + START_DELAY + concurrency * 0.02
+    jobs = [(run_path, index, config, pools, id_bases, mix, start_at, args.duration, args.think_ms / 1000, args.seed)
+            for index in range(concurrency)]
+    executor = ProcessPoolExecutor if args.worker_kind == "process" else ThreadPoolExecutor
+    with executor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_worker, jobs))
+    return summarize(results, args.duration)
+
+def safe_limits(runs, max_busy_rate, max_p99_ms):
+    """每个配置下满足 busy 错误率与 p99 阈值的最大并发数"""
+    limits = {}
+    for run in runs:
+        key = (run["journal_mode"], run["busy_timeout_ms"], run["tx_style"])
+        limits.setdefault(key, 0)
+        if run["busy_rate"] <= max_busy_rate and run["p99_ms"] <= max_p99_ms:
+            limits[key] = max(limits[key], run["concurrency"])
+    return limits
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="SQLite 并发写入压力测试")
+    parser.add_argument("--db", default=DB_PATH, help="已填充数据的数据库文件（在副本上测试）")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="并发数列表")
+    parser.add_argument("--journal-modes", default="wal", help="journal_mode 列表，如 wal,delete")
+    parser.add_argument("--busy-timeouts", default="1000", help="busy_timeout 列表（毫秒），如 0,100,1000,5000")
+    parser.add_argument("--tx-styles", default="deferred,immediate", help="读后写事务的开启方式列表")
+    parser.add_argument("--worker-kind", choices=("process", "thread"), default="process", help="worker 类型")
+    parser.add_argument("--duration", type=float, default=5.0, help="每次运行的秒数")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="每个 worker 操作间的平均思考时间（毫秒）")
+    parser.add_argument("--mix", help="负载混合，如 complete_task=50,login_log=50（默认各操作按内置权重）")
+    parser.add_argument("--max-busy-rate", type=float, default=0.001, help="安全上限判定：busy 错误率阈值")
+    parser.add_argument("--max-p99-ms", type=float, default=200.0, help="安全上限判定：p99 延迟阈值（毫秒）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="结果保存为 JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("并发压力测试脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    try:
+        mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+        configs = [{"journal_mode": mode, "busy_timeout_ms": timeout, "tx_style": style}
+                   for mode in parse_list(args.journal_modes)
+                   for timeout in parse_list(args.busy_timeouts, int)
+                   for style in parse_list(args.tx_styles)]
+        bad_styles = {config["tx_style"] for config in configs} - {"deferred", "immediate"}
+        if bad_styles:
+            raise ValueError(f"未知事务方式: {', '.join(sorted(bad_styles))}（可选 deferred, immediate）")
+        levels = parse_list(args.concurrency, int)
+        print(f"\n{len(configs)} 个配置 × {len(levels)} 个并发级别, 每次 {args.duration}s ({args.worker_kind})")
+
+        runs = []
+        work_dir = tempfile.mkdtemp(prefix="workflow_stress_", dir=os.path.dirname(os.path.abspath(args.db)))
+        try:
+            for config in configs:
+                print(f"\njournal_mode={config['journal_mode']}, busy_timeout={config['busy_timeout_ms']}ms, "
+                      f"事务={config['tx_style'].upper()}")
+                print(f"   {'并发':>4} {'ops/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9} "
+                      f"{'busy':>7} {'busy率':>7} {'冲突':>6} {'空池':>6}")
+                for concurrency in levels:
+                    result = run_config(args.db, work_dir, config, concurrency, args, mix)
+                    runs.append({**config, "concurrency": concurrency, **result})
+                    print(f"   {concurrency:>4} {result['ops_per_sec']:>9,.0f} {result['p50_ms']:>9.2f} "
+                          f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.1f} "
+                          f"{result['busy']:>7,} {result['busy_rate']:>7.2%} {result['conflict']:>6,} "
+                          f"{result[IDLE]:>6,}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"\n安全并发上限 (busy 率 <= {args.max_busy_rate:.2%}, p99 <= {args.max_p99_ms:.0f}ms):")
+        for (mode, timeout, style), limit in safe_limits(runs, args.max_busy_rate, args.max_p99_ms).items():
+            text = str(limit) if limit else f"低于 {min(levels)}"
+            print(f"   {mode:<8} busy_timeout={timeout:<6} {style.upper():<10} {text}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": datetime.now(timezone.utc).isoformat(), "sqlite_version": sqlite3.sqlite_version,
+                           "duration": args.duration, "mix": dict(mix), "runs": runs}, f, ensure_ascii=False, indent=2)
+            print(f"\n✓ 结果已保存到 {args.output}")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+租户数据迁移脚本
+把一个租户的业务数据（部门、用户、流程、任务、附件、日志等）在数据库文件之间搬迁或克隆：
+
+- export: 在一个读事务（一致快照）内按依赖顺序逐表键集分页读取，写入压缩的 JSON Lines 文件，内存占用与租户大小无关
+- import: 先扫描一遍文件确认完整并得到各表 Id 区间，按目标库现有 Id 计算偏移；需要平移的被引用表再扫描一遍，
+          把导出的 Id 写入临时表 temp.ExportedIds（内存占用与租户大小无关），
+          然后逐批改写引用并 executemany 写入（默认整个导入一个事务，--commit-rows 可分段提交）
+
+文件格式（每行一个 JSON）：头部 {"format": ...}，每张表 {"table", "columns"} + 若干行数组 +
+{"end", "rows", "minId", "maxId"}，末尾 {"done": true}。
+
+Id 重映射：某表导出的 Id 区间与目标库已有数据不冲突时保持原 Id，否则整体平移到该表 Id 段当前最大值之后；
+引用列只有取值恰为被引用表导出的 Id 时才随之平移，指向宿主数据（如 TenantId 为空的部门）或其他租户的引用
+即使落在导出区间内也保持不变。
+TenantId 统一改写为目标租户的 Guid。ABP 身份表（AbpUsers、AbpRoles 等 Guid 主键）不在范围内，
+Users.AbpUserId 等 Guid 引用原样保留；Variables 等自由格式 JSON 内的 Id 不做改写。
+RoleMenus 以 ABP 角色 Guid 关联，同样不迁移，导入后需重新分配角色菜单。
+
+唯一索引不含 TenantId 的列（岗位 PostCode、第三方账号 Provider + OpenId）在计划阶段检查：
+重复的岗位编码加 "-<目标租户 Code>" 后缀，重复的第三方账号跳过并提示。
+附件与分片的 StoragePath 指向存储文件，源租户仍在目标库中（同库克隆）时默认跳过这两张表，
+--share-files 可强制导入（新旧租户共用文件）。
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+from backup_database import COMPRESSORS
+from generate_load_data import ID_BASES, INT64_MAX, segment_end, tenant_guid
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+FILE_FORMAT = "workflow-tenant"
+FILE_VERSION = 1
+
+# 按依赖顺序排列（父表在前）：(表, 无 TenantId 列时经父表筛选的 (外键列, 父表), {引用列: 被引用表})
+TENANT_TABLES = (
+    ("Departments", None, {"ParentId": "Departments", "ManagerId": "Users"}),
+    ("Users", None, {"DepartmentId": "Departments", "ManagerId": "Users"}),
+    ("Roles", None, {}),
+    ("Posts", None, {}),
+    ("Menus", None, {"ParentId": "Menus"}),
+    ("Notices", None, {}),
+    ("ProcessDefinitions", None, {}),
+    ("ProcessInstances", None, {"ProcessDefinitionId": "ProcessDefinitions", "InitiatorId": "Users"}),
+    ("TaskInstances", None, {"ProcessInstanceId": "ProcessInstances", "AssigneeId": "Users"}),
+    ("FileStorageProviders", None, {}),
+    ("FileAttachments", None, {"StorageProviderId": "FileStorageProviders"}),
+    ("FileChunks", ("AttachmentId", "FileAttachments"), {"AttachmentId": "FileAttachments"}),
+    ("SysTasks", None, {}),
+    ("SysTaskLogs", None, {"TaskId": "SysTasks"}),
+    ("LoginLogs", None, {}),
+    ("UserThirdPartyAccounts", None, {}),
+)
+
+# 存放 Id 列表的列：(表, 列) -> (被引用表, 格式)；json 为 JSON 数组，csv 为逗号分隔（部门 Ancestors）
+ID_LIST_COLUMNS = {
+    ("TaskInstances", "CandidateUsers"): ("Users", "json"),
+    ("Departments", "Ancestors"): ("Departments", "csv"),
+}
+
+# 被其他列引用的表，Id 平移时需要记录其导出的 Id
+REFERENCED_TABLES = frozenset([ref for _, _, refs in TENANT_TABLES for ref in refs.values()]
+                              + [ref for ref, _ in ID_LIST_COLUMNS.values()])
+
+# 导出的 Id 存在目标连接的临时表中，内存占用与租户大小无关
+EXPORTED_IDS_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS ExportedIds (
+        TableName TEXT NOT NULL,
+        Id INTEGER NOT NULL,
+        PRIMARY KEY (TableName, Id)
+    ) WITHOUT ROWID
+"""
+
+# 数据行的第一列为 Id，扫描时只解析这一段
+ROW_ID = re.compile(r"\[(-?\d+)")
+
+# 唯一索引不含 TenantId 的列：表 -> (唯一键列, 与目标库重复时的处理)
+# 岗位编码加 "-<目标租户 Code>" 后缀；第三方账号 (Provider, OpenId) 是外部身份，只能绑定一个用户，跳过该行
+UNIQUE_KEYS = {
+    "Posts": (("PostCode",), "suffix"),
+    "UserThirdPartyAccounts": (("Provider", "OpenId"), "skip"),
+}
+
+# 附件与分片的 StoragePath 指向存储中的文件，API 删除附件时直接删除文件而不计引用
+FILE_TABLES = ("FileAttachments", "FileChunks")
+
+def get_connection(db_path, busy_timeout=5.0):
+    """获取数据库连接（自动提交模式，事务显式控制）"""
+    return sql_profiler.connect(db_path, isolation_level=None, timeout=busy_timeout)
+
+def compression_for(path):
+    """按扩展名判断压缩格式"""
+    for name, (extension, _) in COMPRESSORS.items():
+        if extension and path.endswith(extension):
+            return name
+    return "none"
+
+def open_text(path, mode, compression=None):
+    """以 UTF-8 文本方式打开（可能压缩的）文件，mode 为 "r" 或 "w"；压缩格式缺省按扩展名判断"""
+    _, opener = COMPRESSORS[compression or compression_for(path)]
+    raw = (opener or open)(path, mode + "b")
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="\n")
+
+def dump_line(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def table_columns(conn, table):
+    """表的普通列（不含生成列），Id 在最前"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})") if row[6] == 0]
+    return sorted(columns, key=lambda column: column != "Id")
+
+def find_tenant(conn, tenant):
+    """按整数 Id 或 Code 查找租户行，返回 (列名, 行)"""
+    cursor = conn.execute("SELECT * FROM Tenants WHERE Id = ? OR Code = ?",
+                          (int(tenant) if tenant.isdigit() else None, tenant))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"租户不存在: {tenant}")
+    return [column[0] for column in cursor.description], row
+
+def tenant_rows(conn, table, columns, parent, guid, batch_size):
+    """按主键键集分页流式读取租户在一张表中的行（columns 的第一列为 Id）"""
+    if parent is None:
+        condition = "TenantId = ?"
+    else:
+        column, parent_table = parent
+        condition = f"{column} IN (SELECT Id FROM {parent_table} WHERE TenantId = ?)"
+    last_id = -2 ** 63
+    while True:
+        rows = conn.execute(f"""
+            SELECT {', '.join(columns)} FROM {table}
+            WHERE Id > ? AND {condition}
+            ORDER BY Id LIMIT ?
+        """, (last_id, guid, batch_size)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1][0]
+
+def export_tenant(conn, tenant, path, batch_size, progress=True):
+    """导出租户到文件；先写临时文件，完成后改名。返回 {表: 行数}"""
+    partial = path + ".partial"
+    counts = {}
+    conn.execute("BEGIN")
+    try:
+        columns, tenant_row = find_tenant(conn, tenant)
+        tenant_id = tenant_row[columns.index("Id")]
+        guid = tenant_guid(tenant_id)
+        with open_text(partial, "w", compression_for(path)) as f:
+            f.write(dump_line({"format": FILE_FORMAT, "version": FILE_VERSION, "tenantId": tenant_id,
+                               "tenantCode": tenant_row[columns.index("Code")], "tenantGuid": guid,
+                               "exportedAt": datetime.now(timezone.utc).isoformat()}))
+            f.write(dump_line({"table": "Tenants", "columns": columns}))
+            f.write(dump_line(list(tenant_row)))
+            f.write(dump_line({"end": "Tenants", "rows": 1, "minId": tenant_id, "maxId": tenant_id}))
+            for table, parent, _ in TENANT_TABLES:
+                table_cols = table_columns(conn, table)
+                f.write(dump_line({"table": table, "columns": table_cols}))
+                count, low, high = 0, None, None
+                for row in tenant_rows(conn, table, table_cols, parent, guid, batch_size):
+                    f.write(dump_line(row))
+                    count += 1
+                    low = row[0] if low is None else low
+                    high = row[0]
+                f.write(dump_line({"end": table, "rows": count, "minId": low, "maxId": high}))
+                counts[table] = count
+                if progress:
+                    print(f"   ✓ {table:<24} {count:>12,} 行")
+            f.write(dump_line({"done": True, "rows": sum(counts.values()) + 1}))
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        conn.execute("COMMIT")
+    return tenant_id, counts
+
+def read_manifest(path):
+    """第一遍扫描：只解析控制行，返回 (头部, {表: 区段信息})；文件截断或格式不符时报错"""
+    header, sections, done = None, {}, False
+    try:
+        with open_text(path, "r") as f:
+            for line in f:
+                if not line.startswith("{"):
+                    continue
+                entry = json.loads(line)
+                if header is None:
+                    if entry.get("format") != FILE_FORMAT or entry.get("version") != FILE_VERSION:
+                        raise ValueError(f"不是租户导出文件或版本不支持: {path}")
+                    header = entry
+                elif "table" in entry:
+                    sections[entry["table"]] = {"columns": entry["columns"]}
+                elif "end" in entry:
+                    sections[entry["end"]].update(rows=entry["rows"], minId=entry["minId"], maxId=entry["maxId"])
+                elif entry.get("done"):
+                    done = True
+    except EOFError:
+        done = False
+    if header is None or not done or any("rows" not in section for section in sections.values()):
+        raise ValueError(f"导出文件不完整: {path}")
+    return header, sections
+
+def plan_offsets(conn, sections):
+    """各表的 Id 偏移：导出区间与目标库无冲突时为 0，否则平移到该表 Id 段当前最大值之后"""
+    offsets = {}
+    for table, section in sections.items():
+        offsets[table] = 0
+        if table == "Tenants" or not section["rows"]:
+            continue
+        low, high = section["minId"], section["maxId"]
+        if not conn.execute(f"SELECT 1 FROM {table} WHERE Id BETWEEN ? AND ? LIMIT 1", (low, high)).fetchone():
+            continue
+        if table in ID_BASES:
+            upper = segment_end(table)
+            (top,) = conn.execute(f"SELECT MAX(Id) FROM {table} WHERE Id < ?", (upper,)).fetchone()
+        else:
+            upper = INT64_MAX
+            (top,) = conn.execute(f"SELECT MAX(Id) FROM {table}").fetchone()
+        offsets[table] = top + 1 - low
+        if high + offsets[table] >= upper:
+            raise ValueError(f"{table} 的 Id 段剩余空间不足，无法容纳 {section['rows']:,} 行")
+    return offsets
+
+def key_exists(conn, table, columns, values):
+    """目标库中是否已有该唯一键（走对应的唯一索引）"""
+    condition = " AND ".join(f"{column} = ?" for column in columns)
+    return conn.execute(f"SELECT 1 FROM {table} WHERE {condition} LIMIT 1", values).fetchone() is not None
+
+def scan_exports(conn, path, id_tables, key_tables, batch_size):
+    """
+    第二遍扫描（只在需要时）：把 id_tables 导出的 Id 写入 temp.ExportedIds，引用列改写时按 SQL 查找；
+    统计 key_tables 中唯一键与目标库已有数据重复的行数。返回 {表: 重复行数}
+    """
+    conflicts = {table: 0 for table in key_tables}
+    if not id_tables and not key_tables:
+        return conflicts
+    batch = []
+    with open_text(path, "r") as f:
+        table, columns = None, None
+        for line in f:
+            if not line.startswith("["):
+                entry = json.loads(line)
+                table, columns = entry.get("table"), entry.get("columns")
+                continue
+            if table in id_tables:
+                batch.append((table, int(ROW_ID.match(line).group(1))))
+                if len(batch) >= batch_size:
+                    conn.executemany("INSERT INTO temp.ExportedIds (TableName, Id) VALUES (?, ?)", batch)
+                    batch = []
+            elif table in key_tables:
+                row = json.loads(line)
+                keys, _ = UNIQUE_KEYS[table]
+                conflicts[table] += key_exists(conn, table, keys, [row[columns.index(key)] for key in keys])
+    conn.executemany("INSERT INTO temp.ExportedIds (TableName, Id) VALUES (?, ?)", batch)
+    return conflicts
+
+def exported_ids(conn, table, values):
+    """一批候选值中属于 table 导出行的 Id"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), 500):
+        chunk = values[start:start + 500]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT Id FROM temp.ExportedIds WHERE TableName = ? AND Id IN ({', '.join('?' * len(chunk))})",
+            (table, *chunk)))
+    return found
+
+def row_mapper(conn, table, columns, references, offsets, guid, target_code, overrides=None):
+    """
+    生成就地改写一批行的函数：指定列赋值、Id 平移、引用导出行的列平移、TenantId 改写、Id 列表改写，
+    以及跨租户唯一键的处理（加后缀或跳过该行）；返回要写入的行
+    """
+    overrides = overrides or {}
+    steps = []
+    for index, column in enumerate(columns):
+        if column in overrides:
+            steps.append((index, "set", overrides[column]))
+        elif column == "Id" and offsets.get(table):
+            steps.append((index, "id", offsets[table]))
+        elif column == "TenantId":
+            steps.append((index, "tenant", guid))
+        elif column in references and offsets.get(references[column]):
+            steps.append((index, "ref", (references[column], offsets[references[column]])))
+        elif (table, column) in ID_LIST_COLUMNS and offsets.get(ID_LIST_COLUMNS[table, column][0]):
+            ref_table, kind = ID_LIST_COLUMNS[table, column]
+            steps.append((index, kind, (ref_table, offsets[ref_table])))
+    unique = UNIQUE_KEYS.get(table)
+
+    def candidates(kind, value):
+        """引用列中可能需要平移的 Id"""
+        if value is None:
+            return []
+        if kind == "ref":
+            return [value] if isinstance(value, int) else []
+        if kind == "csv":
+            return [int(part) for part in value.split(",") if part.isdigit()]
+        try:
+            ids = json.loads(value)
+        except ValueError:
+            return []
+        return [item for item in ids if isinstance(item, int)] if isinstance(ids, list) else []
+
+    def remap(rows):
+        wanted = {}
+        for index, kind, argument in steps:
+            if kind in ("ref", "csv", "json"):
+                bucket = wanted.setdefault(argument[0], set())
+                for row in rows:
+                    bucket.update(candidates(kind, row[index]))
+        exported = {ref_table: exported_ids(conn, ref_table, values) for ref_table, values in wanted.items()}
+
+        def shift(value, ref_table, delta):
+            return value + delta if isinstance(value, int) and value in exported[ref_table] else value
+
+        for row in rows:
+            for index, kind, argument in steps:
+                value = row[index]
+                if kind == "id":
+                    row[index] = value + argument
+                elif kind in ("set", "tenant"):
+                    row[index] = argument
+                elif value is None:
+                    continue
+                elif kind == "ref":
+                    row[index] = shift(value, *argument)
+                elif kind == "csv":
+                    row[index] = ",".join(str(shift(int(part), *argument)) if part.isdigit() else part
+                                          for part in value.split(","))
+                else:
+                    try:
+                        ids = json.loads(value)
+                    except ValueError:
+                        continue
+                    if isinstance(ids, list):
+                        row[index] = json.dumps([shift(item, *argument) for item in ids])
+        if unique is None:
+            return rows
+        keys, action = unique
+        indexes = [columns.index(key) for key in keys]
+        kept = []
+        for row in rows:
+            if key_exists(conn, table, keys, [row[index] for index in indexes]):
+                if action == "skip":
+                    continue
+                row[indexes[0]] = f"{row[indexes[0]]}-{target_code}"
+            kept.append(row)
+        return kept
+    return remap
+
+def import_tenant(conn, path, target_id=None, target_code=None, batch_size=5000, commit_rows=0, dry_run=False,
+                  share_files=False, progress=True):
+    """
+    导入租户文件；返回 (目标租户 Id, {表: (行数, Id 偏移)})，跳过的表行数为 0
+    源租户仍在目标库中（同库克隆）时默认不导入附件与分片，share_files 为真时导入并与源租户共享存储文件
+    """
+    header, sections = read_manifest(path)
+    references = {table: refs for table, _, refs in TENANT_TABLES}
+    references["Tenants"] = {}
+    target_id = header["tenantId"] if target_id is None else target_id
+    guid = tenant_guid(target_id)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        target_code = target_code or header["tenantCode"]
+        if conn.execute("SELECT 1 FROM Tenants WHERE Id = ? OR Code = ?", (target_id, target_code)).fetchone():
+            raise ValueError(f"目标库已存在租户 Id={target_id} 或 Code={target_code}，可用 --tenant-id/--code 指定新的租户")
+        skipped = set()
+        if not share_files and conn.execute("SELECT 1 FROM Tenants WHERE Id = ?", (header["tenantId"],)).fetchone():
+            skipped = {table for table in FILE_TABLES if sections.get(table, {}).get("rows")}
+        offsets = plan_offsets(conn, sections)
+        id_tables = set() if dry_run else {table for table in REFERENCED_TABLES
+                                           if offsets.get(table) and table not in skipped}
+        key_tables = {table for table in UNIQUE_KEYS if sections.get(table, {}).get("rows") and table not in skipped}
+        conn.execute(EXPORTED_IDS_DDL)
+        conflicts = scan_exports(conn, path, id_tables, key_tables, batch_size)
+        summary = {table: (0, 0) if table in skipped else (section["rows"], offsets[table])
+                   for table, section in sections.items()}
+        for table, count in conflicts.items():
+            if UNIQUE_KEYS[table][1] == "skip":
+                summary[table] = (summary[table][0] - count, summary[table][1])
+        if progress:
+            for table in sorted(skipped):
+                print(f"   ! {table}: 源租户在同一库中，克隆的附件会与源租户共用存储文件（删除时互相影响），"
+                      f"已跳过 {sections[table]['rows']:,} 行；确需共享可加 --share-files")
+            for table, count in conflicts.items():
+                if count and UNIQUE_KEYS[table][1] == "skip":
+                    print(f"   ! {table}: {count:,} 行的 {'/'.join(UNIQUE_KEYS[table][0])} 已在目标库中，跳过这些行")
+                elif count:
+                    print(f"   ! {table}: {count:,} 行的 {UNIQUE_KEYS[table][0][0]} 已在目标库中，"
+                          f"改写为 <原值>-{target_code}")
+        if dry_run:
+            conn.execute("ROLLBACK")
+            return target_id, summary
+
+        pending = 0
+        with open_text(path, "r") as f:
+            table, insert, remap, batch, keep = None, None, None, [], None
+            for line in f:
+                if line.startswith("["):
+                    if table in skipped:
+                        continue
+                    batch.append(json.loads(line))
+                    if len(batch) < batch_size:
+                        continue
+                entry = None if line.startswith("[") else json.loads(line)
+                if batch:
+                    rows = remap(batch)
+                    conn.executemany(insert, rows if keep is None else [[row[index] for index in keep] for row in rows])
+                    pending += len(batch)
+                    batch = []
+                    if commit_rows and pending >= commit_rows:
+                        conn.execute("COMMIT")
+                        conn.execute("BEGIN IMMEDIATE")
+                        pending = 0
+                if entry is None:
+                    continue
+                if "table" in entry:
+                    table, columns = entry["table"], entry["columns"]
+                    target_columns = set(table_columns(conn, table))
+                    names = [column for column in columns if column in target_columns]
+                    keep = None if len(names) == len(columns) else [columns.index(name) for name in names]
+                    insert = (f"INSERT INTO {table} ({', '.join(names)}) "
+                              f"VALUES ({', '.join('?' * len(names))})")
+                    overrides = {"Id": target_id, "Code": target_code} if table == "Tenants" else None
+                    remap = row_mapper(conn, table, columns, references[table], offsets, guid, target_code, overrides)
+                elif "end" in entry and progress:
+                    rows, offset = summary[entry["end"]]
+                    print(f"   ✓ {entry['end']:<24} {rows:>12,} 行" + (f"  Id 偏移 {offset:+,}" if offset else ""))
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.ExportedIds")
+    return target_id, summary
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="租户数据导出/导入")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="导出租户")
+    export.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    export.add_argument("--tenant", required=True, help="租户 Id 或 Code")
+    export.add_argument("--output", help="输出文件，扩展名 .gz/.xz 决定压缩格式（默认 tenant_<Id>.jsonl.gz）")
+    export.add_argument("--batch-size", type=int, default=5000, help="分页读取的每批行数")
+    load = sub.add_parser("import", help="导入租户")
+    load.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    load.add_argument("--input", required=True, help="导出文件")
+    load.add_argument("--tenant-id", type=int, help="目标租户 Id（克隆时指定新 Id）")
+    load.add_argument("--code", help="目标租户 Code（克隆时指定新 Code）")
+    load.add_argument("--batch-size", type=int, default=5000, help="每次 executemany 的行数")
+    load.add_argument("--commit-rows", type=int, default=0,
+                      help="每写入多少行提交一次，0 表示整个导入一个事务（失败时全部回滚）")
+    load.add_argument("--dry-run", action="store_true", help="只检查文件并输出 Id 偏移，不写入")
+    load.add_argument("--share-files", action="store_true",
+                      help="同库克隆时也导入附件与分片，新旧租户共用存储文件（删除任一方的附件会删除另一方的文件）")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("租户数据迁移脚本")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    conn = get_connection(args.db)
+    try:
+        started = time.perf_counter()
+        if args.command == "export":
+            output = args.output or f"tenant_{args.tenant}.jsonl.gz"
+            print(f"\n导出租户 {args.tenant} -> {output}")
+            tenant_id, counts = export_tenant(conn, args.tenant, output, args.batch_size)
+            total = sum(counts.values()) + 1
+        else:
+            if not os.path.exists(args.input):
+                print(f"错误: 导出文件不存在: {args.input}")
+                return 1
+            print(f"\n导入 {args.input}" + (" (dry-run)" if args.dry_run else ""))
+            tenant_id, summary = import_tenant(conn, args.input, args.tenant_id, args.code, args.batch_size,
+                                               args.commit_rows, args.dry_run, args.share_files)
+            total = sum(rows for rows, _ in summary.values())
+            if args.dry_run:
+                for table, (rows, offset) in summary.items():
+                    print(f"   {table:<24} {rows:>12,} 行" + (f"  Id 偏移 {offset:+,}" if offset else ""))
+        elapsed = time.perf_counter() - started
+        print(f"\n✓ 租户 {tenant_id}: {total:,} 行, 用时 {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} 行/秒)")
+        if args.command == "import" and not args.dry_run:
+            print("   如已启用部门闭包表或角色菜单快照，请执行 department_closure.py refresh / role_menu_snapshots.py refresh")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
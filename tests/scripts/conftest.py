@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+维护脚本测试公共夹具
+按 EF Core 模型快照 (WorkFlowDbContextModelSnapshot.cs) 建出与 API 一致的 SQLite 表结构：
+必填列（IsRequired 或不可空值类型）为 NOT NULL，HasKey 为主键，HasIndex 为（唯一）索引；
+TPH 派生类型（HasBaseType）的列按 EF 规则可空。迁移中 AddColumn 追加的必填列带 defaultValue，
+快照里没有，另从迁移文件补上，与按迁移升级的库一致。
+"""
+import glob
+import os
+import re
+import shutil
+import sqlite3
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+MIGRATIONS_DIR = os.path.join(REPO_ROOT, "src", "WorkFlowCore.Infrastructure", "Migrations")
+SNAPSHOT_PATH = os.path.join(MIGRATIONS_DIR, "WorkFlowDbContextModelSnapshot.cs")
+
+sys.path.insert(0, REPO_ROOT)
+
+NULLABLE_REFERENCE_TYPES = ("string", "byte[]")
+
+def sql_default(value):
+    """C# 默认值字面量转 SQL"""
+    value = re.sub(r'^\(\w+\)', "", value.strip())
+    return {"false": "0", "true": "1"}.get(value, value.replace('"', "'"))
+
+def added_column_defaults(migrations_dir=MIGRATIONS_DIR):
+    """迁移文件中 AddColumn 的默认值，返回 {(表, 列): SQL 默认值}"""
+    defaults = {}
+    for path in glob.glob(os.path.join(migrations_dir, "*.cs")):
+        if path.endswith(".Designer.cs"):
+            continue
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        for call in re.finditer(r'AddColumn<[^>]+>\((.*?)\);', source, re.S):
+            name = re.search(r'name: "(\w+)"', call.group(1))
+            table = re.search(r'table: "(\w+)"', call.group(1))
+            default = re.search(r'defaultValue: (.*?)(,|$)', call.group(1).strip(), re.S)
+            if name and table and default:
+                defaults[(table.group(1), name.group(1))] = sql_default(default.group(1))
+    return defaults
+
+def parse_snapshot(path=SNAPSHOT_PATH):
+    """解析模型快照，返回 {表: {"columns": {列: (类型, 必填, 默认值)}, "key": [...], "indexes": [(列, 唯一)]}}"""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tables = {}
+    for block in re.split(r'modelBuilder\.Entity\("', source)[1:]:
+        match = re.search(r'b\.ToTable\("(\w+)"', block)
+        if not match or "b.Property" not in block:
+            continue
+        table = tables.setdefault(match.group(1), {"columns": {}, "key": None, "indexes": []})
+        derived = "b.HasBaseType(" in block
+        for prop in re.finditer(r'b\.Property<([^>]+)>\("(\w+)"\)(.*?);', block, re.S):
+            clr_type, name, rest = prop.groups()
+            column_type = re.search(r'HasColumnType\("(\w+)"', rest)
+            column_name = re.search(r'HasColumnName\("(\w+)"', rest)
+            required = ".IsRequired()" in rest or (not clr_type.endswith("?")
+                                                   and clr_type not in NULLABLE_REFERENCE_TYPES)
+            default = re.search(r'HasDefaultValue\((.*?)\)\s*(\.|$)', rest, re.S)
+            default = sql_default(default.group(1)) if default else None
+            table["columns"][column_name.group(1) if column_name else name] = (
+                column_type.group(1) if column_type else "TEXT", required and not derived, default)
+        key = re.search(r'b\.HasKey\(([^)]*)\)', block)
+        if key:
+            table["key"] = re.findall(r'"(\w+)"', key.group(1))
+        for index in re.finditer(r'b\.HasIndex\(([^)]*)\)(\s*\.IsUnique\(\))?', block):
+            table["indexes"].append((re.findall(r'"(\w+)"', index.group(1)), bool(index.group(2))))
+    return tables
+
+def build_schema(db_path):
+    """在 db_path 建出快照中的全部表与索引"""
+    conn = sqlite3.connect(db_path)
+    added = added_column_defaults()
+    for table, spec in parse_snapshot().items():
+        definitions = []
+        for name, (column_type, required, default) in spec["columns"].items():
+            default = added.get((table, name), default)
+            definitions.append(f'"{name}" {column_type}' + (" NOT NULL" if required else "")
+                               + (f" DEFAULT {default}" if default is not None else ""))
+        if spec["key"]:
+            definitions.append(f'CONSTRAINT "PK_{table}" PRIMARY KEY ({", ".join(spec["key"])})')
+        conn.execute(f'CREATE TABLE "{table}" ({", ".join(definitions)})')
+        for columns, unique in spec["indexes"]:
+            conn.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX "IX_{table}_{"_".join(columns)}" '
+                         f'ON "{table}" ({", ".join(columns)})')
+    conn.commit()
+    conn.close()
+
+@pytest.fixture(scope="session")
+def schema_template(tmp_path_factory):
+    """整个测试会话只解析一次快照，各用例复制模板库"""
+    path = str(tmp_path_factory.mktemp("schema") / "template.db")
+    build_schema(path)
+    return path
+
+@pytest.fixture
+def empty_db(schema_template, tmp_path):
+    """只有表结构的空库"""
+    path = str(tmp_path / "workflow.db")
+    shutil.copyfile(schema_template, path)
+    return path
+
+@pytest.fixture
+def seeded_db(empty_db):
+    """执行 init_database.py 初始化基础数据后的库"""
+    import init_database
+    init_database.main(["--db", empty_db])
+    return empty_db
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""archive_instances.py：归档往返与删除范围"""
+import json
+import os
+import sqlite3
+
+import pytest
+
+import archive_instances
+import generate_load_data
+
+CUTOFF = "2025-03-01"
+
+def load_rows(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def generate(db_path):
+    generate_load_data.main(["--db", db_path, "--tenants", "2", "--users", "40", "--instances", "400",
+                             "--days", "120", "--base-time", "2025-05-01T00:00:00", "--chunk-size", "100"])
+
+def test_archive_round_trip(empty_db, tmp_path):
+    generate(empty_db)
+    instances_before = {row[0]: row for row in load_rows(empty_db, "SELECT * FROM ProcessInstances")}
+    tasks_before = {row[0]: row for row in load_rows(empty_db, "SELECT * FROM TaskInstances")}
+    task_parents = dict(load_rows(empty_db, "SELECT Id, ProcessInstanceId FROM TaskInstances"))
+    expected = {row[0] for row in load_rows(empty_db, """
+        SELECT Id FROM ProcessInstances
+        WHERE Status IN ('Completed', 'Terminated') AND EndTime IS NOT NULL AND EndTime < ?
+    """, (CUTOFF + " 00:00:00",))}
+    assert expected
+
+    archive_file = str(tmp_path / "instances.wfa")
+    assert archive_instances.main(["archive", "--db", empty_db, "--before", CUTOFF, "--archive-file", archive_file,
+                                   "--chunk-size", "37", "--pause", "0", "--create-index"]) == 0
+
+    remaining = {row[0] for row in load_rows(empty_db, "SELECT Id FROM ProcessInstances")}
+    assert remaining == set(instances_before) - expected
+    assert not load_rows(empty_db, """
+        SELECT Id FROM TaskInstances WHERE ProcessInstanceId NOT IN (SELECT Id FROM ProcessInstances)
+    """)
+
+    reader = archive_instances.ArchiveReader(archive_file)
+    archived = list(reader.scan("ProcessInstances"))
+    assert {row["Id"] for row in archived} == expected
+    for row in archived:
+        assert tuple(row.values()) == instances_before[row["Id"]]
+    archived_tasks = list(reader.scan("TaskInstances"))
+    assert {row["Id"] for row in archived_tasks} == {
+        task_id for task_id, parent in task_parents.items() if parent in expected}
+    for row in archived_tasks:
+        assert tuple(row.values())[:-1] == tasks_before[row["Id"]]
+
+    february = list(reader.scan("ProcessInstances", "2025-02-01", "2025-03-01", ["Id", "EndTime"]))
+    assert february and all("2025-02-01" <= row["EndTime"] < "2025-03-01" for row in february)
+
+def test_concurrent_task_insert_is_never_deleted_unarchived(empty_db, tmp_path):
+    generate(empty_db)
+    instance_id = load_rows(empty_db, """
+        SELECT Id FROM ProcessInstances WHERE Status = 'Completed' AND EndTime < ? ORDER BY Id LIMIT 1
+    """, (CUTOFF,))[0][0]
+    template = load_rows(empty_db, "SELECT * FROM TaskInstances WHERE ProcessInstanceId = ? LIMIT 1",
+                         (instance_id,))[0]
+    late_task_id = template[0] + 10 ** 12
+    other = sqlite3.connect(empty_db, timeout=0)
+    inserted = []
+
+    class RacingWriter(archive_instances.ArchiveWriter):
+        """写第一个段时另一个连接给该块的实例补一个任务"""
+
+        def write_segment(self, table, columns, rows, key, level=6):
+            if not inserted:
+                try:
+                    with other:
+                        other.execute(f"INSERT INTO TaskInstances VALUES ({', '.join('?' * len(template))})",
+                                      (late_task_id,) + template[1:])
+                    inserted.append(True)
+                except sqlite3.OperationalError:
+                    inserted.append(False)
+            super().write_segment(table, columns, rows, key, level)
+
+    conn = archive_instances.get_connection(empty_db)
+    writer = RacingWriter(str(tmp_path / "race.wfa"))
+    try:
+        archive_instances.archive_instances(conn, writer, CUTOFF, 50, 0)
+    finally:
+        writer.close()
+        conn.close()
+        other.close()
+
+    reader = archive_instances.ArchiveReader(str(tmp_path / "race.wfa"))
+    archived = {row["Id"] for row in reader.scan("TaskInstances")}
+    still_present = {row[0] for row in load_rows(empty_db, "SELECT Id FROM TaskInstances")}
+    # 写归档期间块已被写锁保护，插入只能失败
+    assert inserted == [False]
+    assert late_task_id not in archived | still_present
+    assert template[0] in archived
+
+def test_failed_chunk_is_removed_from_archive(empty_db, tmp_path):
+    generate(empty_db)
+    archive_file = str(tmp_path / "instances.wfa")
+    syncs = []
+
+    class FailingWriter(archive_instances.ArchiveWriter):
+        """第二块写完段之后落盘失败（如磁盘已满），该块应回滚且段被截掉"""
+
+        def sync(self):
+            super().sync()
+            syncs.append(True)
+            if len(syncs) == 2:
+                raise OSError("磁盘已满")
+
+    conn = archive_instances.get_connection(empty_db)
+    writer = FailingWriter(archive_file)
+    try:
+        with pytest.raises(OSError):
+            archive_instances.archive_instances(conn, writer, CUTOFF, 50, 0)
+    finally:
+        writer.close()
+        conn.close()
+    remaining = {row[0] for row in load_rows(empty_db, "SELECT Id FROM ProcessInstances")}
+    archived = [row["Id"] for row in archive_instances.ArchiveReader(archive_file).scan("ProcessInstances")]
+    assert len(archived) == 50 and not set(archived) & remaining
+
+    assert archive_instances.main(["archive", "--db", empty_db, "--before", CUTOFF, "--archive-file", archive_file,
+                                   "--chunk-size", "50", "--pause", "0", "--create-index"]) == 0
+    archived = [row["Id"] for row in archive_instances.ArchiveReader(archive_file).scan("ProcessInstances")]
+    assert len(archived) == len(set(archived))
+
+def test_partial_trailing_segment_is_truncated(empty_db, tmp_path):
+    generate(empty_db)
+    archive_file = str(tmp_path / "instances.wfa")
+    assert archive_instances.main(["archive", "--db", empty_db, "--before", "2025-02-01",
+                                   "--archive-file", archive_file, "--pause", "0", "--create-index"]) == 0
+    size = os.path.getsize(archive_file)
+    expected = [row["Id"] for row in archive_instances.ArchiveReader(archive_file).scan("ProcessInstances")]
+    # 写段中途崩溃：只写了头和部分列数据
+    header = json.dumps({"table": "ProcessInstances", "rows": 1, "key": "EndTime", "min": "x", "max": "x",
+                         "columns": [{"name": "Id", "length": 100}]}).encode("utf-8")
+    partial = archive_instances.HEADER_LENGTH.pack(len(header)) + header + b"partial"
+    with open(archive_file, "ab") as f:
+        f.write(partial)
+
+    writer = archive_instances.ArchiveWriter(archive_file)
+    writer.close()
+    assert writer.recovered_bytes == len(partial)
+    assert os.path.getsize(archive_file) == size
+    assert [row["Id"] for row in archive_instances.ArchiveReader(archive_file).scan("ProcessInstances")] == expected
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""audit_query_plans.py：扫描判定与试建索引"""
+import json
+import sqlite3
+
+import audit_query_plans
+
+def test_index_order_scan_is_flagged():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE OperationLogs (Id INTEGER PRIMARY KEY, Title TEXT, CreationTime TEXT)")
+    conn.execute("CREATE INDEX IX_OperationLogs_CreationTime ON OperationLogs (CreationTime)")
+    # ORDER BY 由索引提供，但 WHERE 没有可用前缀：逐行读取整个索引
+    details = audit_query_plans.explain(
+        conn, "SELECT Id FROM OperationLogs WHERE Title = ? ORDER BY CreationTime DESC LIMIT 20", ("x",))
+    assert any(" USING INDEX " in detail for detail in details)
+    assert audit_query_plans.classify_plan(details)[0] == ["OperationLogs"]
+    assert audit_query_plans.classify_plan(details, ["OperationLogs"])[2] == ["OperationLogs"]
+
+    details = audit_query_plans.explain(
+        conn, "SELECT Id FROM OperationLogs WHERE CreationTime >= ? ORDER BY CreationTime DESC LIMIT 20", ("x",))
+    assert details[0].startswith("SEARCH ")
+    assert audit_query_plans.classify_plan(details) == ([], [], [])
+
+def test_suggestions_are_only_built_with_verify(empty_db, capsys):
+    assert audit_query_plans.main(["--db", empty_db, "--queries", "task_inbox", "--json"]) == 1
+    assert "suggested_plan" not in json.loads(capsys.readouterr().out)["task_inbox"]
+
+    assert audit_query_plans.main(["--db", empty_db, "--queries", "task_inbox", "--json", "--verify"]) == 1
+    result = json.loads(capsys.readouterr().out)["task_inbox"]
+    assert result["suggestion_fixes"]
+    conn = sqlite3.connect(empty_db)
+    try:
+        assert not conn.execute("SELECT 1 FROM sqlite_schema WHERE name LIKE 'IX_TaskInstances_AssigneeId%'").fetchone()
+    finally:
+        conn.close()
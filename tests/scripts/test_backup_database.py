@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""backup_database.py：源库被锁住时的等待不计入持锁时间"""
+import sqlite3
+import threading
+import time
+
+import backup_database
+
+def test_busy_steps_are_not_counted_as_lock_time(seeded_db, tmp_path):
+    writer = sqlite3.connect(seeded_db, isolation_level=None, check_same_thread=False)
+    writer.execute("BEGIN EXCLUSIVE")
+    release = threading.Timer(0.3, lambda: writer.execute("ROLLBACK"))
+    release.start()
+    started = time.perf_counter()
+    try:
+        stats = backup_database.run_backup(seeded_db, str(tmp_path / "snapshot.db"), pages=5, sleep=0.05,
+                                           busy_timeout=0, max_restarts=3)
+    finally:
+        release.join()
+        writer.close()
+    assert time.perf_counter() - started >= 0.3
+    assert stats.busy_steps > 0
+    assert stats.steps > stats.busy_steps
+    assert stats.lock_seconds < 0.2
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""benchmark_workflow.py：副本包含 WAL 中尚未检查点的提交"""
+import sqlite3
+
+import benchmark_workflow
+
+def test_copy_includes_uncheckpointed_wal(empty_db, tmp_path):
+    live = sqlite3.connect(empty_db, isolation_level=None)
+    try:
+        live.execute("PRAGMA journal_mode = WAL").fetchone()
+        live.execute("PRAGMA wal_autocheckpoint = 0")
+        live.execute("CREATE TABLE Probe (Id INTEGER PRIMARY KEY)")
+        live.execute("INSERT INTO Probe VALUES (1)")
+        copy = str(tmp_path / "copy.db")
+        benchmark_workflow.copy_database(empty_db, copy)
+    finally:
+        live.close()
+    conn = sqlite3.connect(copy)
+    try:
+        assert conn.execute("SELECT Id FROM Probe").fetchall() == [(1,)]
+    finally:
+        conn.close()
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""database_stats.py：碎片率只看叶子页，VACUUM 之后为 0"""
+import sqlite3
+
+import database_stats
+import generate_load_data
+
+def collect(db_path):
+    conn = database_stats.get_connection(db_path)
+    try:
+        return database_stats.collect_objects(conn, database_stats.load_schema(conn))
+    finally:
+        conn.close()
+
+def test_fragmentation_is_zero_after_vacuum(empty_db):
+    generate_load_data.main(["--db", empty_db, "--tenants", "3", "--users", "300", "--instances", "3000",
+                             "--chunk-size", "500"])
+    conn = sqlite3.connect(empty_db, isolation_level=None)
+    conn.execute("DELETE FROM TaskInstances WHERE Id % 3 = 0")
+    conn.execute("UPDATE TaskInstances SET Comment = hex(randomblob(300)) WHERE Id % 5 = 0")
+    fragmented = collect(empty_db)
+    assert fragmented["TaskInstances"]["fragmentation"] > 0
+    conn.execute("VACUUM")
+    conn.close()
+
+    objects = collect(empty_db)
+    assert objects["sqlite_schema"]["fragmentation"] is None
+    assert {name: item["fragmentation"] for name, item in objects.items()
+            if name != "sqlite_schema" and item["fragmentation"]} == {}
+    assert objects["TaskInstances"]["rows"] == fragmented["TaskInstances"]["rows"]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""init_database.py：对账模式与 dry-run"""
+import sqlite3
+
+import init_database
+
+NEW_MENU = (4000000000000000011, "岗位管理", "C", 4000000000000000000, "/system/posts", "system/post/index",
+            "system:post:list", "post", 5, 1, 0, "0", None)
+
+def load_rows(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def table_snapshot(db_path):
+    """所有用户表的全部行，用于确认没有写入"""
+    tables = [row[0] for row in load_rows(db_path, "SELECT name FROM sqlite_schema WHERE type = 'table'")]
+    return {table: sorted(load_rows(db_path, f'SELECT * FROM "{table}"'), key=repr) for table in tables}
+
+def test_reconcile_is_idempotent(seeded_db, capsys):
+    before = table_snapshot(seeded_db)
+    init_database.main(["--db", seeded_db, "--reconcile"])
+    assert "错误" not in capsys.readouterr().out
+    assert table_snapshot(seeded_db) == before
+
+def test_menu_inserted_mid_list_reconciles_role_menus(seeded_db, monkeypatch, capsys):
+    position = 5
+    monkeypatch.setattr(init_database, "MENU_SEEDS",
+                        init_database.MENU_SEEDS[:position] + [NEW_MENU] + init_database.MENU_SEEDS[position:])
+    role_menus_before = load_rows(seeded_db, "SELECT Id, RoleId, MenuId FROM RoleMenus")
+    capsys.readouterr()
+
+    init_database.main(["--db", seeded_db, "--dry-run"])
+    output = capsys.readouterr().out
+    assert "RoleMenus: 新增 1 行, 更新 0 行" in output
+    assert "Menus: 新增 1 行, 更新 0 行" in output
+
+    init_database.main(["--db", seeded_db, "--reconcile"])
+    assert "错误" not in capsys.readouterr().out
+    role_menus = load_rows(seeded_db, "SELECT Id, RoleId, MenuId FROM RoleMenus")
+    assert set(role_menus_before) < set(role_menus)
+    assert {row[2] for row in role_menus} == {menu[0] for menu in init_database.MENU_SEEDS}
+
+    init_database.main(["--db", seeded_db, "--dry-run"])
+    assert "(dry-run: 共 0 行差异，未写入)" in capsys.readouterr().out
+
+def test_role_menus_reconcile_keeps_existing_ids(seeded_db, capsys):
+    # 旧版本按列表位置分配的 Id：与由 MenuId 推出的 Id 不同，但 (RoleId, MenuId) 已存在
+    conn = sqlite3.connect(seeded_db)
+    with conn:
+        conn.execute("UPDATE RoleMenus SET Id = Id + 100")
+    conn.close()
+    before = load_rows(seeded_db, "SELECT Id, RoleId, MenuId FROM RoleMenus ORDER BY Id")
+    capsys.readouterr()
+
+    init_database.main(["--db", seeded_db, "--reconcile"])
+    output = capsys.readouterr().out
+    assert "✓ RoleMenus: 一致" in output and "错误" not in output
+    assert load_rows(seeded_db, "SELECT Id, RoleId, MenuId FROM RoleMenus ORDER BY Id") == before
+
+def test_reconcile_updates_changed_seed_and_keeps_creation_time(seeded_db, monkeypatch, capsys):
+    config = init_database.SYSTEM_CONFIG_SEEDS[2]
+    created = load_rows(seeded_db, "SELECT CreationTime FROM SystemConfigs WHERE Id = ?", (config[0],))[0][0]
+    monkeypatch.setattr(init_database, "SYSTEM_CONFIG_SEEDS",
+                        init_database.SYSTEM_CONFIG_SEEDS[:2] + [config[:2] + ("2.0.0",) + config[3:]])
+    capsys.readouterr()
+
+    init_database.main(["--db", seeded_db, "--reconcile"])
+    assert "ConfigValue: '1.0.0' -> '2.0.0'" in capsys.readouterr().out
+    assert load_rows(seeded_db, "SELECT ConfigValue, CreationTime FROM SystemConfigs WHERE Id = ?",
+                     (config[0],)) == [("2.0.0", created)]
+
+def test_dry_run_writes_nothing(empty_db, capsys):
+    before = table_snapshot(empty_db)
+    init_database.main(["--db", empty_db, "--dry-run"])
+    output = capsys.readouterr().out
+    assert table_snapshot(empty_db) == before
+    assert "已创建" not in output and "已初始化" not in output
+    assert "将创建用户: admin, test" in output
+    assert "RoleMenus: 新增 11 行" in output
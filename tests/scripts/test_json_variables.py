@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""json_variables.py：不同键路径映射到同一列名时拒绝"""
+import sqlite3
+
+import pytest
+
+import json_variables
+
+@pytest.mark.parametrize("storage", ["virtual", "stored"])
+def test_column_name_collision_is_rejected(empty_db, storage):
+    conn = json_variables.get_connection(empty_db)
+    try:
+        with pytest.raises(ValueError):
+            json_variables.apply_columns(conn, "ProcessInstances", ["$.form.amount", "$.form_amount"], storage,
+                                         progress=False)
+        assert not json_variables.existing_columns(conn, "ProcessInstances")
+
+        assert json_variables.apply_columns(conn, "ProcessInstances", ["$.form.amount"], storage,
+                                            progress=False) == ["$.form.amount"]
+        assert json_variables.column_sources(conn, "ProcessInstances") == {"Var_form_amount": "$.form.amount"}
+        assert json_variables.apply_columns(conn, "ProcessInstances", ["$.form.amount"], storage,
+                                            progress=False) == []
+        with pytest.raises(ValueError):
+            json_variables.apply_columns(conn, "ProcessInstances", ["$.form_amount"], storage, progress=False)
+        with pytest.raises(ValueError):
+            json_variables.drop_columns(conn, "ProcessInstances", ["$.form_amount"])
+        assert json_variables.drop_columns(conn, "ProcessInstances", ["$.form.amount"]) == ["Var_form_amount"]
+    finally:
+        conn.close()
+
+def test_cli_reports_collision(empty_db, capsys):
+    assert json_variables.main(["apply", "--db", empty_db, "--table", "TaskInstances",
+                                "--key", "form.amount", "--key", "form_amount"]) == 1
+    assert "Var_form_amount" in capsys.readouterr().out
+    conn = sqlite3.connect(empty_db)
+    try:
+        assert not [row for row in conn.execute("PRAGMA table_xinfo(TaskInstances)") if row[1].startswith("Var_")]
+    finally:
+        conn.close()
+
+VARIABLES = [
+    '{"form": {"amount": 120.5}, "days": 3}',
+    '{"form": {"amount": 9}, "urgent": true}',
+    '{"days": "7"}',
+    'not json',
+    None,
+    '[1, 2]',
+]
+
+def insert_instance(conn, instance_id, variables):
+    conn.execute("""
+        INSERT INTO ProcessInstances (Id, ProcessDefinitionId, Title, InitiatorId, Status, Variables, StartTime,
+                                      CreationTime, ExtraProperties, ConcurrencyStamp)
+        VALUES (?, 1, 't', 1, 'Running', ?, '2025-01-01 00:00:00', '2025-01-01 00:00:00', '{}', 's')
+    """, (instance_id, variables))
+
+def column_matches_extract(conn, path):
+    """列值与逐行 json_extract 的结果（无效 JSON 为 NULL）是否一致"""
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM ProcessInstances
+        WHERE "{json_variables.column_name(path)}" IS NOT
+              (CASE WHEN json_valid(Variables) THEN json_extract(Variables, ?) END)
+    """, (path,)).fetchone()[0] == 0
+
+@pytest.mark.parametrize("storage", ["virtual", "stored"])
+def test_columns_follow_variables(empty_db, storage):
+    paths = ["$.form.amount", "$.days"]
+    conn = json_variables.get_connection(empty_db)
+    try:
+        for index, variables in enumerate(VARIABLES, 1):
+            insert_instance(conn, index, variables)
+        assert json_variables.apply_columns(conn, "ProcessInstances", paths, storage, batch_size=2,
+                                            progress=False) == paths
+        assert all(column_matches_extract(conn, path) for path in paths)
+
+        # 触发器（stored）或生成列（virtual）在写入时更新列值，无效 JSON 不影响写入
+        insert_instance(conn, 100, '{"form": {"amount": 42}}')
+        insert_instance(conn, 101, '{"form": ')
+        conn.execute("UPDATE ProcessInstances SET Variables = ? WHERE Id = 1", ('{"days": 10}',))
+        conn.execute("UPDATE ProcessInstances SET Variables = 'broken' WHERE Id = 2")
+        conn.execute("UPDATE ProcessInstances SET Variables = ? WHERE Id = 4", ('{"form": {"amount": 5}}',))
+        assert all(column_matches_extract(conn, path) for path in paths)
+        assert conn.execute("""
+            SELECT Id, Var_form_amount, Var_days FROM ProcessInstances WHERE Id IN (1, 2, 4, 100, 101) ORDER BY Id
+        """).fetchall() == [(1, None, 10), (2, None, None), (4, 5, None), (100, 42, None), (101, None, None)]
+    finally:
+        conn.close()
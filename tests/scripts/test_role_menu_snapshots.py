@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""role_menu_snapshots.py：check/show 只读，refresh 建表"""
+import sqlite3
+
+import role_menu_snapshots
+
+def snapshot_table(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT name FROM sqlite_schema WHERE name = 'RoleMenuSnapshots'").fetchall()
+    finally:
+        conn.close()
+
+def test_check_does_not_create_the_table(seeded_db):
+    assert role_menu_snapshots.main(["check", "--db", seeded_db]) == 1
+    assert role_menu_snapshots.main(["show", "--db", seeded_db, "--role", "Admin"]) == 1
+    assert snapshot_table(seeded_db) == []
+
+    assert role_menu_snapshots.main(["refresh", "--db", seeded_db]) == 0
+    assert snapshot_table(seeded_db) == [("RoleMenuSnapshots",)]
+    assert role_menu_snapshots.main(["check", "--db", seeded_db]) == 0
+    assert role_menu_snapshots.main(["show", "--db", seeded_db, "--role", "Admin"]) == 0
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""scan_file_storage.py：清理动作复查扫描时的状态，重复文件只报告"""
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+import scan_file_storage
+
+OLD = "2020-01-01 00:00:00"
+STALE_ID, COMPLETED_ID, DUPLICATE_ID = 1, 2, 3
+
+def write_file(root, relative, content):
+    path = scan_file_storage.storage_path(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+def insert_attachment(conn, attachment_id, path, status, content=b"", total_chunks=1):
+    conn.execute("""
+        INSERT INTO FileAttachments (Id, BusinessId, BusinessType, ConcurrencyStamp, ContentType, CreationTime,
+                                     ExtraProperties, FileExtension, FileName, FileSize, Md5Hash, OriginalFileName,
+                                     StoragePath, StorageProviderId, TotalChunks, UploadStatus, UploadedChunks)
+        VALUES (?, '', 'Test', 'stamp', 'application/octet-stream', ?, '{}', '.bin', ?, ?, ?, ?, ?, 1, ?, ?, ?)
+    """, (attachment_id, OLD, path, len(content), hashlib.md5(content).hexdigest() if content else "",
+          f"file{attachment_id}.bin", path, total_chunks, status, total_chunks if status else 0))
+
+def insert_chunk(conn, chunk_id, attachment_id, index, path, content, status=scan_file_storage.CHUNK_COMPLETED):
+    conn.execute("""
+        INSERT INTO FileChunks (Id, AttachmentId, ChunkHash, ChunkIndex, ChunkSize, ConcurrencyStamp, CreationTime,
+                                ExtraProperties, StoragePath, UploadStatus)
+        VALUES (?, ?, ?, ?, ?, 'stamp', ?, '{}', ?, ?)
+    """, (chunk_id, attachment_id, hashlib.md5(content).hexdigest(), index, len(content), OLD, path, status))
+
+@pytest.fixture
+def storage(empty_db, tmp_path):
+    """一个过期上传（两个分片，其中一个文件缺失）、一个已完成附件及其内容相同的副本"""
+    root = str(tmp_path / "storage")
+    conn = sqlite3.connect(empty_db)
+    with conn:
+        insert_attachment(conn, STALE_ID, "uploads/a.bin", scan_file_storage.UPLOAD_UPLOADING, total_chunks=2)
+        insert_chunk(conn, 11, STALE_ID, 0, "uploads/a.bin.chunk0", b"first")
+        insert_chunk(conn, 12, STALE_ID, 1, "uploads/a.bin.chunk1", b"second")
+        insert_attachment(conn, COMPLETED_ID, "files/b.bin", scan_file_storage.UPLOAD_COMPLETED, b"same bytes")
+        insert_attachment(conn, DUPLICATE_ID, "files/c.bin", scan_file_storage.UPLOAD_COMPLETED, b"same bytes")
+    conn.close()
+    write_file(root, "uploads/a.bin.chunk0", b"first")
+    write_file(root, "files/b.bin", b"same bytes")
+    write_file(root, "files/c.bin", b"same bytes")
+    return empty_db, root
+
+def load_rows(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def test_scan_reports_and_cleans_up(storage, capsys):
+    db_path, root = storage
+    assert scan_file_storage.main(["--db", db_path, "--storage-root", root, "--mark-failed", "--cancel-stale",
+                                   "--pause", "0"]) == 0
+    output = capsys.readouterr().out
+    assert "已标记 1 个分片为失败" in output
+    assert "已取消 1 个过期上传" in output
+    assert "重复文件组" in output
+    assert load_rows(db_path, "SELECT UploadStatus FROM FileChunks ORDER BY Id") == [
+        (scan_file_storage.CHUNK_COMPLETED,), (scan_file_storage.CHUNK_FAILED,)]
+    assert load_rows(db_path, "SELECT UploadStatus, UploadedChunks FROM FileAttachments WHERE Id = ?",
+                     (STALE_ID,)) == [(scan_file_storage.UPLOAD_CANCELLED, 1)]
+    assert not os.path.exists(scan_file_storage.storage_path(root, "uploads/a.bin.chunk0"))
+
+def test_duplicates_are_report_only(storage):
+    db_path, root = storage
+    with pytest.raises(SystemExit):
+        scan_file_storage.parse_args(["--storage-root", root, "--dedupe"])
+    assert scan_file_storage.main(["--db", db_path, "--storage-root", root]) == 0
+    assert load_rows(db_path, "SELECT Id, StoragePath FROM FileAttachments WHERE Id IN (?, ?) ORDER BY Id",
+                     (COMPLETED_ID, DUPLICATE_ID)) == [(COMPLETED_ID, "files/b.bin"), (DUPLICATE_ID, "files/c.bin")]
+    assert os.path.exists(scan_file_storage.storage_path(root, "files/c.bin"))
+
+def test_upload_completed_after_scan_is_not_cancelled(storage):
+    db_path, root = storage
+    conn = scan_file_storage.get_connection(db_path, 5.0)
+    try:
+        stale = scan_file_storage.find_stale_uploads(conn, "2030-01-01 00:00:00", scan_file_storage.ScanReport())
+        assert stale == [STALE_ID]
+        # 扫描之后 API 完成了这个上传
+        conn.execute("UPDATE FileAttachments SET UploadStatus = ? WHERE Id = ?",
+                     (scan_file_storage.UPLOAD_COMPLETED, STALE_ID))
+        assert scan_file_storage.cancel_stale_uploads(conn, root, stale, 100, 0) == (0, 0)
+    finally:
+        conn.close()
+    assert load_rows(db_path, "SELECT UploadStatus FROM FileAttachments WHERE Id = ?",
+                     (STALE_ID,)) == [(scan_file_storage.UPLOAD_COMPLETED,)]
+    assert os.path.exists(scan_file_storage.storage_path(root, "uploads/a.bin.chunk0"))
+
+def test_chunk_changed_after_scan_is_not_marked_failed(storage):
+    db_path, root = storage
+    conn = scan_file_storage.get_connection(db_path, 5.0)
+    pool = scan_file_storage.HashPool(1)
+    report = scan_file_storage.ScanReport()
+    try:
+        scan_file_storage.index_storage(conn, root, 100)
+        scan_file_storage.check_chunks(conn, root, pool, report)
+        assert report.failed_chunks == [12]
+        # 扫描之后附件已完成合并，分片状态不再由巡检修改
+        conn.execute("UPDATE FileAttachments SET UploadStatus = ? WHERE Id = ?",
+                     (scan_file_storage.UPLOAD_COMPLETED, STALE_ID))
+        assert scan_file_storage.mark_chunks_failed(conn, report.failed_chunks, 100, 0) == 0
+        conn.execute("UPDATE FileAttachments SET UploadStatus = ? WHERE Id = ?",
+                     (scan_file_storage.UPLOAD_UPLOADING, STALE_ID))
+        conn.execute("UPDATE FileChunks SET UploadStatus = ? WHERE Id = 12", (scan_file_storage.CHUNK_FAILED,))
+        assert scan_file_storage.mark_chunks_failed(conn, report.failed_chunks, 100, 0) == 0
+    finally:
+        pool.close()
+        conn.close()
+    assert load_rows(db_path, "SELECT UploadedChunks FROM FileAttachments WHERE Id = ?", (STALE_ID,)) == [(0,)]
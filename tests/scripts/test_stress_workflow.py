@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""stress_workflow.py：操作写入完整的必填列，统计口径与错误处理"""
+import random
+import sqlite3
+import time
+import uuid
+
+import pytest
+
+import generate_load_data
+import stress_workflow
+
+@pytest.fixture
+def loaded_db(seeded_db):
+    generate_load_data.main(["--db", seeded_db, "--tenants", "2", "--users", "40", "--instances", "200",
+                             "--chunk-size", "100"])
+    return seeded_db
+
+def make_operations(db_path, tx_style="immediate"):
+    conn = stress_workflow.get_connection(db_path, 1.0)
+    pools, id_bases = stress_workflow.load_pools(conn, 42)
+    return stress_workflow.Operations(conn, tx_style, random.Random(1), pools, id_bases)
+
+def test_every_operation_succeeds(loaded_db):
+    ops = make_operations(loaded_db)
+    try:
+        for name, _ in stress_workflow.DEFAULT_MIX:
+            for _ in range(20):
+                assert getattr(ops, name)() is not False
+        rows = ops.conn.execute("SELECT UserId, UserName, LoginLocation FROM LoginLogs").fetchall()
+        users = {user_name: abp_user_id for _, _, abp_user_id, user_name in ops.users}
+        assert len(rows) == 20
+        for user_id, user_name, location in rows:
+            assert user_id == users[user_name] and location == ""
+            assert user_id is None or uuid.UUID(user_id)
+    finally:
+        ops.conn.close()
+
+def test_empty_pool_is_not_an_attempt(loaded_db):
+    ops = make_operations(loaded_db)
+    ops.pending = []
+    try:
+        assert ops.claim_task() == stress_workflow.IDLE
+        assert ops.complete_task() == stress_workflow.IDLE
+    finally:
+        ops.conn.close()
+
+    stats = {"claim_task": {"ok": 2, "busy": 1, "conflict": 1, stress_workflow.IDLE: 5,
+                            "latencies": [1.0, 3.0], "busy_latencies": [900.0], "conflict_latencies": [500.0]}}
+    summary = stress_workflow.summarize([stats], 2.0)
+    assert summary["attempts"] == 4 and summary[stress_workflow.IDLE] == 5
+    assert summary["ops_per_sec"] == 1.0
+    assert summary["busy_rate"] == 0.25
+    assert summary["max_ms"] == 3.0 and summary["conflict_p50_ms"] == 500.0
+
+def test_non_busy_error_stops_the_run(loaded_db):
+    conn = sqlite3.connect(loaded_db)
+    pools, id_bases = stress_workflow.load_pools(conn, 42)
+    conn.execute("DROP TABLE OperationLogs")
+    conn.close()
+    config = {"journal_mode": "wal", "busy_timeout_ms": 100, "tx_style": "deferred"}
+    job = (loaded_db, 0, config, pools, id_bases, (("operation_log", 1),), time.time(), 0.2, 0, 42)
+    with pytest.raises(RuntimeError, match="operation_log"):
+        stress_workflow.run_worker(job)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""tenant_transfer.py：导出后克隆导入，只平移导出行的引用"""
+import json
+import sqlite3
+
+import generate_load_data
+import tenant_transfer
+
+SOURCE_ID, CLONE_ID = 1000, 1099
+NOW = "2024-01-01 00:00:00"
+
+def load_rows(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def tenant_table(db_path, table, tenant_id):
+    return {row[0]: row for row in load_rows(db_path, f"SELECT * FROM {table} WHERE TenantId = ? ORDER BY Id",
+                                             (generate_load_data.tenant_guid(tenant_id),))}
+
+def test_clone_round_trip_keeps_foreign_references(empty_db, tmp_path):
+    generate_load_data.main(["--db", empty_db, "--tenants", "2", "--users", "40", "--instances", "60",
+                             "--days", "30", "--chunk-size", "100"])
+    source_guid = generate_load_data.tenant_guid(SOURCE_ID)
+    other_guid = generate_load_data.tenant_guid(SOURCE_ID + 1)
+    departments = sorted(tenant_table(empty_db, "Departments", SOURCE_ID))
+    users = sorted(tenant_table(empty_db, "Users", SOURCE_ID))
+    # 导出区间中间的一个部门改为宿主数据、一个用户改属其他租户：引用它们的行不能随克隆平移
+    host_dept, foreign_user = departments[len(departments) // 2], users[len(users) // 2]
+    conn = sqlite3.connect(empty_db)
+    with conn:
+        conn.execute("UPDATE Departments SET TenantId = NULL WHERE Id = ?", (host_dept,))
+        conn.execute("UPDATE Users SET TenantId = ? WHERE Id = ?", (other_guid, foreign_user))
+        conn.execute("UPDATE Users SET DepartmentId = ?, ManagerId = ? WHERE Id = ?",
+                     (host_dept, foreign_user, users[-1]))
+        conn.execute("UPDATE TaskInstances SET AssigneeId = ?, CandidateUsers = ? WHERE Id = "
+                     "(SELECT MIN(Id) FROM TaskInstances WHERE TenantId = ?)",
+                     (foreign_user, json.dumps([foreign_user, users[0]]), source_guid))
+        # 唯一键跨租户的表、自引用的菜单、指向存储文件的附件
+        conn.execute("""INSERT INTO Posts (Id, TenantId, PostCode, PostName, PostSort, Status, ConcurrencyStamp,
+                            CreationTime, ExtraProperties) VALUES (1, ?, 'ceo', '总经理', 1, '0', '', ?, '{}')""",
+                     (source_guid, NOW))
+        for menu_id, parent_id in ((1, None), (2, 1)):
+            conn.execute("""INSERT INTO Menus (Id, TenantId, ParentId, MenuName, MenuType, OrderNum, IsCache, IsFrame,
+                                Visible, Status, ConcurrencyStamp, CreationTime, ExtraProperties)
+                            VALUES (?, ?, ?, 'menu', 'C', 1, '0', 0, 1, '0', '', ?, '{}')""",
+                         (menu_id, source_guid, parent_id, NOW))
+        conn.execute("""INSERT INTO UserThirdPartyAccounts (Id, TenantId, UserId, Provider, OpenId, CreatedTime)
+                        VALUES (1, ?, ?, 'wechat', 'open-1', ?)""", (source_guid, source_guid, NOW))
+        conn.execute("""INSERT INTO FileAttachments (Id, TenantId, FileName, OriginalFileName, FileExtension,
+                            ContentType, FileSize, Md5Hash, StoragePath, StorageProviderId, BusinessType, BusinessId,
+                            UploadStatus, TotalChunks, UploadedChunks, ConcurrencyStamp, CreationTime, ExtraProperties)
+                        VALUES (1, ?, 'a.txt', 'a.txt', '.txt', 'text/plain', 1, 'x', 'files/a.txt', 1, 'Notice', '1',
+                                2, 1, 1, '', ?, '{}')""", (source_guid, NOW))
+    conn.close()
+    before = {table: tenant_table(empty_db, table, SOURCE_ID)
+              for table in ("Departments", "Users", "ProcessInstances", "TaskInstances")}
+
+    export_file = str(tmp_path / "tenant.jsonl.gz")
+    assert tenant_transfer.main(["export", "--db", empty_db, "--tenant", str(SOURCE_ID), "--output", export_file]) == 0
+    assert tenant_transfer.main(["import", "--db", empty_db, "--input", export_file,
+                                 "--tenant-id", str(CLONE_ID), "--code", "clone"]) == 0
+
+    cloned = {table: tenant_table(empty_db, table, CLONE_ID) for table in before}
+    mapped = {}
+    for table, rows in before.items():
+        # 克隆与源租户 Id 冲突，整体平移
+        offset = min(cloned[table]) - min(rows)
+        assert offset > 0
+        mapped[table] = {old: old + offset for old in rows}
+        assert sorted(cloned[table]) == sorted(mapped[table].values())
+    assert tenant_table(empty_db, "Users", SOURCE_ID) == before["Users"]
+
+    (department_id, manager_id), = load_rows(empty_db, "SELECT DepartmentId, ManagerId FROM Users WHERE Id = ?",
+                                             (mapped["Users"][users[-1]],))
+    assert (department_id, manager_id) == (host_dept, foreign_user)
+    for (department_id,) in load_rows(empty_db, "SELECT DepartmentId FROM Users WHERE TenantId = ?",
+                                      (generate_load_data.tenant_guid(CLONE_ID),)):
+        assert department_id == host_dept or department_id in mapped["Departments"].values()
+
+    (assignee, candidates), = load_rows(empty_db, """
+        SELECT AssigneeId, CandidateUsers FROM TaskInstances WHERE Id = ?
+    """, (mapped["TaskInstances"][min(before["TaskInstances"])],))
+    assert assignee == foreign_user
+    assert json.loads(candidates) == [foreign_user, mapped["Users"][users[0]]]
+
+    for (ancestors,) in load_rows(empty_db, "SELECT Ancestors FROM Departments WHERE TenantId = ?",
+                                  (generate_load_data.tenant_guid(CLONE_ID),)):
+        for part in ancestors.split(",")[1:]:
+            assert int(part) == host_dept or int(part) in mapped["Departments"].values()
+
+    clone_guid = generate_load_data.tenant_guid(CLONE_ID)
+    assert load_rows(empty_db, "SELECT PostCode FROM Posts WHERE TenantId = ?", (clone_guid,)) == [("ceo-clone",)]
+    (parent,), = load_rows(empty_db, "SELECT ParentId FROM Menus WHERE TenantId = ? AND ParentId IS NOT NULL",
+                                 (clone_guid,))
+    assert load_rows(empty_db, "SELECT TenantId FROM Menus WHERE Id = ?", (parent,)) == [(clone_guid,)]
+    # 同库克隆：第三方账号重复、附件与源租户共用文件，均跳过
+    for table in ("UserThirdPartyAccounts", "FileAttachments"):
+        assert load_rows(empty_db, f"SELECT COUNT(*) FROM {table} WHERE TenantId = ?", (clone_guid,)) == [(0,)]
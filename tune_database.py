@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PRAGMA 调优脚本
+把选定的调优配置应用到数据库文件与维护会话，并在应用前后用固定的读写混合负载测量效果。
+
+配置分两类：
+- 持久化到数据库文件：journal_mode、page_size（修改 page_size 需要 VACUUM 重建，且不能在 WAL 模式下进行）
+- 会话级：synchronous、cache_size、mmap_size、temp_store，每个连接都要自行设置，
+  脚本会输出 API 连接需要执行的语句
+
+默认只在临时副本上比较，不修改原库；加 --apply 才会把持久化配置写入原库。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmark_workflow import Workloads, copy_database, percentile
+from init_database import DB_PATH
+import sql_profiler
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# 调优配置：持久化项 (file) 与会话项 (session)
+PROFILES = {
+    "default": {
+        "description": "SQLite 默认值（回滚日志、synchronous=FULL、2MB 缓存、无 mmap）",
+        "file": {"journal_mode": "DELETE"},
+        "session": {},
+    },
+    "balanced": {
+        "description": "WAL + synchronous=NORMAL、64MB 缓存、256MB mmap，适合读多写少的 API",
+        "file": {"journal_mode": "WAL"},
+        "session": {"synchronous": "NORMAL", "cache_size": -65536, "mmap_size": 268435456, "temp_store": "MEMORY"},
+    },
+    "read_heavy": {
+        "description": "在 balanced 基础上使用 8KB 页与 1GB mmap，适合报表与大范围扫描",
+        "file": {"journal_mode": "WAL", "page_size": 8192},
+        "session": {"synchronous": "NORMAL", "cache_size": -131072, "mmap_size": 1073741824, "temp_store": "MEMORY"},
+    },
+    "bulk_load": {
+        "description": "批量导入/生成数据时的会话设置（不适合线上，掉电可能丢失最近提交）",
+        "file": {"journal_mode": "WAL"},
+        "session": {"synchronous": "OFF", "cache_size": -262144, "mmap_size": 268435456, "temp_store": "MEMORY"},
+    },
+}
+
+# 读写混合负载：(负载名, 权重)
+MIX = (("inbox_read", 40), ("menu_tree", 20), ("dept_subtree", 20), ("task_complete", 15), ("instance_create", 5))
+
+def get_connection(db_path):
+    """获取数据库连接（自动提交模式）"""
+    return sql_profiler.connect(db_path, isolation_level=None)
+
+def apply_session_pragmas(conn, session):
+    """设置会话级 PRAGMA"""
+    for name, value in session.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+def apply_file_pragmas(conn, file_settings):
+    """
+    应用持久化 PRAGMA；page_size 变化时先切回 DELETE 日志模式再 VACUUM 重建，最后设置目标日志模式
+    返回重建用时（秒），未重建时为 0
+    """
+    rebuild_seconds = 0.0
+    page_size = file_settings.get("page_size")
+    if page_size and conn.execute("PRAGMA page_size").fetchone()[0] != page_size:
+        conn.execute("PRAGMA journal_mode = DELETE").fetchone()
+        conn.execute(f"PRAGMA page_size = {int(page_size)}")
+        started = time.perf_counter()
+        conn.execute("VACUUM")
+        rebuild_seconds = time.perf_counter() - started
+    if "journal_mode" in file_settings:
+        conn.execute(f"PRAGMA journal_mode = {file_settings['journal_mode']}").fetchone()
+    return rebuild_seconds
+
+def current_settings(conn):
+    """读取当前连接上的相关 PRAGMA"""
+    names = ("journal_mode", "page_size", "synchronous", "cache_size", "mmap_size", "temp_store")
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+
+def run_mix(db_path, session, operations, seed):
+    """在指定会话配置下执行固定的读写混合负载，返回统计结果"""
+    conn = get_connection(db_path)
+    try:
+        apply_session_pragmas(conn, session)
+        workloads = Workloads(conn, seed)
+        available = set(workloads.available())
+        mix = [(name, weight) for name, weight in MIX if name in available]
+        if not mix:
+            raise RuntimeError("库中缺少负载所需数据，请先运行 generate_load_data.py")
+        rng = random.Random(seed)
+        names, weights = zip(*mix)
+        sequence = rng.choices(names, weights, k=operations)
+        latencies = []
+        started = time.perf_counter()
+        for name in sequence:
+            op_started = time.perf_counter_ns()
+            getattr(workloads, name)()
+            latencies.append((time.perf_counter_ns() - op_started) / 1e6)
+        elapsed = time.perf_counter() - started
+        settings = current_settings(conn)
+    finally:
+        conn.close()
+    latencies.sort()
+    return {
+        "ops_per_sec": operations / elapsed if elapsed > 0 else 0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "elapsed": elapsed,
+        "settings": settings,
+    }
+
+def print_comparison(before, after):
+    """输出前后对比"""
+    print(f"\n{'指标':<12} {'应用前':>12} {'应用后':>12} {'变化':>9}")
+    for key, label, higher_better in (("ops_per_sec", "ops/s", True), ("p50_ms", "p50(ms)", False),
+                                      ("p95_ms", "p95(ms)", False), ("p99_ms", "p99(ms)", False)):
+        change = after[key] / before[key] - 1 if before[key] else 0
+        mark = "↑" if (change > 0) == higher_better else "↓"
+        print(f"{label:<14} {before[key]:>12,.3f} {after[key]:>12,.3f} {change:>+8.1%}{mark if change else ''}")
+    print("\n会话设置:")
+    for name in before["settings"]:
+        print(f"   {name:<14} {before['settings'][name]!s:>12} -> {after['settings'][name]!s}")
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="应用 PRAGMA 调优配置并测量前后效果")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--profile", choices=list(PROFILES), default="balanced", help="调优配置 (默认 balanced)")
+    parser.add_argument("--operations", type=int, default=5000, help="混合负载的操作次数")
+    parser.add_argument("--seed", type=int, default=42, help="负载随机种子")
+    parser.add_argument("--apply", action="store_true", help="把持久化配置写入原库（请先停止 API）")
+    parser.add_argument("--list", action="store_true", help="列出可用配置")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("PRAGMA 调优脚本")
+    print("=" * 60)
+
+    if args.list:
+        for name, profile in PROFILES.items():
+            print(f"\n{name}: {profile['description']}")
+            for key, value in {**profile["file"], **profile["session"]}.items():
+                print(f"   PRAGMA {key} = {value}")
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件不存在: {args.db}")
+        return 1
+
+    profile = PROFILES[args.profile]
+    print(f"\n配置: {args.profile} - {profile['description']}")
+    work_dir = tempfile.mkdtemp(prefix="workflow_tune_", dir=os.path.dirname(os.path.abspath(args.db)))
+    before_path = os.path.join(work_dir, "before.db")
+    after_path = os.path.join(work_dir, "after.db")
+    try:
+        copy_database(args.db, before_path)
+        copy_database(args.db, after_path)
+
+        print(f"\n应用前: 执行 {args.operations:,} 次混合操作...")
+        before = run_mix(before_path, {}, args.operations, args.seed)
+
+        conn = get_connection(after_path)
+        rebuild_seconds = apply_file_pragmas(conn, profile["file"])
+        conn.close()
+        if rebuild_seconds:
+            print(f"   page_size 重建用时 {rebuild_seconds:.2f}s")
+        print(f"应用后: 执行 {args.operations:,} 次混合操作...")
+        after = run_mix(after_path, profile["session"], args.operations, args.seed)
+        print_comparison(before, after)
+
+        if args.apply:
+            conn = get_connection(args.db)
+            try:
+                rebuild_seconds = apply_file_pragmas(conn, profile["file"])
+                print(f"\n✓ 已写入原库: {', '.join(f'{k}={v}' for k, v in profile['file'].items())}"
+                      + (f" (重建 {rebuild_seconds:.2f}s)" if rebuild_seconds else ""))
+            finally:
+                conn.close()
+        else:
+            print("\n(未修改原库，确认效果后使用 --apply 写入持久化配置)")
+
+        if profile["session"]:
+            print("\nAPI 每个连接打开后需执行:")
+            for key, value in profile["session"].items():
+                print(f"   PRAGMA {key} = {value};")
+        return 0
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        for path in (before_path, after_path):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        os.rmdir(work_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
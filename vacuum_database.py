@@ -2,62 +2,255 @@
 # -*- coding: utf-8 -*-
 """
 数据库收缩脚本
-执行 VACUUM 操作优化数据库文件大小
+先分析空闲页与各表页使用情况，判断是否值得收缩，再按模式执行：
+
+- full:        VACUUM 全量重写（默认，期间持有排他锁）
+- incremental: 切换 auto_vacuum=INCREMENTAL，分步 incremental_vacuum(N)，步间暂停让出写锁
+- into:        VACUUM INTO 新文件后原子替换（离线执行，需先停止 API）
+- analyze:     仅输出分析结果
 """
+import argparse
+import os
 import sqlite3
 import sys
-import os
+import time
+
+import sql_profiler
 
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 数据库路径
 DB_PATH = r'D:\Code\WorkFlowCore\WorkFlowCore\src\WorkFlowCore.API\workflow_dev.db'
 
-def get_database_size():
+# PRAGMA auto_vacuum 取值
+AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+def get_database_size(db_path=DB_PATH):
     """获取数据库文件大小"""
-    if os.path.exists(DB_PATH):
-        size_bytes = os.path.getsize(DB_PATH)
+    if os.path.exists(db_path):
+        size_bytes = os.path.getsize(db_path)
         size_mb = size_bytes / (1024 * 1024)
         return size_bytes, size_mb
     return 0, 0
 
-def vacuum_database():
+def format_bytes(size_bytes):
+    """字节数格式化为 MB"""
+    return f"{size_bytes / (1024 * 1024):.2f} MB ({size_bytes:,} 字节)"
+
+def pragma_value(conn, name):
+    """读取单值 PRAGMA"""
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+def table_page_usage(conn, limit=10):
+    """通过 dbstat 统计各表/索引占用的页数、字节数与未使用字节，dbstat 不可用时返回 None"""
+    try:
+        return conn.execute("""
+            SELECT name, COUNT(*) AS pages, SUM(pgsize) AS bytes, SUM(unused) AS unused
+            FROM dbstat
+            GROUP BY name
+            ORDER BY bytes DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+
+def total_unused_bytes(conn):
+    """通过 dbstat 统计所有页内未使用的字节数（删除行后留下的碎片），dbstat 不可用时返回 0"""
+    try:
+        return conn.execute("SELECT COALESCE(SUM(unused), 0) FROM dbstat").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+def analyze_database(conn, mode, min_free_ratio, min_free_bytes):
+    """
+    分析空闲页与页内碎片，返回统计字典
+    incremental 只能回收空闲页；full/into 重写整个文件，还能回收页内未使用空间。
+    可回收空间占比达到 min_free_ratio 且字节数达到 min_free_bytes 时认为值得收缩
+    """
+    page_size = pragma_value(conn, "page_size")
+    page_count = pragma_value(conn, "page_count")
+    freelist_count = pragma_value(conn, "freelist_count")
+    free_bytes = freelist_count * page_size
+    unused_bytes = total_unused_bytes(conn)
+    reclaimable = free_bytes if mode == "incremental" else free_bytes + unused_bytes
+    file_bytes = page_count * page_size
+    free_ratio = reclaimable / file_bytes if file_bytes else 0
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "free_ratio": free_ratio,
+        "free_bytes": free_bytes,
+        "unused_bytes": unused_bytes,
+        "reclaimable": reclaimable,
+        "auto_vacuum": pragma_value(conn, "auto_vacuum"),
+        "journal_mode": pragma_value(conn, "journal_mode"),
+        "worth_compacting": free_ratio >= min_free_ratio and reclaimable >= min_free_bytes,
+    }
+
+def print_analysis(conn, stats, top):
+    """输出分析结果"""
+    print("\n空闲页分析:")
+    print(f"   页大小: {stats['page_size']:,} 字节, 总页数: {stats['page_count']:,}")
+    print(f"   空闲页: {stats['freelist_count']:,}, 共 {format_bytes(stats['free_bytes'])}")
+    print(f"   页内未使用: {format_bytes(stats['unused_bytes'])}")
+    print(f"   本模式可回收: {format_bytes(stats['reclaimable'])} ({stats['free_ratio']:.1%})")
+    print(f"   auto_vacuum: {AUTO_VACUUM_MODES.get(stats['auto_vacuum'], stats['auto_vacuum'])}, "
+          f"journal_mode: {stats['journal_mode']}")
+
+    usage = table_page_usage(conn, top)
+    if usage is None:
+        print("   (当前 SQLite 未启用 dbstat，跳过各表页使用统计)")
+        return
+    print(f"\n占用空间最多的 {len(usage)} 个表/索引:")
+    print(f"   {'名称':<40} {'页数':>10} {'大小(MB)':>10} {'未使用':>8}")
+    for name, pages, size, unused in usage:
+        unused_ratio = unused / size if size else 0
+        print(f"   {name:<42} {pages:>10,} {size / (1024 * 1024):>10.2f} {unused_ratio:>8.1%}")
+
+def run_full_vacuum(conn):
+    """全量 VACUUM，返回锁持有时间（秒）"""
+    started = time.perf_counter()
+    conn.execute("VACUUM")
+    return time.perf_counter() - started
+
+def run_incremental_vacuum(conn, step_pages, pause, max_steps):
+    """
+    分步回收空闲页，每步一个短事务，返回 (累计锁持有时间, 单步最长锁持有时间, 步数)
+    数据库尚未处于 INCREMENTAL 模式时需要先执行一次全量 VACUUM 才能切换，该次耗时计入锁持有时间
+    """
+    total_lock = 0.0
+    max_lock = 0.0
+    if pragma_value(conn, "auto_vacuum") != 2:
+        print("\n   当前非 INCREMENTAL 模式，执行一次性切换（需要一次全量 VACUUM）...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        total_lock = max_lock = run_full_vacuum(conn)
+        print(f"   ✓ 已切换为 INCREMENTAL，用时 {total_lock:.2f}s")
+        return total_lock, max_lock, 1
+
+    steps = 0
+    while pragma_value(conn, "freelist_count") > 0 and (max_steps is None or steps < max_steps):
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        # sqlite3 模块对无结果集的语句只 step 一次，而 incremental_vacuum 每次 step 回收一页，
+        # 因此在同一事务内逐页执行，直到达到本步页数或空闲页耗尽
+        for _ in range(step_pages):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+            if pragma_value(conn, "freelist_count") == 0:
+                break
+        conn.execute("COMMIT")
+        held = time.perf_counter() - started
+        total_lock += held
+        max_lock = max(max_lock, held)
+        steps += 1
+        if steps % 50 == 0:
+            print(f"   已执行 {steps} 步, 剩余空闲页 {pragma_value(conn, 'freelist_count'):,}")
+        time.sleep(pause)
+    return total_lock, max_lock, steps
+
+def run_vacuum_into(conn, db_path, keep_backup):
+    """
+    VACUUM INTO 临时文件后原子替换原库（离线模式），返回锁持有时间
+    替换前先做 TRUNCATE 检查点，确保 WAL 中的内容已写回主库
+    """
+    target = db_path + ".compact"
+    if os.path.exists(target):
+        os.remove(target)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    started = time.perf_counter()
+    conn.execute("VACUUM INTO ?", (target,))
+    held = time.perf_counter() - started
+    conn.close()
+
+    if keep_backup:
+        os.replace(db_path, db_path + ".bak")
+    os.replace(target, db_path)
+    # 新文件没有对应的 WAL/共享内存，移除遗留文件
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    return held
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="分析并收缩 SQLite 数据库")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--mode", choices=["full", "incremental", "into", "analyze"], default="full",
+                        help="收缩模式 (默认 full)")
+    parser.add_argument("--force", action="store_true", help="即使分析认为不值得收缩也执行")
+    parser.add_argument("--min-free-ratio", type=float, default=0.1, help="触发收缩的最小可回收空间比例")
+    parser.add_argument("--min-free-mb", type=float, default=1.0, help="触发收缩的最小可回收空间 (MB)")
+    parser.add_argument("--step-pages", type=int, default=1000, help="incremental 模式每步回收的页数")
+    parser.add_argument("--pause", type=float, default=0.2, help="incremental 模式步间暂停秒数")
+    parser.add_argument("--max-steps", type=int, help="incremental 模式最多执行的步数")
+    parser.add_argument("--keep-backup", action="store_true", help="into 模式保留原库为 .bak")
+    parser.add_argument("--top", type=int, default=10, help="输出占用最多的前 N 个表/索引")
+    return parser.parse_args(argv)
+
+def vacuum_database(argv=None):
     """收缩数据库"""
+    args = parse_args(argv)
+    db_path = args.db
     print("=" * 60)
     print("数据库收缩脚本")
     print("=" * 60)
-    
-    if not os.path.exists(DB_PATH):
-        print(f"错误: 数据库文件不存在: {DB_PATH}")
+
+    if not os.path.exists(db_path):
+        print(f"错误: 数据库文件不存在: {db_path}")
         return
-    
+
     # 获取收缩前的大小
-    size_before_bytes, size_before_mb = get_database_size()
+    size_before_bytes, size_before_mb = get_database_size(db_path)
     print(f"\n收缩前数据库大小: {size_before_mb:.2f} MB ({size_before_bytes:,} 字节)")
-    
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        print("\n正在执行 VACUUM 操作...")
-        cursor.execute("VACUUM")
-        
-        # 提交更改
-        conn.commit()
-        conn.close()
-        
+        # 自动提交模式，由各收缩步骤自行控制事务
+        conn = sql_profiler.connect(db_path, isolation_level=None)
+
+        with sql_profiler.step("空间分析"):
+            stats = analyze_database(conn, args.mode, args.min_free_ratio, args.min_free_mb * 1024 * 1024)
+            print_analysis(conn, stats, args.top)
+
+        if args.mode == "analyze":
+            conn.close()
+            print(f"\n结论: {'建议收缩' if stats['worth_compacting'] else '暂无收缩必要'}")
+            return
+        if not stats["worth_compacting"] and not args.force:
+            conn.close()
+            print("\n空闲空间未达到阈值，跳过收缩（使用 --force 强制执行）")
+            return
+
+        if args.mode == "full":
+            print("\n正在执行 VACUUM 操作...")
+            with sql_profiler.step("VACUUM"):
+                lock_seconds = run_full_vacuum(conn)
+            conn.close()
+            print(f"   锁持有时间: {lock_seconds:.2f}s")
+        elif args.mode == "incremental":
+            print(f"\n正在执行增量回收 (每步 {args.step_pages} 页, 间隔 {args.pause}s)...")
+            with sql_profiler.step("增量回收"):
+                lock_seconds, max_lock, steps = run_incremental_vacuum(conn, args.step_pages, args.pause,
+                                                                       args.max_steps)
+            conn.close()
+            print(f"   共 {steps} 步, 锁持有时间合计 {lock_seconds:.2f}s, 单步最长 {max_lock * 1000:.1f}ms")
+        else:
+            print("\n正在执行 VACUUM INTO 并替换原库（请确认 API 已停止）...")
+            with sql_profiler.step("VACUUM INTO 与替换"):
+                lock_seconds = run_vacuum_into(conn, db_path, args.keep_backup)
+            print(f"   读锁持有时间: {lock_seconds:.2f}s")
+
         # 获取收缩后的大小
-        size_after_bytes, size_after_mb = get_database_size()
+        size_after_bytes, size_after_mb = get_database_size(db_path)
         print(f"收缩后数据库大小: {size_after_mb:.2f} MB ({size_after_bytes:,} 字节)")
-        
+
         # 计算节省的空间
         saved_bytes = size_before_bytes - size_after_bytes
         saved_mb = saved_bytes / (1024 * 1024)
         saved_percent = (saved_bytes / size_before_bytes * 100) if size_before_bytes > 0 else 0
-        
+
         print(f"\n节省空间: {saved_mb:.2f} MB ({saved_bytes:,} 字节, {saved_percent:.1f}%)")
         print("\n✓ 数据库收缩完成！")
-        
+
     except Exception as e:
         print(f"\n错误: {e}")
         import traceback
@@ -65,6 +258,3 @@ def vacuum_database():
 
 if __name__ == "__main__":
     vacuum_database()
-
-
-